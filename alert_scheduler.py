@@ -0,0 +1,176 @@
+from pymongo import UpdateOne
+from database import BulkWriter, page_states_collection
+import threading
+import heapq
+import math
+import time
+
+# Check intervals (in seconds)
+MIN_INTERVAL = 15 * 60  # Never check one URL more often than this
+HOT_INTERVAL = 30 * 60  # Cap while a product has flipped stock recently
+BASE_INTERVAL = 6 * 3600  # First check after a product changed or became known
+MAX_INTERVAL = 3 * 86400  # Long-unavailable products back off up to this
+BACKOFF_FACTOR = 2  # Each unchanged "unavailable" result stretches the interval
+HOT_WINDOW = 48 * 3600  # A stock flip keeps a product hot for this long
+ERROR_RETRY = 30 * 60  # Retry failed checks after this, without touching the backoff
+
+CHECK_BATCH_SIZE = 50  # Due URLs handed to the checker at once
+SYNC_INTERVAL = 10 * 60  # Re-read alerts from MongoDB this often (new/removed alerts)
+
+
+def plan_next_check(previous, available, subscribers, now):
+    """
+    Decide when to check a URL again, given its stored state and the latest result.
+    Returns the fields to persist, including next_check_at.
+    """
+    backoff = previous.get("backoff_seconds") or BASE_INTERVAL
+    last_flip_at = previous.get("last_flip_at")
+    was_available = previous.get("available")
+
+    if available is None:
+        delay = ERROR_RETRY
+    else:
+        if was_available is not None and was_available != available:
+            last_flip_at = now
+        if was_available is False and available is False:
+            backoff = min(backoff * BACKOFF_FACTOR, MAX_INTERVAL)
+        else:
+            backoff = BASE_INTERVAL
+        if last_flip_at and now - last_flip_at < HOT_WINDOW:
+            backoff = min(backoff, HOT_INTERVAL)
+        # Products many people wait for are checked more often
+        delay = backoff / (1 + math.log2(max(subscribers, 1)))
+
+    delay = min(max(delay, MIN_INTERVAL), MAX_INTERVAL)
+    return {
+        "backoff_seconds": backoff,
+        "last_flip_at": last_flip_at,
+        "subscribers": subscribers,
+        "next_check_at": now + delay,
+    }
+
+
+class AlertScheduler:
+    """
+    Checks each alerted product URL when it is due rather than all at once.
+    Due times live in a min-heap (O(log n) per schedule/pop) and are persisted
+    per URL in page_states, so a restart resumes where the last run stopped.
+    """
+
+    def __init__(self, check_fn, list_urls_fn, collection=page_states_collection, batch_size=CHECK_BATCH_SIZE):
+        self.check_fn = check_fn  # check_fn(urls) -> {url: True/False, or None on error}
+        self.list_urls_fn = list_urls_fn  # list_urls_fn() -> {url: number of enabled alerts}
+        self.collection = collection
+        self.batch_size = batch_size
+        self._heap = []  # (next_check_at, url); superseded entries are skipped when popped
+        self._due_at = {}  # url -> its current entry in the heap
+        self._subscribers = {}
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self.checked = 0
+
+    def _schedule(self, url, when):
+        self._due_at[url] = when
+        heapq.heappush(self._heap, (when, url))
+
+    def sync(self):
+        """Load URLs with enabled alerts and their persisted due times; forget URLs without alerts."""
+        subscribers = self.list_urls_fn()
+        due_times = {
+            state["product_url"]: state.get("next_check_at")
+            for state in self.collection.find(
+                {"product_url": {"$in": list(subscribers)}}, {"product_url": 1, "next_check_at": 1}
+            )
+        }
+        now = time.time()
+        with self._lock:
+            self._subscribers = subscribers
+            for url in subscribers:
+                if url not in self._due_at and url not in self._in_flight:
+                    self._schedule(url, due_times.get(url) or now)
+            for url in list(self._due_at):
+                if url not in subscribers:
+                    del self._due_at[url]  # Its heap entry is dropped when popped
+        self._wakeup.set()
+
+    def add(self, url):
+        """Make sure a newly alerted URL is scheduled (checked right away if unknown)."""
+        with self._lock:
+            self._subscribers[url] = self._subscribers.get(url, 0) + 1
+            if url not in self._due_at and url not in self._in_flight:
+                self._schedule(url, time.time())
+        self._wakeup.set()
+
+    def _pop_due(self, now):
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+                when, url = heapq.heappop(self._heap)
+                if self._due_at.get(url) != when:
+                    continue
+                del self._due_at[url]
+                self._in_flight.add(url)
+                due.append(url)
+        return due
+
+    def run_batch(self, urls):
+        """Check due URLs, then persist and schedule each one's next check."""
+        previous = {state["product_url"]: state for state in self.collection.find({"product_url": {"$in": urls}})}
+        try:
+            results = self.check_fn(urls)
+        except Exception as e:
+            print(f"[SCHEDULER] Availability check failed: {e}")
+            results = {}
+
+        now = time.time()
+        with BulkWriter(self.collection) as writer:
+            for url in urls:
+                available = results.get(url)
+                plan = plan_next_check(previous.get(url, {}), available, self._subscribers.get(url, 1), now)
+                writer.add(UpdateOne({"product_url": url}, {"$set": plan}, upsert=True))
+                with self._lock:
+                    self._in_flight.discard(url)
+                    # Available products have had their alerts sent and disabled
+                    if not available and url in self._subscribers:
+                        self._schedule(url, plan["next_check_at"])
+                    if available:
+                        self._subscribers.pop(url, None)
+        self.checked += len(urls)
+
+    def run_forever(self):
+        """Scheduler loop: check whatever is due, sleep until the next due time."""
+        last_sync = 0
+        while not self._stopping.is_set():
+            try:
+                if time.time() - last_sync >= SYNC_INTERVAL:
+                    self.sync()
+                    last_sync = time.time()
+                due = self._pop_due(time.time())
+                if due:
+                    self.run_batch(due)
+                    continue
+            except Exception as e:
+                print(f"[SCHEDULER] Error in alert scheduler: {e}")
+
+            with self._lock:
+                next_due = self._heap[0][0] if self._heap else float("inf")
+            sleep_for = min(next_due, last_sync + SYNC_INTERVAL) - time.time()
+            self._wakeup.wait(max(sleep_for, 1))
+            self._wakeup.clear()
+
+    def stats(self):
+        """Queue size and next due time for the /status endpoint."""
+        with self._lock:
+            next_due = min(self._due_at.values()) if self._due_at else None
+            return {
+                "scheduled": len(self._due_at),
+                "in_flight": len(self._in_flight),
+                "next_check_in": round(max(next_due - time.time(), 0)) if next_due else None,
+                "checked": self.checked,
+            }
+
+    def shutdown(self):
+        self._stopping.set()
+        self._wakeup.set()
@@ -1,24 +1,192 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
-from selenium.webdriver.chrome.options import Options
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pymongo import UpdateOne
+from urllib.parse import urlparse
+import requests
+import threading
+import hashlib
 import time
-import random
+import os
+from driver_pool import driver_pool
+from http_fetch import session, parse_html, REQUEST_TIMEOUT
+from database import BulkWriter, page_states_collection
+
+# Batch check configuration
+MAX_CHECK_WORKERS = int(os.getenv("MAX_CHECK_WORKERS", driver_pool.max_size))  # Pages checked at once
+DOMAIN_INTERVAL = float(os.getenv("ALERT_DOMAIN_INTERVAL", 2.0))  # Minimum seconds between requests to one site
+PAGE_LOAD_TIMEOUT = 10  # Seconds to wait for a product page to finish loading
+
+# Elements whose text decides availability, per site. If none of them is in the
+# static HTML (bot wall, redesign, unknown site) the probe can't decide.
+STOCK_FRAGMENT_SELECTORS = {
+    "robu.in": ["p.stock"],
+    "robocraze.com": ["span.price__badge-sold-out", "button.product-form__submit"],
+    "amazon.in": ["#availability", "#outOfStock", "#add-to-cart-button"],
+}
+
+# Probe outcomes that reuse the stored availability without rendering the page
+SHORT_CIRCUIT_OUTCOMES = ("not_modified", "unchanged")
+
+
+class DomainRateLimiter:
+    """Space out requests to the same domain by at least `interval` seconds, across threads."""
+
+    def __init__(self, interval=DOMAIN_INTERVAL):
+        self.interval = interval
+        self._next_slot = {}  # domain -> earliest start time of its next request
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        """Block until this request's slot for its domain comes up."""
+        domain = urlparse(url).netloc.lower()
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._next_slot.get(domain, 0))
+            self._next_slot[domain] = slot + self.interval
+        # Slot is reserved, sleep outside the lock so other domains proceed
+        time.sleep(slot - now)
+
+
+def interleave_by_domain(urls):
+    """Order URLs round-robin across domains so workers don't all queue on one site."""
+    by_domain = {}
+    for url in urls:
+        by_domain.setdefault(urlparse(url).netloc.lower(), []).append(url)
+    queues = list(by_domain.values())
+    ordered = []
+    for i in range(max((len(queue) for queue in queues), default=0)):
+        ordered.extend(queue[i] for queue in queues if i < len(queue))
+    return ordered
+
+
+def stock_fragment(product_url, html):
+    """Text of the stock-relevant elements of a page, or None if there are none to compare."""
+    domain = urlparse(product_url).netloc.lower()
+    selectors = next((sel for site, sel in STOCK_FRAGMENT_SELECTORS.items() if domain.endswith(site)), None)
+    if selectors is None:
+        return None
+    soup = parse_html(html)
+    parts = []
+    for selector in selectors:
+        for element in soup.select(selector):
+            parts.append(f"{selector}={' '.join(element.get_text(' ', strip=True).split())}")
+    return "\n".join(parts) if parts else None
 
-def scrape_product_availability(product_url):
-    """Use headless Selenium to check if a product is in stock."""
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-    chrome_options.add_argument("start-maximized")
-    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0 Safari/537.36")
 
-    driver = webdriver.Chrome(options=chrome_options)
-    time.sleep(random.uniform(1, 2))
+def probe_page(product_url, state):
+    """
+    Cheap HTTP check of a product page against the state stored last time.
+    Sends a conditional GET (ETag / Last-Modified) and hashes the stock fragment.
+    Returns (outcome, fields): "not_modified" or "unchanged" mean the stored
+    availability still holds; "changed" or "undecided" mean the page has to be
+    rendered. `fields` holds the validators and fragment hash to store.
+    """
+    # Unknown validators/hash, so a later probe can never wrongly short-circuit
+    unknown = {"etag": None, "last_modified": None, "fragment_hash": None}
+    known = state.get("available") is not None
+
+    headers = {}
+    if known and state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if known and state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+
+    try:
+        response = session.get(product_url, headers=headers, timeout=REQUEST_TIMEOUT)
+    except requests.RequestException:
+        return "undecided", unknown
+    if response.status_code == 304 and known:
+        return "not_modified", {}
+    if response.status_code != 200:
+        return "undecided", unknown
+
+    fields = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "fragment_hash": None,
+    }
+    fragment = stock_fragment(product_url, response.text)
+    if fragment is None:
+        return "undecided", fields
+    fields["fragment_hash"] = hashlib.sha1(fragment.encode("utf-8")).hexdigest()
+    if known and fields["fragment_hash"] == state.get("fragment_hash"):
+        return "unchanged", fields
+    return "changed", fields
+
+
+def check_availability_batch(product_urls, max_workers=MAX_CHECK_WORKERS, limiter=None):
+    """
+    Check each distinct URL once on a bounded pool, rate limited per domain.
+    A cheap HTTP probe runs first; the page is only rendered in Selenium when
+    the probe finds it changed or can't tell. Probe state persists per URL.
+    Returns ({url: True/False, or None if the check failed}, stats).
+    """
+    limiter = limiter or DomainRateLimiter()
+    urls = interleave_by_domain(dict.fromkeys(product_urls))
+    states = {
+        state["product_url"]: state
+        for state in page_states_collection.find({"product_url": {"$in": urls}})
+    }
+    results = {}
+    outcomes = {}
+    started = time.time()
+
+    def check(url):
+        state = states.get(url, {})
+        limiter.wait(url)
+        outcome, fields = probe_page(url, state)
+        if outcome in SHORT_CIRCUIT_OUTCOMES:
+            return state["available"], outcome, fields
+        limiter.wait(url)
+        return scrape_product_availability(url), outcome, fields
+
+    with BulkWriter(page_states_collection) as writer:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="alert-check") as pool:
+            futures = {pool.submit(check, url): url for url in urls}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    available, outcome, fields = future.result()
+                except Exception as e:
+                    print(f"[ERROR] Availability check failed for {url}: {e}")
+                    results[url] = None
+                    outcomes["failed"] = outcomes.get("failed", 0) + 1
+                    continue
+                results[url] = available
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+                writer.add(UpdateOne(
+                    {"product_url": url},
+                    {"$set": {**fields, "available": available, "checked_at": time.time()}},
+                    upsert=True
+                ))
+
+    duration = time.time() - started
+    short_circuited = sum(outcomes.get(outcome, 0) for outcome in SHORT_CIRCUIT_OUTCOMES)
+    stats = {
+        "urls": len(urls),
+        "available": sum(1 for result in results.values() if result),
+        "errors": sum(1 for result in results.values() if result is None),
+        "short_circuited": short_circuited,
+        "rendered": len(results) - short_circuited - outcomes.get("failed", 0),
+        "outcomes": outcomes,
+        "duration_seconds": round(duration, 2),
+        "urls_per_second": round(len(urls) / duration, 2) if duration > 0 else None,
+    }
+    return results, stats
+
+
+def scrape_product_availability(product_url):
+    """Use headless Selenium to check if a product is in stock. Raises if the page can't be checked."""
+    driver = driver_pool.checkout()
 
     try:
         driver.get(product_url)
-        time.sleep(2)  # Give time to load dynamic content
+        # Wait for the document instead of a fixed pause; stock markup is server-rendered
+        WebDriverWait(driver, PAGE_LOAD_TIMEOUT).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
+        )
 
         #### ROBU.IN
         if "robu.in" in product_url:
@@ -52,8 +220,5 @@ def scrape_product_availability(product_url):
             return False
         return True
 
-    except Exception as e:
-        print(f"[ERROR] Selenium check failed for {product_url}: {e}")
-        return False
     finally:
-        driver.quit()
+        driver_pool.checkin(driver)
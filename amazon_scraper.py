@@ -1,4 +1,3 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -6,32 +5,25 @@ from selenium.common.exceptions import NoSuchElementException, TimeoutException
 import time
 import urllib.parse
 import random
-from pymongo import MongoClient
+from database import ProductWriter
+from driver_pool import driver_pool, CHECKOUT_TIMEOUT
+from scrape_orchestrator import deadline_passed, time_left
 
-def get_collection_for_query(search_query):
-    """
-    Returns a MongoDB collection for the given search query.
-    """
-    client = MongoClient("mongodb://localhost:27017/")
-    db = client["amazon_db"]  # Use the Amazon database
-    collection_name = f"{search_query.lower().replace(' ', '_')}_products"  # Create a valid collection name
-    return db[collection_name]
+# Label stored in the "source" field of every product from this site
+SOURCE = "Amazon.in"
 
-def scrape_amazon(search_query):
+def scrape_amazon(search_query, deadline=None):
     """
     Scrape product details from Amazon.in based on a search query.
     Includes both organic and sponsored products.
+    Returns "completed", or "partial" if the deadline cut the pass short.
+    Failures are raised.
     """
-    # Setup Chrome options
-    chrome_options = webdriver.ChromeOptions()
-    chrome_options.add_argument("--disable-blink-features=AutomationControlled")  # Bypass detection
-    chrome_options.add_argument("--start-maximized")  # Open browser in maximized mode
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")  # Set User-Agent
-
-    # Initialize WebDriver
-    driver = webdriver.Chrome(options=chrome_options)
+    # Borrow a warm WebDriver from the shared pool
+    driver = driver_pool.checkout(timeout=time_left(deadline, CHECKOUT_TIMEOUT))
     products_scraped = 0
+    writer = None
+    cut_short = False
 
     try:
         # Encode the search query for URL
@@ -53,8 +45,12 @@ def scrape_amazon(search_query):
         # Scroll down to load more products (if needed)
         last_height = driver.execute_script("return document.body.scrollHeight")
         while True:
+            if deadline_passed(deadline):
+                print("Deadline reached, stopping scroll.")
+                cut_short = True
+                break
             driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(random.uniform(2, 5))  # Random delay between 2 and 5 seconds
+            time.sleep(min(random.uniform(2, 5), time_left(deadline, 5)))  # Random delay between 2 and 5 seconds
             new_height = driver.execute_script("return document.body.scrollHeight")
             if new_height == last_height:
                 break
@@ -66,10 +62,13 @@ def scrape_amazon(search_query):
         print(f"Found {len(products)} products for '{search_query}'")
         print("-" * 50)
         
-        # Get the collection for the search query
-        collection = get_collection_for_query(search_query)
+        writer = ProductWriter(SOURCE, search_query)  # Products are flushed in batches
         
         for product in products:
+            if deadline_passed(deadline):
+                print(f"Deadline reached, keeping {products_scraped} products scraped so far.")
+                cut_short = True
+                break
             try:
                 # Check if the product is sponsored
                 try:
@@ -135,7 +134,7 @@ def scrape_amazon(search_query):
                     "search_query": search_query,
                     "timestamp": time.time()
                 }
-                collection.insert_one(product_data)  # Insert into MongoDB
+                writer.add(product_data)
                 products_scraped += 1
 
             except Exception as e:
@@ -143,11 +142,21 @@ def scrape_amazon(search_query):
                 print(f"Error processing product: {e}")
                 continue
 
+        if cut_short:
+            return "partial"
+        # Only a complete pass may mark listings it did not see as stale
+        writer.finish()
+        return "completed"
+
     except Exception as e:
         print(f"Error during scraping: {e}")
+        raise
 
     finally:
-        driver.quit()
+        driver_pool.checkin(driver)
+        # Save the last partial batch even if scraping stopped early
+        if writer is not None:
+            writer.flush()
         print(f"Scraping complete from amazon. Total products scraped: {products_scraped}")
 
 if __name__ == "__main__":
@@ -1,18 +1,14 @@
-from flask import Flask, request, jsonify, render_template
-from pymongo import MongoClient
+from flask import Flask, Response, request, jsonify, render_template
 import threading
+import json
 import time
 from datetime import datetime, timedelta
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from pyngrok import ngrok
+import argparse
+import atexit
 import os
 from dotenv import load_dotenv
 load_dotenv()  # Load environment variables
 
-ngrok.set_auth_token(os.getenv("NGROK_AUTH_TOKEN"))
-
 EMAIL_USERNAME = os.getenv("EMAIL_USERNAME")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 
@@ -21,28 +17,25 @@ EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 CUSTOM_DOMAIN = "powerful-maggot-definitely.ngrok-free.app"
 
 
-# Import scraping functions
-from robu_scraper import scrape_robu
-from robocraze_scraper import scrape_robocraze
-from amazon_scraper import scrape_amazon
-from alertscraping import scrape_product_availability
-from gemini_chatbot import ask_luffybot
+# Scrapers (and Selenium) are imported on first use to keep startup fast
+from gemini_chatbot import ask_luffybot, stream_luffybot, chatbot_stats, BOT_TYPES
+from driver_pool import driver_pool
+from scrape_orchestrator import run_scrapers, lazy_scraper
+from single_flight import SingleFlight
+from result_cache import ResultCache
+from database import client, products_collection, refreshes_collection, scrape_jobs_collection, email_outbox_collection, normalize_query, ensure_indexes, record_no_results, bump_results_version, results_version, NO_RESULTS_SOURCE, RESULTS_VERSION_SOURCE
+from scrape_jobs import ScrapeJobQueue, QueueFull
+from alert_scheduler import AlertScheduler
+from email_outbox import EmailOutbox
+from write_behind import WriteBehindBuffer
 
 
 
 # Import the new ranking function
-from ml_ranker import rank_scraped_products
+from ml_ranker import rank_scraped_products, embedding_cache_stats, warm_up
 
 app = Flask(__name__)
 
-# MongoDB connection
-client = MongoClient("mongodb://localhost:27017/")
-
-# Define databases
-robu_db = client["robu_db"]
-robocraze_db = client["robocraze_db"]
-amazon_db = client["amazon_db"]
-
 # Combined database for alerts
 alerts_db = client["alerts_db"]
 alerts_collection = alerts_db["alerts"]
@@ -50,294 +43,306 @@ alerts_collection = alerts_db["alerts"]
 chatlog_db = client["chatlog_db"]
 chatlog_collection = chatlog_db["chat_messages"]
 
+# Chat logs are written behind the response in batches, spilling to disk if MongoDB is down
+CHATLOG_SPILL_PATH = os.getenv("CHATLOG_SPILL_PATH", "chatlog_spill.jsonl")
+chatlog_writer = WriteBehindBuffer(chatlog_collection, CHATLOG_SPILL_PATH)
+atexit.register(chatlog_writer.shutdown)
 
-# Configuration for data freshness (in hours)
-DATA_FRESHNESS_HOURS = 24
 
-# Email configuration
-EMAIL_HOST = "smtp.gmail.com"  # Change this to your SMTP server
-EMAIL_PORT = 587
+# Scrapers run for every live search, keyed by the name reported in "sources"
+SCRAPERS = {
+    "robu": lazy_scraper("robu_scraper", "scrape_robu"),
+    "robocraze": lazy_scraper("robocraze_scraper", "scrape_robocraze"),
+    "amazon": lazy_scraper("amazon_scraper", "scrape_amazon")
+}
 
-def send_email(recipient, subject, message):
-    """Send an email to the specified recipient."""
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = "Multi-Site Product Finder <multisiteproductfinder@gmail.com>"
-        msg['To'] = recipient
-        msg['Subject'] = subject
-        msg['Reply-To'] = "multisiteproductfinder@gmail.com"
+# Coalesces concurrent searches for the same query
+search_flight = SingleFlight()
+
+# Stale-while-revalidate thresholds for cached search results (in hours)
+SOFT_TTL_HOURS = 6  # Younger than this: serve directly
+HARD_TTL_HOURS = 24  # Up to this age: serve cached rows and refresh in the background. Older: scrape live
+NO_RESULTS_TTL_HOURS = 1  # A query every site found nothing for is not scraped again for this long
+
+# Ranked, serialized /search responses for hot queries
+result_cache = ResultCache()
+
+# /search pagination
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
 
-        msg.attach(MIMEText(message, 'html'))
+# Live scrapes run as queued jobs on a bounded worker pool instead of in request threads.
+# Concurrent searches for the same query share one job (and one scrape).
+def run_scrape_job(search_query, on_source_done):
+    (_, sources, _), _ = search_flight.do(
+        normalize_query(search_query), scrape_all_sites, search_query, True, on_source_done
+    )
+    return sources
 
-        server = smtplib.SMTP(EMAIL_HOST, EMAIL_PORT)
-        server.starttls()
-        server.login(EMAIL_USERNAME, EMAIL_PASSWORD)
-        server.send_message(msg)
-        server.quit()
+scrape_jobs = ScrapeJobQueue(scrape_jobs_collection, run_scrape_job, SCRAPERS)
 
-        print(f"Email sent to {recipient}")
+# Search cache counters reported by /status
+cache_stats = {"hit": 0, "stale": 0, "miss": 0}
+cache_stats_lock = threading.Lock()
+
+# Summary of the most recent availability check, reported by /status
+last_availability_run = None
+
+# Outgoing mail goes through a persistent outbox drained by a background sender
+email_outbox = EmailOutbox(email_outbox_collection, EMAIL_USERNAME, EMAIL_PASSWORD)
+
+def send_email(recipient, subject, message, digest_section=None):
+    """Queue an email to the specified recipient; it is sent in the background."""
+    try:
+        email_outbox.enqueue(recipient, subject, message, digest_section=digest_section)
         return True
     except Exception as e:
-        print(f"Failed to send email: {str(e)}")
+        print(f"Failed to queue email: {str(e)}")
         return False
 
 
-def get_collection_for_query(db, search_query):
-    """
-    Returns a MongoDB collection for the given search query.
-    """
-    collection_name = f"{search_query.lower().replace(' ', '_')}_products"  # Create a valid collection name
-    return db[collection_name]
+def record_cache_result(result):
+    """Count a search cache hit, stale hit or miss."""
+    with cache_stats_lock:
+        cache_stats[result] += 1
 
 def get_existing_results(search_query):
     """
-    Check if we have recent results for this search query.
-    Returns results if found and still fresh, None otherwise.
+    Check if we have results younger than HARD_TTL_HOURS for this search query.
+    Returns (results, age_in_seconds) if found, (None, None) otherwise.
+    Results are an empty list for a query that recently had no results anywhere.
     """
-    # Calculate the timestamp threshold for fresh data
-    freshness_threshold = time.time() - (DATA_FRESHNESS_HOURS * 3600)
-    
-    all_products = []
-    found_results = False
-    
-    # Check if we have recent data from Robu.in
-    robu_collection = get_collection_for_query(robu_db, search_query)
-    robu_products = list(robu_collection.find({
-        "timestamp": {"$gt": freshness_threshold}
-    }))
-    
-    if robu_products:
-        found_results = True
-        for product in robu_products:
-            product["_id"] = str(product["_id"])
-            product["source"] = "Robu.in"
-            all_products.append(product)
-    
-    # Check if we have recent data from RoboCraze
-    robocraze_collection = get_collection_for_query(robocraze_db, search_query)
-    robocraze_products = list(robocraze_collection.find({
-        "timestamp": {"$gt": freshness_threshold}
-    }))
-    
-    if robocraze_products:
-        found_results = True
-        for product in robocraze_products:
-            product["_id"] = str(product["_id"])
-            product["source"] = "RoboCraze"
-            all_products.append(product)
-    
-    # Check if we have recent data from Amazon
-    amazon_collection = get_collection_for_query(amazon_db, search_query)
-    amazon_products = list(amazon_collection.find({
-        "timestamp": {"$gt": freshness_threshold}
+    query_key = normalize_query(search_query)
+    all_products = get_current_products(query_key)
+    if not all_products:
+        no_results = refreshes_collection.find_one({"normalized_query": query_key, "source": NO_RESULTS_SOURCE})
+        if no_results and time.time() - no_results["refreshed_at"] < NO_RESULTS_TTL_HOURS * 3600:
+            return [], time.time() - no_results["refreshed_at"]
+        # Nothing stored yet, return None to indicate we need to scrape
+        return None, None
+
+    # Age comes from the last completed refresh; unchanged rows keep their old timestamp.
+    # Queries never refreshed under the new layout fall back to the newest row.
+    refreshes = list(refreshes_collection.find({"normalized_query": query_key, "source": {"$ne": RESULTS_VERSION_SOURCE}}))
+    if refreshes:
+        refreshed_at = max(refresh["refreshed_at"] for refresh in refreshes)
+    else:
+        refreshed_at = max(product.get("timestamp", 0) for product in all_products)
+    data_age = time.time() - refreshed_at
+
+    if data_age > HARD_TTL_HOURS * 3600:
+        return None, None
+
+    print(f"Found existing results for: {search_query} ({data_age / 3600:.1f}h old)")
+    return all_products, data_age
+
+def get_current_products(query_key):
+    """All listings for a normalized query that its latest refresh still returned."""
+    all_products = list(products_collection.find({
+        "normalized_query": query_key,
+        "stale_for": {"$ne": query_key}
     }))
-    
-    if amazon_products:
-        found_results = True
-        for product in amazon_products:
-            product["_id"] = str(product["_id"])
-            product["source"] = "Amazon.in"
-            all_products.append(product)
-    
-    # If we have fresh results from all sources, return them
-    if found_results:
-        print(f"Found fresh existing results for: {search_query}")
-        return all_products
-    
-    # Otherwise return None to indicate we need to scrape
-    return None
+    for product in all_products:
+        product["_id"] = str(product["_id"])  # Convert ObjectId to string
+    return all_products
+
+def refresh_in_background(search_query):
+    """Queue a scrape job for a stale query; it joins any job already queued or running for it."""
+    try:
+        job_id = scrape_jobs.submit(search_query)
+        print(f"Queued background refresh for: {search_query} (job {job_id})")
+    except QueueFull:
+        print(f"Scrape queue full, serving stale results for: {search_query}")
+
+def lookup_stored_results(search_query):
+    """
+    Stored results usable without scraping, as (products, sources, data_age),
+    or None on a miss. Stale rows are returned too, with a refresh queued.
+    """
+    existing_results, data_age = get_existing_results(search_query)
+    if existing_results is None:
+        record_cache_result("miss")
+        return None
+    if data_age < SOFT_TTL_HOURS * 3600:
+        record_cache_result("hit")
+        status = "cached"
+    else:
+        # Serve the stale rows now and revalidate behind the scenes
+        record_cache_result("stale")
+        status = "stale"
+        refresh_in_background(search_query)
+    return existing_results, {name: {"status": status} for name in SCRAPERS}, data_age
 
-def scrape_all_sites(search_query):
+def scrape_all_sites(search_query, force_refresh=False, on_source_done=None):
     """
     Unified function to scrape all three websites for product data.
-    Returns status for frontend updates.
+    Returns (products, sources, data_age) where sources holds each scraper's
+    status and data_age is the age of the returned rows in seconds.
+    `on_source_done` is passed to run_scrapers to report each site as it finishes.
     """
     print(f"Starting unified search for: {search_query}")
     print("=" * 60)
     
-    # First, check if we already have fresh results
-    existing_results = get_existing_results(search_query)
-    if existing_results:
-        return existing_results
-    
-    # If we don't have fresh results, clear any old results for this query
-    # to prevent mixing of old and new data
-    robu_collection = get_collection_for_query(robu_db, search_query)
-    robocraze_collection = get_collection_for_query(robocraze_db, search_query)
-    amazon_collection = get_collection_for_query(amazon_db, search_query)
+    # First, check if we already have usable results (unless a refresh was forced)
+    if not force_refresh:
+        stored = lookup_stored_results(search_query)
+        if stored is not None:
+            return stored
     
-    robu_collection.delete_many({})
-    robocraze_collection.delete_many({})
-    amazon_collection.delete_many({})
-    
-    # Dictionary to track status of each scraper
-    scraper_status = {
-        "robu": "pending",
-        "robocraze": "pending",
-        "amazon": "pending"
-    }
-    
-    # Thread function for robu.in
-    def run_robu_scraper():
-        try:
-            print("Starting Robu.in scraper...")
-            scraper_status["robu"] = "running"
-            # Call the scrape_robu function - it will save to its own database
-            scrape_robu(search_query)
-            scraper_status["robu"] = "completed"
-            print("Completed Robu.in scraping")
-        except Exception as e:
-            scraper_status["robu"] = "error"
-            print(f"Error in Robu.in scraper: {e}")
-
-    # Thread function for robocraze.com
-    def run_robocraze_scraper():
-        try:
-            print("Starting RoboCraze scraper...")
-            scraper_status["robocraze"] = "running"
-            # Call the scrape_robocraze function - it will save to its own database
-            scrape_robocraze(search_query)
-            scraper_status["robocraze"] = "completed"
-            print("Completed RoboCraze scraping")
-        except Exception as e:
-            scraper_status["robocraze"] = "error"
-            print(f"Error in RoboCraze scraper: {e}")
-
-    # Thread function for amazon.in
-    def run_amazon_scraper():
-        try:
-            print("Starting Amazon.in scraper...")
-            scraper_status["amazon"] = "running"
-            # Call the scrape_amazon function - it will save to its own database
-            scrape_amazon(search_query)
-            scraper_status["amazon"] = "completed"
-            print("Completed Amazon.in scraping")
-        except Exception as e:
-            scraper_status["amazon"] = "error"
-            print(f"Error in Amazon.in scraper: {e}")
-
-    # Create and start threads
-    threads = [
-        threading.Thread(target=run_robu_scraper),
-        threading.Thread(target=run_robocraze_scraper),
-        threading.Thread(target=run_amazon_scraper)
-    ]
-
-    # Start all threads
-    for thread in threads:
-        thread.start()
-
-    # Wait for all threads to complete
-    for thread in threads:
-        thread.join()
+    # Scrapers upsert changed rows in place and mark rows they no longer see as
+    # stale, so readers keep seeing the previous snapshot while this runs
+    query_key = normalize_query(search_query)
+
+    # Run all scrapers concurrently with per-site and global deadlines
+    sources = run_scrapers(search_query, SCRAPERS, on_source_done=on_source_done)
+
+    # New rows were written, drop any ranked responses built from the old ones,
+    # here and (through the version in their cache keys) in every other worker
+    bump_results_version(query_key)
+    result_cache.invalidate(query_key)
 
     print("=" * 60)
     print(f"Completed unified search for: {search_query}")
 
-    # Retrieve all results from MongoDB - from all three databases
-    all_products = []
-    
-    # Get products from Robu.in
-    robu_products = list(robu_collection.find({}))
-    for product in robu_products:
-        product["_id"] = str(product["_id"])  # Convert ObjectId to string
-        product["source"] = "Robu.in"
-        all_products.append(product)
-    
-    # Get products from RoboCraze
-    robocraze_products = list(robocraze_collection.find({}))
-    for product in robocraze_products:
-        product["_id"] = str(product["_id"])  # Convert ObjectId to string
-        product["source"] = "RoboCraze"
-        all_products.append(product)
-    
-    # Get products from Amazon
-    amazon_products = list(amazon_collection.find({}))
-    for product in amazon_products:
-        product["_id"] = str(product["_id"])  # Convert ObjectId to string
-        product["source"] = "Amazon.in"
-        all_products.append(product)
-    
-    return all_products
+    # Retrieve all current results for this query from MongoDB
+    products = get_current_products(query_key)
+    if not products and all(info["status"] == "completed" for info in sources.values()):
+        # Every site really has nothing; don't scrape all three again on the next search
+        record_no_results(query_key)
+    return products, sources, 0.0
 
-def check_product_availability():
+def check_product_availability(product_urls=None):
     """
-    Daily job: Check all alerts by scraping product URLs for availability.
+    Check alerts by scraping product URLs for availability (all enabled alerts
+    when product_urls is None). Each product URL is checked once, however many
+    alerts watch it. Returns {product_url: True/False, or None on error}.
     """
-    print("🔁 Running daily product availability check...")
+    global last_availability_run
+    print(f"🔁 Checking availability of {'all' if product_urls is None else len(product_urls)} alerted products...")
 
-    # Get all alerts that are still active
-    alerts = list(alerts_collection.find({"alert_enabled": True}))
+    # Deferred so the web process only loads Selenium when it actually checks alerts
+    from alertscraping import check_availability_batch
 
-    for alert in alerts:
-        product_name = alert["product_name"]
-        product_url = alert.get("product_url", "#")
-        source = alert.get("source", "Unknown")
-        email = alert["email"]
-        price = alert.get("price", "N/A")
-        image_url = alert.get("image_url", "")
+    # Get all alerts that are still active, grouped by the product they watch
+    alert_filter = {"alert_enabled": True}
+    if product_urls is not None:
+        alert_filter["product_url"] = {"$in": product_urls}
+    alerts_by_url = {}
+    for alert in alerts_collection.find(alert_filter):
+        alerts_by_url.setdefault(alert.get("product_url", "#"), []).append(alert)
 
-        print(f"🧐 Checking availability for {product_name} ({source})")
+    results, stats = check_availability_batch(list(alerts_by_url))
 
-        try:
-            is_available = scrape_product_availability(product_url)
-        except Exception as e:
-            print(f"⚠️ Error checking product: {e}")
+    for product_url, is_available in results.items():
+        if is_available is None:
+            print(f"⚠️ Error checking product: {product_url}")
+            continue
+        if not is_available:
+            print(f"🚫 Still not available: {product_url}")
             continue
 
-        if is_available:
+        # Fan out to every subscriber of this product
+        for alert in alerts_by_url[product_url]:
+            product_name = alert["product_name"]
+            source = alert.get("source", "Unknown")
+            price = alert.get("price", "N/A")
+            image_url = alert.get("image_url", "")
             print(f"✅ Available: {product_name}")
 
-            # Send alert email
+            # Send alert email (several alerts for one recipient are merged into a digest)
             subject = f"🎉 {product_name} is now available!"
+            section = f"""
+                <p><strong>{product_name}</strong> from {source}</p>
+                <p>Price: {price}</p>
+                <p><a href="{product_url}">Click here to view the product</a></p>
+                {'<img src="' + image_url + '" width="300"/>' if image_url else ''}
+            """
             message = f"""
             <html>
             <body>
                 <h2>Product Alert: Item Now Available!</h2>
                 <p>Good news! The product you were waiting for is now available:</p>
-                <p><strong>{product_name}</strong> from {source}</p>
-                <p>Price: {price}</p>
-                <p><a href="{product_url}">Click here to view the product</a></p>
-                {'<img src="' + image_url + '" width="300"/>' if image_url else ''}
+                {section}
                 <p>Thank you for using our service!</p>
             </body>
             </html>
             """
-            send_email(email, subject, message)
+            send_email(alert["email"], subject, message, digest_section=section)
 
-            # Mark the alert as sent (disabled)
-            alerts_collection.update_one(
-                {"_id": alert["_id"]},
-                {"$set": {"alert_enabled": False, "availability": "Yes"}}
-            )
+        # Mark the alerts as sent (disabled)
+        alerts_collection.update_many(
+            {"_id": {"$in": [alert["_id"] for alert in alerts_by_url[product_url]]}},
+            {"$set": {"alert_enabled": False, "availability": "Yes"}}
+        )
 
-        else:
-            print(f"🚫 Still not available: {product_name}")
+    stats["alerts"] = sum(len(alerts) for alerts in alerts_by_url.values())
+    stats["finished_at"] = datetime.now().isoformat(timespec="seconds")
+    last_availability_run = stats
+    print(f"[ALERTS] Checked {stats['urls']} URLs for {stats['alerts']} alerts in "
+          f"{stats['duration_seconds']:.1f}s ({stats['urls_per_second'] or 0:.2f} URLs/sec), "
+          f"{stats['available']} available, {stats['errors']} errors, "
+          f"{stats['short_circuited']} short-circuited by HTTP probe, {stats['rendered']} rendered")
+    return results
+
+def alerted_urls():
+    """Every product URL with enabled alerts, and how many alerts watch it."""
+    return {
+        group["_id"]: group["subscribers"]
+        for group in alerts_collection.aggregate([
+            {"$match": {"alert_enabled": True}},
+            {"$group": {"_id": "$product_url", "subscribers": {"$sum": 1}}}
+        ])
+    }
+
+# Checks each alerted URL when it is due instead of everything once a day
+alert_scheduler = AlertScheduler(check_product_availability, alerted_urls)
 
 
 # Schedule the availability check to run periodically
 def start_availability_checker():
-    """Start the availability checker in a background thread."""
-    check_thread = threading.Thread(target=availability_checker_loop)
+    """Start the availability scheduler in a background thread."""
+    check_thread = threading.Thread(target=alert_scheduler.run_forever, name="alert-scheduler")
     check_thread.daemon = True
     check_thread.start()
 
-def availability_checker_loop():
-    """Run the availability checker in a loop."""
-    while True:
-        try:
-            check_product_availability()
-        except Exception as e:
-            print(f"Error in availability checker: {e}")
-        
-        # Sleep for 1 hour before checking again
-        time.sleep(86400)  # 3600 seconds = 1 hour
-
 @app.route("/")
 def home():
     return render_template("index.html")
 
 # Only one search route - the more complete version with ranking
+def parse_search_params(form):
+    """
+    Ranking weights, page size and cursor from a search form.
+    Raises ValueError on malformed numbers.
+    """
+    # Get user preferences for ranking weights (optional, the ranker picks
+    # weights from the query when none are given)
+    weight_fields = {'relevance': "relevance_weight", 'price': "price_weight", 'availability': "availability_weight"}
+    weight_defaults = {'relevance': 0.4, 'price': 0.3, 'availability': 0.3}
+    weights = None
+    if any(field in form for field in weight_fields.values()):
+        weights = {
+            name: float(form.get(field, weight_defaults[name]))
+            for name, field in weight_fields.items()
+        }
+    # Page size ("all" returns every product) and offset cursor of the page
+    limit_param = form.get("limit", str(DEFAULT_PAGE_SIZE))
+    limit = None if limit_param == "all" else max(1, min(int(limit_param), MAX_PAGE_SIZE))
+    cursor = max(0, int(form.get("cursor") or 0))
+    return weights, limit, cursor
+
+def rank_page(products, search_query, weights, limit, cursor=0):
+    """
+    Rank just far enough to fill one page, plus one product to tell whether
+    another page follows. The ranker only reads the (shared) rows.
+    Returns (page, next_cursor) with next_cursor None on the last page.
+    """
+    k = None if limit is None else cursor + limit + 1
+    ranked_results = rank_scraped_products(products, search_query, weights=weights, k=k)
+    page_end = None if limit is None else cursor + limit
+    next_cursor = page_end if page_end is not None and len(ranked_results) > page_end else None
+    return ranked_results[cursor:page_end], next_cursor
+
 @app.route("/search", methods=["POST"])
 def search():
     search_query = request.form.get("query")
@@ -347,45 +352,144 @@ def search():
     # Check for force_refresh parameter
     force_refresh = request.form.get("force_refresh") == "true"
 
-    # Get user preferences for ranking weights (optional)
-    weights = {
-        'relevance': float(request.form.get("relevance_weight", 0.4)),
-        'price': float(request.form.get("price_weight", 0.3)),
-        'availability': float(request.form.get("availability_weight", 0.3))
-    }
-    limit = int(request.form.get("limit", 10))  # Default to 10 if none provided
-
-
-    # Use the unified scraper function with force_refresh option
-
-    if force_refresh:
-        # Clear existing data for this query
-        robu_collection = get_collection_for_query(robu_db, search_query)
-        robocraze_collection = get_collection_for_query(robocraze_db, search_query)
-        amazon_collection = get_collection_for_query(amazon_db, search_query)
-        
-        robu_collection.delete_many({})
-        robocraze_collection.delete_many({})
-        amazon_collection.delete_many({})
-        
-        # Get fresh results
-        results = scrape_all_sites(search_query)
-    else:
-        # Use existing results if available, otherwise scrape
-        results = get_existing_results(search_query)
-        if not results:
-            results = scrape_all_sites(search_query)
-    
-    # Apply Hugging Face RAG-based ranking to the results
-    ranked_results = rank_scraped_products(results, search_query)
-    ranked_results = rank_scraped_products(results, search_query)
-    return jsonify(ranked_results)
+    try:
+        weights, limit, cursor = parse_search_params(request.form)
+    except ValueError:
+        return jsonify({"error": "Invalid weight, limit or cursor"}), 400
+
+    # Serve hot queries straight from memory, skipping the product query and
+    # ranking. The key holds the query's results version, one indexed lookup,
+    # so a rescrape in any worker process makes older responses miss.
+    query_key = normalize_query(search_query)
+    cache_key = (query_key, results_version(query_key), tuple(sorted(weights.items())) if weights else None, limit, cursor)
+    if not force_refresh:
+        cached_body = result_cache.get(cache_key)
+        if cached_body is not None:
+            return Response(cached_body, mimetype="application/json")
+
+    # Use existing results if available. Otherwise queue a scrape and hand back
+    # its job id right away instead of holding this worker for the whole scrape;
+    # the client polls /status/<job_id> and searches again once it is done.
+    stored = None if force_refresh else lookup_stored_results(search_query)
+    if stored is None:
+        try:
+            job_id = scrape_jobs.submit(search_query)
+        except QueueFull:
+            return queue_full_response()
+        return jsonify({"job_id": job_id, "status_url": f"/status/{job_id}"}), 202
+    results, sources, data_age = stored
+
+    page, next_cursor = rank_page(results, search_query, weights, limit, cursor)
+    body = app.json.dumps({
+        "products": page,
+        "next_cursor": next_cursor,
+        "sources": sources,
+        "data_age_seconds": round(data_age)
+    }).encode("utf-8")
+
+    # Stale responses are about to be replaced by the background refresh
+    if not any(info["status"] == "stale" for info in sources.values()):
+        result_cache.put(query_key, cache_key, body)
+
+    return Response(body, mimetype="application/json")
+
+@app.route("/search/stream", methods=["POST"])
+def search_stream():
+    """
+    Same search as /search, streamed as NDJSON so results show up as soon as
+    any source has them. Each line holds the current ranked first page:
+    stored rows go out immediately, a re-ranked page follows whenever a
+    scraper finishes ("source" names it), and the last line has "done": true.
+    """
+    search_query = request.form.get("query")
+    if not search_query:
+        return jsonify({"error": "Search query is required"}), 400
+    force_refresh = request.form.get("force_refresh") == "true"
+    try:
+        weights, limit, _ = parse_search_params(request.form)
+    except ValueError:
+        return jsonify({"error": "Invalid weight, limit or cursor"}), 400
+    query_key = normalize_query(search_query)
+
+    # Fresh rows need no scrape; stale rows already queued their refresh job,
+    # which submit() hands back so the stream can follow it
+    stored = None if force_refresh else lookup_stored_results(search_query)
+    job_id = None
+    if stored is None or any(info["status"] == "stale" for info in stored[1].values()):
+        try:
+            job_id = scrape_jobs.submit(search_query)
+        except QueueFull:
+            if stored is None:
+                return queue_full_response()
+
+    def update(products, sources, data_age, source=None, done=False):
+        page, next_cursor = rank_page(products, search_query, weights, limit)
+        return app.json.dumps({
+            "products": page,
+            "next_cursor": next_cursor if done else None,
+            "sources": sources,
+            "data_age_seconds": round(data_age),
+            "source": source,
+            "done": done
+        }) + "\n"
+
+    def generate():
+        if stored is not None:
+            yield update(*stored, done=job_id is None)
+        if job_id is None:
+            return
+
+        sources = {}
+        for job in scrape_jobs.watch(job_id):
+            if job["status"] == "failed":
+                yield app.json.dumps({"error": job["error"], "done": True}) + "\n"
+                return
+            if job["status"] == "done":
+                yield update(get_current_products(query_key), job["sources"], 0.0, done=True)
+                return
+            # Finished sources have written their rows; the rest still show their previous snapshot
+            changed = [name for name, info in job["sources"].items()
+                       if info["status"] != "pending" and sources.get(name) != info]
+            sources = job["sources"]
+            if changed:
+                yield update(get_current_products(query_key), sources, 0.0, source=changed[-1])
+
+    return Response(generate(), mimetype="application/x-ndjson", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # Keep reverse proxies from buffering the stream
+    })
+
+def queue_full_response():
+    """429 telling the client to retry once the scrape queue drains."""
+    response = jsonify({"error": "Too many searches in progress, please try again shortly"})
+    response.headers["Retry-After"] = "10"
+    return response, 429
 
 @app.route("/status", methods=["GET"])
 def get_status():
-    # This endpoint could be used to check the status of scraping operations
-    # For now, we'll just return a simple status
-    return jsonify({"status": "ready"})
+    # Report readiness along with browser pool occupancy
+    return jsonify({
+        "status": "ready",
+        "driver_pool": driver_pool.stats(),
+        "searches_in_flight": search_flight.in_flight(),
+        "search_cache": dict(cache_stats),
+        "scrape_jobs": scrape_jobs.stats(),
+        "availability_check": last_availability_run,
+        "alert_scheduler": alert_scheduler.stats(),
+        "email_outbox": email_outbox.stats(),
+        "chatbot": chatbot_stats(),
+        "chatlog_writer": chatlog_writer.stats(),
+        "result_cache": result_cache.stats(),
+        "embedding_cache": embedding_cache_stats()
+    })
+
+@app.route("/status/<job_id>", methods=["GET"])
+def get_job_status(job_id):
+    # Progress of a queued scrape: overall status plus each site's status
+    job = scrape_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
 
 @app.route("/enable_alert", methods=["POST"])
 def enable_alert():
@@ -425,6 +529,7 @@ def enable_alert():
     </html>
     """
     send_email(email, subject, message)
+    alert_scheduler.add(product_url)
 
     return jsonify({"message": "Alert enabled for product. You will receive an email confirmation."})
 
@@ -464,6 +569,9 @@ def chatbot():
 
     if not user_message:
         return jsonify({"error": "Message is required"}), 400
+    # The guard and reply cache keep state per bot type, so only known bots are accepted
+    if bot_type not in BOT_TYPES:
+        return jsonify({"error": f"Unknown bot, expected one of: {', '.join(BOT_TYPES)}"}), 400
 
     # Log to terminal
     print(f"[CHATBOT] User ({bot_type}): {user_message}")
@@ -471,8 +579,8 @@ def chatbot():
     # Get response from Gemini
     reply = ask_luffybot(user_message, bot_type)
 
-    # Save to MongoDB
-    chatlog_collection.insert_one({
+    # Save to MongoDB (batched in the background)
+    chatlog_writer.add({
         "bot_type": bot_type,
         "user_message": user_message,
         "bot_reply": reply,
@@ -481,12 +589,78 @@ def chatbot():
 
     return jsonify({"reply": reply})
 
+@app.route("/chatbot/stream", methods=["POST"])
+def chatbot_stream():
+    """
+    Same request as /chatbot, answered as Server-Sent Events: one "data"
+    event per reply chunk ({"text": ...}) and a final "done" event.
+    The full transcript is logged once the reply is complete.
+    """
+    data = request.get_json()
+    user_message = data.get("message", "")
+    bot_type = data.get("bot", "luffy")
+
+    if not user_message:
+        return jsonify({"error": "Message is required"}), 400
+    # The guard and reply cache keep state per bot type, so only known bots are accepted
+    if bot_type not in BOT_TYPES:
+        return jsonify({"error": f"Unknown bot, expected one of: {', '.join(BOT_TYPES)}"}), 400
+
+    print(f"[CHATBOT] User ({bot_type}, streaming): {user_message}")
+
+    def generate():
+        chunks = []
+        try:
+            for chunk in stream_luffybot(user_message, bot_type):
+                chunks.append(chunk)
+                yield f"data: {json.dumps({'text': chunk})}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        finally:
+            # Logged even if the browser went away mid-reply
+            chatlog_writer.add({
+                "bot_type": bot_type,
+                "user_message": user_message,
+                "bot_reply": "".join(chunks),
+                "timestamp": time.time()
+            })
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Web-Based Component Aggregator")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print an import-time breakdown of app startup and exit")
+    parser.add_argument("--warm-up", action="store_true",
+                        help="load the ranking model before serving the first request")
+    args = parser.parse_args()
+
+    if args.startup_report:
+        from startup_report import print_startup_report
+        print_startup_report("app")
+        raise SystemExit(0)
+
+    # Deferred: only the process that opens the tunnel needs pyngrok
+    from pyngrok import ngrok
+    ngrok.set_auth_token(os.getenv("NGROK_AUTH_TOKEN"))
+
+    # Make sure the products collection is indexed
+    ensure_indexes()
+
+    if args.warm_up:
+        warm_up()
+
     # Start availability checker in background
     start_availability_checker()
 
+    # Send mail and run scrape jobs still queued from before the restart
+    email_outbox.start()
+    scrape_jobs.start()
+
     # Start ngrok tunnel with your reserved domain
     try:
         public_url = ngrok.connect(
@@ -507,3 +681,7 @@ if __name__ == "__main__":
         if public_url:
             ngrok.disconnect(public_url)
         ngrok.kill()
+        scrape_jobs.shutdown()
+        alert_scheduler.shutdown()
+        email_outbox.shutdown()
+        driver_pool.shutdown()
@@ -0,0 +1,139 @@
+"""
+Scraper write throughput: one insert_one per product (the old path) against
+ProductWriter's batched, unordered bulk_write at several batch sizes.
+
+    python benchmarks/bulk_writes.py                     # local mongod (MONGO_URI)
+    python benchmarks/bulk_writes.py --mongomock --rtt-ms 1
+
+mongomock has no network, so --rtt-ms adds a simulated round trip to every
+database call; against a real server leave it at 0. mongomock emulates
+updates in Python, so its timings overstate the bulk path's cost; the round
+trip count is what carries over to a real server. mongomock 4.3 needs
+pymongo < 4.11 for bulk updates, as pinned in requirements-dev.txt; with a
+newer pymongo --mongomock exits with a message instead of a traceback.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import ProductWriter, MONGO_URI  # noqa: E402
+
+SCRATCH_DB = "benchmark_db"
+
+
+def check_mongomock_bulk_writes(db):
+    """Exit with a clear message if this mongomock can't run bulk updates with the installed pymongo."""
+    from pymongo import UpdateOne, version
+    try:
+        db["probe"].bulk_write([UpdateOne({"_id": 1}, {"$set": {"probe": True}}, upsert=True)])
+    except TypeError as e:
+        sys.exit(f"mongomock can't run bulk updates with pymongo {version} ({e}).\n"
+                 "Install the pair pinned in requirements-dev.txt: pip install -r requirements-dev.txt")
+    finally:
+        db.drop_collection("probe")
+
+
+class RoundTripCollection:
+    """Collection wrapper that sleeps `rtt` seconds per database call."""
+
+    CALLS = {"insert_one", "bulk_write", "find", "insert_many"}
+
+    def __init__(self, collection, rtt):
+        self._collection = collection
+        self._rtt = rtt
+        self.round_trips = 0
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if name not in self.CALLS:
+            return attribute
+
+        def call(*args, **kwargs):
+            self.round_trips += 1
+            if self._rtt:
+                time.sleep(self._rtt)
+            return attribute(*args, **kwargs)
+        return call
+
+
+def fake_products(count, query, price_offset=0):
+    return [{
+        "name": f"{query} variant {i}",
+        "price": f"₹{499 + i + price_offset}.00",
+        "availability": "Yes" if i % 3 else "No",
+        "image_url": f"https://example.com/img/{i}.jpg",
+        "product_link": f"https://example.com/product/{query.replace(' ', '-')}-{i}",
+        "search_query": query,
+        "timestamp": time.time(),
+    } for i in range(count)]
+
+
+def run_insert_one(collection, products):
+    for product in products:
+        collection.insert_one(dict(product))
+
+
+def run_product_writer(collection, products, batch_size):
+    writer = ProductWriter("Benchmark", products[0]["search_query"], batch_size=batch_size)
+    writer.collection = collection
+    with writer:
+        for product in products:
+            writer.add(dict(product))
+    return writer
+
+
+def timed(label, count, fn, collection):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<34} {elapsed * 1000:9.1f} ms  {count / elapsed:10.0f} products/s  {collection.round_trips:6d} round trips")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-product inserts with batched bulk writes.")
+    parser.add_argument("--uri", default=MONGO_URI)
+    parser.add_argument("--mongomock", action="store_true", help="use an in-memory mongomock server instead of mongod")
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="simulated round-trip time per database call")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[10, 100, 500])
+    args = parser.parse_args()
+
+    if args.mongomock:
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        from pymongo import MongoClient
+        client = MongoClient(args.uri)
+    db = client[SCRATCH_DB]
+    if args.mongomock:
+        check_mongomock_bulk_writes(db)
+    rtt = args.rtt_ms / 1000
+
+    print(f"{args.products} products, {'mongomock' if args.mongomock else args.uri}, simulated RTT {args.rtt_ms} ms\n")
+    try:
+        db.drop_collection("products")
+        collection = RoundTripCollection(db["products"], rtt)
+        products = fake_products(args.products, "raspberry pi")
+        timed("insert_one per product (old)", args.products, lambda: run_insert_one(collection, products), collection)
+
+        for batch_size in args.batch_sizes:
+            db.drop_collection("products")
+            db["products"].create_index("product_link", unique=True)
+            collection = RoundTripCollection(db["products"], rtt)
+            timed(f"ProductWriter, batch {batch_size}, new", args.products,
+                  lambda: run_product_writer(collection, products, batch_size), collection)
+
+            # Re-scraping unchanged listings only reads; half of them changed price here
+            collection = RoundTripCollection(db["products"], rtt)
+            rescrape = products[:args.products // 2] + fake_products(args.products, "raspberry pi", price_offset=1)[args.products // 2:]
+            timed(f"ProductWriter, batch {batch_size}, rescrape", args.products,
+                  lambda: run_product_writer(collection, rescrape, batch_size), collection)
+    finally:
+        client.drop_database(SCRATCH_DB)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Ranking cost without the model. Scoring: the old per-item loop (one cosine
+and one set of heuristics per product) against score_products. Ordering: the
+old exact-name grouping plus full sort against group_listings (MinHash
+matching across sources, which does more work) plus the top-k heap, both
+on first sight of a listing set and when its groups are reused from the
+cache (every further page of the same search).
+
+    python benchmarks/ranking.py
+    python benchmarks/ranking.py --sizes 100 1000 10000 --k 20
+
+Embeddings are random vectors of the model's width, so only scoring,
+grouping and ordering are timed; encoding is covered by the embedding cache.
+The old loop called torch's cos_sim per product; numpy is used here, which
+makes the per-item baseline faster than it was.
+"""
+import argparse
+import heapq
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ml_ranker  # noqa: E402
+from product_matching import group_listings, _group_listings  # noqa: E402
+
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+QUERY = "raspberry pi 4"
+
+BOARDS = ["Raspberry Pi 4 Model B", "Raspberry Pi 3 Model B+", "ESP32 DevKit", "Arduino Uno R3", "STM32 Blue Pill"]
+EXTRAS = ["", "Case", "Starter Kit", "Cable", "Sensor Module", "Official"]
+
+
+def fake_products(count):
+    rng = np.random.RandomState(7)
+    return [{
+        "name": f"{BOARDS[i % len(BOARDS)]} {EXTRAS[i % len(EXTRAS)]} {rng.choice(['2GB', '4GB', '8GB'])} v{i // 30}",
+        "price": f"₹{rng.randint(99, 9999):,}.00",
+        "availability": "Yes" if i % 4 else "No",
+        "source": ["Robu.in", "RoboCraze", "Amazon.in"][i % 3],
+        "product_link": f"https://example.com/product/{i}",
+    } for i in range(count)]
+
+
+def per_item_scores(products, query, query_embedding, embeddings, weights):
+    """The loop rank_scraped_products used before scoring was batched."""
+    scores = []
+    for i, p in enumerate(products):
+        semantic = float(np.dot(query_embedding, embeddings[i]) /
+                         (np.linalg.norm(query_embedding) * np.linalg.norm(embeddings[i])))
+        bonus = (ml_ranker.simplicity_bonus(p['name']) + ml_ranker.official_bias(p['name']) +
+                 ml_ranker.token_match_bonus(p['name'], query) + ml_ranker.board_bonus(p['name']))
+        scores.append(weights['relevance'] * semantic +
+                      weights['price'] * ml_ranker.normalize_price(p.get('price', '')) +
+                      weights['availability'] * ml_ranker.availability_score(p.get('availability', 'unknown')) +
+                      bonus - ml_ranker.accessory_penalty(p['name'], query))
+    return scores
+
+
+def exact_order(products, scores):
+    """Old ordering: top listing per exact core name, full sort."""
+    grouped = {}
+    for score, p in zip(scores, products):
+        grouped.setdefault(ml_ranker.extract_core_name(p['name']), []).append((score, p))
+    deduped = [sorted(group, key=lambda x: x[0], reverse=True)[0] for group in grouped.values()]
+    return [p for _, p in sorted(deduped, key=lambda x: x[0], reverse=True)]
+
+
+def matched_order(products, scores, k):
+    """Current ordering: MinHash-matched groups, top k only."""
+    groups = group_listings([ml_ranker.extract_core_name(p['name']) for p in products],
+                            [p['source'] for p in products])
+    best = [max(group, key=lambda i: scores[i]) for group in groups]
+    top_groups = heapq.nsmallest(k, range(len(groups)), key=lambda g: -scores[best[g]])
+    return [products[best[g]] for g in top_groups]
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the per-item ranking loop with batched scoring.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--k", type=int, default=20, help="results requested from the batched ranker")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement, the best one is reported")
+    args = parser.parse_args()
+
+    weights = ml_ranker.dynamic_weights(QUERY)
+    rng = np.random.RandomState(0)
+    query_embedding = rng.randn(EMBEDDING_DIM).astype(np.float32)
+
+    print(f"{'products':>9} {'per-item scores':>16} {'score_products':>15} {'speedup':>8} "
+          f"{'exact order':>12} {'matched top-k':>14} {'cached groups':>14}")
+    for size in args.sizes:
+        products = fake_products(size)
+        embeddings = rng.randn(size, EMBEDDING_DIM).astype(np.float32)
+        scores = ml_ranker.score_products(products, QUERY, query_embedding, embeddings, weights)
+
+        old = best_of(args.repeat, lambda: per_item_scores(products, QUERY, query_embedding, embeddings, weights))
+        new = best_of(args.repeat, lambda: ml_ranker.score_products(products, QUERY, query_embedding, embeddings, weights))
+        exact = best_of(args.repeat, lambda: exact_order(products, scores))
+        matched = best_of(args.repeat, lambda: (_group_listings.cache_clear(), matched_order(products, scores, args.k)))
+        cached = best_of(args.repeat, lambda: matched_order(products, scores, args.k))
+        print(f"{size:>9} {old * 1000:>13.1f} ms {new * 1000:>12.1f} ms {old / new:>7.1f}x "
+              f"{exact * 1000:>9.1f} ms {matched * 1000:>11.1f} ms {cached * 1000:>11.1f} ms")
+
+if __name__ == "__main__":
+    main()
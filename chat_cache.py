@@ -0,0 +1,132 @@
+from collections import OrderedDict, Counter
+import numpy as np
+import threading
+import time
+
+# Cache configuration
+CHAT_CACHE_SIZE = 768  # Replies kept across all bot types
+CHAT_CACHE_TTL = 6 * 3600  # Seconds a cached reply stays valid
+SIMILARITY_THRESHOLD = 0.93  # Cosine similarity for a paraphrased question to reuse a reply
+EMBEDDING_CACHE_SIZE = 512  # Message embeddings kept for repeated lookups
+
+
+def normalize_message(message):
+    """Canonical form of a chat message for exact-match lookups."""
+    return " ".join(message.lower().split()).rstrip("?!. ")
+
+
+class ChatResponseCache:
+    """
+    Cache of chatbot replies, looked up per bot type.
+    Lookups try the normalized message first, then the most similar cached
+    question of the same bot by sentence embedding (`embed_fn`, unit-normalized here).
+    All bots share one LRU of at most `max_entries` replies, so the bound holds
+    whatever bot names callers send; replies live for `ttl` seconds.
+    If embedding fails, the cache falls back to exact matches.
+    """
+
+    def __init__(self, embed_fn, max_entries=CHAT_CACHE_SIZE, ttl=CHAT_CACHE_TTL, threshold=SIMILARITY_THRESHOLD):
+        self.embed_fn = embed_fn
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries = OrderedDict()  # (bot_type, key) -> (reply, embedding or None, expires_at, upstream_seconds)
+        self._embeddings = OrderedDict()  # normalized message -> unit embedding, LRU
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.embed_errors = 0
+
+    def _embed(self, key):
+        with self._lock:
+            embedding = self._embeddings.get(key)
+            if embedding is not None:
+                self._embeddings.move_to_end(key)
+                return embedding
+        embedding = np.asarray(self.embed_fn(key), dtype=np.float32)
+        embedding = embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+        with self._lock:
+            self._embeddings[key] = embedding
+            while len(self._embeddings) > EMBEDDING_CACHE_SIZE:
+                self._embeddings.popitem(last=False)
+        return embedding
+
+    def _try_embed(self, key):
+        """The message's embedding, or None if the model is unavailable."""
+        try:
+            return self._embed(key)
+        except Exception as e:
+            print(f"[CHATBOT] Semantic lookup unavailable: {e}")
+            with self._lock:
+                self.embed_errors += 1
+            return None
+
+    def _drop_expired(self):
+        """Remove expired entries (call with the lock held)."""
+        now = time.time()
+        for cache_key in [cache_key for cache_key, entry in self._entries.items() if entry[2] <= now]:
+            del self._entries[cache_key]
+
+    def get(self, bot_type, message):
+        """Return (reply, kind) with kind "exact" or "semantic", or (None, None) on a miss."""
+        key = normalize_message(message)
+        with self._lock:
+            self._drop_expired()
+            entry = self._entries.get((bot_type, key))
+            if entry is not None:
+                self._entries.move_to_end((bot_type, key))
+                self.exact_hits += 1
+                self.saved_seconds += entry[3]
+                return entry[0], "exact"
+            keys = [cache_key for cache_key, entry in self._entries.items()
+                    if cache_key[0] == bot_type and entry[1] is not None]
+            if not keys:
+                self.misses += 1
+                return None, None
+            matrix = np.stack([self._entries[cache_key][1] for cache_key in keys])
+
+        # Embed outside the lock, the model call is the slow part
+        embedding = self._try_embed(key)
+        if embedding is None:
+            with self._lock:
+                self.misses += 1
+            return None, None
+        similarities = matrix @ embedding
+        best = int(np.argmax(similarities))
+        with self._lock:
+            entry = self._entries.get(keys[best])
+            if similarities[best] >= self.threshold and entry is not None and entry[2] > time.time():
+                self._entries.move_to_end(keys[best])
+                self.semantic_hits += 1
+                self.saved_seconds += entry[3]
+                return entry[0], "semantic"
+            self.misses += 1
+            return None, None
+
+    def put(self, bot_type, message, reply, upstream_seconds):
+        """Cache a reply that took `upstream_seconds` to fetch."""
+        key = normalize_message(message)
+        embedding = self._try_embed(key)  # Without one the reply is still found by exact match
+        with self._lock:
+            self._drop_expired()
+            self._entries[(bot_type, key)] = (reply, embedding, time.time() + self.ttl, upstream_seconds)
+            self._entries.move_to_end((bot_type, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """Hit-rate and saved upstream latency for the /status endpoint."""
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            hits = self.exact_hits + self.semantic_hits
+            return {
+                "entries": dict(Counter(bot_type for bot_type, _ in self._entries)),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 3) if lookups else None,
+                "saved_upstream_seconds": round(self.saved_seconds, 2),
+                "embed_errors": self.embed_errors,
+            }
@@ -0,0 +1,267 @@
+from pymongo import MongoClient, ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+from urllib.parse import urlsplit, parse_qs, urljoin
+from datetime import datetime, timedelta
+import re
+import time
+import os
+
+# MongoDB configuration
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", 100))  # Operations per bulk_write round trip
+STALE_RETENTION_DAYS = 7  # Listings no query returns anymore are deleted after this long
+
+# Amazon product pages are identified by their ASIN, whatever the link around it
+AMAZON_ASIN_PATTERN = re.compile(r"/(?:dp|gp/product|gp/aw/d)/([A-Z0-9]{10})(?:[/?]|$)")
+
+# One pooled client shared by the app and every scraper
+client = MongoClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
+
+# Every scraped listing from every site lives in one collection.
+# "normalized_query" holds each normalized query the listing was found under,
+# so a product seen by several searches is stored (and indexed) once.
+# "stale_for" lists the queries whose latest refresh no longer returned it;
+# once it lists every query, "expires_at" is set and the row expires.
+products_db = client["products_db"]
+products_collection = products_db["products"]
+
+# When each (query, source) pair last completed a full refresh
+refreshes_collection = products_db["refreshes"]
+NO_RESULTS_SOURCE = "*"  # Source of the refreshes row recording that every site found nothing
+# Source of the refreshes row whose "version" goes up after every scrape of the
+# query, complete or not, so each process can tell its cached responses are outdated
+RESULTS_VERSION_SOURCE = "#version"
+
+# Last probe of each alerted product page: HTTP validators, stock fragment
+# hash and the availability they map to (see alertscraping.py)
+page_states_collection = client["alerts_db"]["page_states"]
+
+# Mail waiting to be sent, being sent, or recently sent (see email_outbox.py)
+email_outbox_collection = client["alerts_db"]["email_outbox"]
+
+# Queued, running and recently finished scrape jobs (see scrape_jobs.py)
+scrape_jobs_collection = products_db["scrape_jobs"]
+
+
+def normalize_query(search_query):
+    """Canonical form of a search query: lowercase with collapsed whitespace."""
+    return " ".join(search_query.lower().split())
+
+
+def canonical_link(link):
+    """
+    Stable form of a product link, used as the product's unique key. Search
+    result links carry per-search tracking parameters (Amazon's ref/qid/sr,
+    Shopify's _pos/_sid), so the query string and fragment are dropped;
+    Amazon links, including sponsored /sspa/click redirects, become /dp/<ASIN>.
+    """
+    parts = urlsplit(link)
+    if "amazon." in parts.netloc:
+        if parts.path.startswith("/sspa/click"):
+            target = parse_qs(parts.query).get("url")
+            if target:
+                return canonical_link(urljoin(f"{parts.scheme}://{parts.netloc}", target[0]))
+        asin = AMAZON_ASIN_PATTERN.search(parts.path)
+        if asin:
+            return f"{parts.scheme}://{parts.netloc}/dp/{asin.group(1)}"
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+def record_no_results(query):
+    """Remember that a complete scrape of every source found nothing for `query` (normalized)."""
+    refreshes_collection.update_one(
+        {"normalized_query": query, "source": NO_RESULTS_SOURCE},
+        {"$set": {"refreshed_at": time.time()}},
+        upsert=True
+    )
+
+
+def bump_results_version(query):
+    """Record that the stored listings for `query` (normalized) may have changed."""
+    refreshes_collection.update_one(
+        {"normalized_query": query, "source": RESULTS_VERSION_SOURCE},
+        {"$inc": {"version": 1}},
+        upsert=True
+    )
+
+
+def results_version(query):
+    """How often the listings for `query` (normalized) have been rescraped, 0 if never."""
+    doc = refreshes_collection.find_one({"normalized_query": query, "source": RESULTS_VERSION_SOURCE}, {"version": 1})
+    return doc["version"] if doc else 0
+
+
+def ensure_indexes():
+    """Create the indexes the search and refresh paths rely on (idempotent)."""
+    products_collection.create_index(
+        [("normalized_query", ASCENDING), ("source", ASCENDING), ("timestamp", DESCENDING)],
+        name="query_source_timestamp"
+    )
+    products_collection.create_index("product_link", unique=True, name="unique_product_link")
+    products_collection.create_index("expires_at", expireAfterSeconds=0, name="expire_unlisted_products")
+    refreshes_collection.create_index(
+        [("normalized_query", ASCENDING), ("source", ASCENDING)],
+        unique=True, name="unique_query_source"
+    )
+    page_states_collection.create_index("product_url", unique=True, name="unique_product_url")
+    email_outbox_collection.create_index([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt")
+    email_outbox_collection.create_index("expires_at", expireAfterSeconds=0, name="expire_sent_mail")
+    # At most one queued or running job per query; finished jobs expire on their own
+    scrape_jobs_collection.create_index(
+        "normalized_query", unique=True, name="unique_active_query",
+        partialFilterExpression={"active": True}
+    )
+    scrape_jobs_collection.create_index([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created")
+    scrape_jobs_collection.create_index("expires_at", expireAfterSeconds=0, name="expire_finished_jobs")
+
+
+class BulkWriter:
+    """
+    Buffer write operations and send them with unordered bulk_write calls.
+    Use as a context manager so the last partial batch is always flushed.
+    """
+
+    def __init__(self, collection, batch_size=WRITE_BATCH_SIZE):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.buffer = []
+        self.written = 0
+
+    def add(self, operation):
+        self.buffer.append(operation)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far. Returns the number of documents written."""
+        if not self.buffer:
+            return 0
+        batch, self.buffer = self.buffer, []
+        try:
+            result = self.collection.bulk_write(batch, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            # Unordered writes keep going past bad operations, count what made it
+            details = e.details
+            print(f"Bulk write to {self.collection.name} partially failed: {len(details.get('writeErrors', []))} errors")
+        written = details.get("nInserted", 0) + details.get("nUpserted", 0) + details.get("nModified", 0)
+        self.written += written
+        return written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+        return False
+
+
+class ProductWriter(BulkWriter):
+    """
+    BulkWriter that upserts scraped products into the unified products collection.
+    Only new listings and listings whose price or availability changed are
+    written; unchanged rows are left untouched.
+    """
+
+    def __init__(self, source, search_query, batch_size=WRITE_BATCH_SIZE):
+        super().__init__(products_collection, batch_size)
+        self.source = source
+        self.normalized_query = normalize_query(search_query)
+        self.seen_links = set()
+        self.unchanged = 0
+
+    def add(self, product_data):
+        link = product_data.get("product_link", "")
+        if not link.startswith("http"):
+            # product_link is the unique key, listings without one cannot be stored
+            print(f"Skipping product without a link: {product_data.get('name')}")
+            return
+        link = canonical_link(link)
+        self.seen_links.add(link)
+        self.buffer.append(dict(product_data, source=self.source, product_link=link))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Diff the buffered products against what is stored and write only the changes."""
+        if not self.buffer:
+            return 0
+        products, self.buffer = self.buffer, []
+        query = self.normalized_query
+
+        existing = {
+            doc["product_link"]: doc
+            for doc in self.collection.find(
+                {"product_link": {"$in": [product["product_link"] for product in products]}},
+                {"product_link": 1, "price": 1, "availability": 1, "normalized_query": 1, "stale_for": 1, "expires_at": 1}
+            )
+        }
+
+        for product in products:
+            link = product["product_link"]
+            current = existing.get(link)
+            if current is None:
+                self.buffer.append(UpdateOne(
+                    {"product_link": link},
+                    {"$set": product, "$addToSet": {"normalized_query": query}},
+                    upsert=True
+                ))
+                continue
+
+            update = {}
+            if current.get("price") != product["price"] or current.get("availability") != product["availability"]:
+                update["$set"] = product
+            if query not in current.get("normalized_query", []):
+                update["$addToSet"] = {"normalized_query": query}
+            if query in current.get("stale_for", []):
+                update["$pull"] = {"stale_for": query}
+            if "expires_at" in current:
+                update["$unset"] = {"expires_at": ""}
+
+            if update:
+                self.buffer.append(UpdateOne({"product_link": link}, update))
+            else:
+                self.unchanged += 1
+
+        return super().flush()
+
+    def finish(self):
+        """
+        Complete a full refresh: flush, mark this source's listings for the query
+        that were not seen this time as stale, let the ones now stale for
+        every query expire, and record the refresh time.
+        Only call this after a complete pass, never after a partial scrape.
+        """
+        self.flush()
+        if not self.seen_links:
+            # An empty pass is more likely a broken page than a sold-out catalogue
+            return
+        query = self.normalized_query
+        result = self.collection.update_many(
+            {
+                "normalized_query": query,
+                "source": self.source,
+                "product_link": {"$nin": list(self.seen_links)},
+                "stale_for": {"$ne": query}
+            },
+            {"$addToSet": {"stale_for": query}}
+        )
+        expiring = self.collection.update_many(
+            {
+                "normalized_query": query,
+                "source": self.source,
+                "stale_for": query,
+                "expires_at": {"$exists": False},
+                # stale_for only ever holds queries from normalized_query,
+                # so equal sizes mean every query the listing was found under is stale
+                "$expr": {"$eq": [{"$size": "$normalized_query"}, {"$size": "$stale_for"}]}
+            },
+            {"$set": {"expires_at": datetime.utcnow() + timedelta(days=STALE_RETENTION_DAYS)}}
+        )
+        refreshes_collection.update_one(
+            {"normalized_query": query, "source": self.source},
+            {"$set": {"refreshed_at": time.time()}},
+            upsert=True
+        )
+        print(f"{self.source} refresh for '{query}': {self.written} written, {self.unchanged} unchanged, {result.modified_count} marked stale, {expiring.modified_count} set to expire")
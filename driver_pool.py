@@ -0,0 +1,158 @@
+from selenium.common.exceptions import WebDriverException
+from contextlib import contextmanager
+import threading
+import time
+import os
+
+# Pool configuration
+MAX_DRIVERS = int(os.getenv("MAX_DRIVERS", 4))  # Upper bound on live Chrome sessions
+MAX_PAGES_PER_DRIVER = int(os.getenv("MAX_PAGES_PER_DRIVER", 50))  # Recycle a session after this many uses
+CHECKOUT_TIMEOUT = 60  # Seconds to wait for a free driver before giving up
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0 Safari/537.36"
+
+
+def create_driver():
+    """Start a new headless Chrome session with the options shared by all scrapers."""
+    # Deferred: selenium.webdriver imports every browser binding
+    from selenium import webdriver
+
+    chrome_options = webdriver.ChromeOptions()
+    chrome_options.add_argument("--disable-blink-features=AutomationControlled")  # Bypass detection
+    chrome_options.add_argument("--start-maximized")
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument(f"user-agent={USER_AGENT}")
+    return webdriver.Chrome(options=chrome_options)
+
+
+class DriverPool:
+    """
+    Process-wide pool of warm Chrome sessions.
+    Drivers are checked out for one page load / scrape and checked back in afterwards.
+    """
+
+    def __init__(self, max_size=MAX_DRIVERS, max_pages=MAX_PAGES_PER_DRIVER):
+        self.max_size = max_size
+        self.max_pages = max_pages
+        self._idle = []  # Warm drivers waiting to be reused
+        self._pages = {}  # id(driver) -> number of checkouts served
+        self._in_use = 0
+        self._created = 0
+        self._recycled = 0
+        self._cond = threading.Condition()
+
+    def _is_healthy(self, driver):
+        """Cheap round trip to make sure the browser is still alive."""
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _reset(self, driver):
+        """Clear tab state so the next user starts from a blank page."""
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.delete_all_cookies()
+        driver.get("about:blank")
+
+    def _destroy(self, driver):
+        """Quit a driver. Never call this with the lock held, a hung browser can take long to quit."""
+        self._pages.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def checkout(self, timeout=CHECKOUT_TIMEOUT):
+        """Borrow a driver, starting a new one if the pool is not full yet."""
+        deadline = time.time() + timeout
+        with self._cond:
+            while not self._idle and self._in_use >= self.max_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutError("No Chrome driver available in the pool")
+                self._cond.wait(remaining)
+            # Reserve the slot now; the idle driver is checked outside the lock
+            self._in_use += 1
+            driver = self._idle.pop() if self._idle else None
+
+        # Health checks and quits are WebDriver round trips, a hung browser
+        # must not block every other checkout and checkin
+        if driver is not None:
+            if self._is_healthy(driver):
+                return driver
+            print("[DRIVER POOL] Discarding unhealthy driver")
+            self._destroy(driver)
+
+        # Start a browser in the reserved slot, also outside the lock (it takes a few seconds)
+        try:
+            driver = create_driver()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._created += 1
+            self._pages[id(driver)] = 0
+        return driver
+
+    def checkin(self, driver, broken=False):
+        """Return a driver to the pool, recycling it if it is worn out or broken."""
+        self._pages[id(driver)] = self._pages.get(id(driver), 0) + 1
+        if not broken and self._pages[id(driver)] < self.max_pages:
+            try:
+                self._reset(driver)
+            except WebDriverException:
+                broken = True
+        else:
+            broken = True
+
+        if broken:
+            self._destroy(driver)
+        with self._cond:
+            self._in_use -= 1
+            if broken:
+                self._recycled += 1
+            else:
+                self._idle.append(driver)
+            self._cond.notify()
+
+    @contextmanager
+    def driver(self, timeout=CHECKOUT_TIMEOUT):
+        """Context manager wrapping checkout/checkin."""
+        driver = self.checkout(timeout)
+        broken = False
+        try:
+            yield driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.checkin(driver, broken=broken)
+
+    def stats(self):
+        """Pool occupancy for the /status endpoint."""
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "created": self._created,
+                "recycled": self._recycled,
+            }
+
+    def shutdown(self):
+        """Quit all idle drivers."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self._destroy(driver)
+
+
+# Shared pool used by all scrapers
+driver_pool = DriverPool()
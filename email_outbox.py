@@ -0,0 +1,244 @@
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from datetime import datetime, timedelta
+import threading
+import smtplib
+import random
+import uuid
+import time
+import os
+
+# SMTP configuration. Point EMAIL_HOST/EMAIL_PORT at a local stand-in
+# (e.g. `python -m aiosmtpd -n -l localhost:8025`, EMAIL_STARTTLS=false) for testing.
+EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587))
+EMAIL_STARTTLS = os.getenv("EMAIL_STARTTLS", "true").lower() != "false"
+EMAIL_FROM = "Multi-Site Product Finder <multisiteproductfinder@gmail.com>"
+EMAIL_REPLY_TO = "multisiteproductfinder@gmail.com"
+
+# Outbox configuration
+SEND_BATCH_SIZE = 100  # Messages claimed per drain
+MAX_ATTEMPTS = 6  # Give up on a message after this many failures
+RETRY_BASE_SECONDS = 30  # Retry delays: 30s, 60s, 120s, ... (with jitter)
+CLAIM_LEASE_SECONDS = 300  # Messages claimed by a sender that died are retried after this
+SMTP_IDLE_SECONDS = 60  # Close the SMTP session after this long without mail
+SMTP_CHECK_AFTER_SECONDS = 10  # A session idle longer than this is checked with NOOP before reuse
+POLL_INTERVAL = 5.0  # Seconds between checks for mail queued by other processes
+SMTP_TIMEOUT = 30
+DIGEST_DELAY_SECONDS = 60  # Alert mails wait this long so alerts firing together share a digest
+SENT_RETENTION_DAYS = 7  # Sent messages are kept this long, then expire
+
+
+def build_message(recipient, subject, html):
+    msg = MIMEMultipart()
+    msg['From'] = EMAIL_FROM
+    msg['To'] = recipient
+    msg['Subject'] = subject
+    msg['Reply-To'] = EMAIL_REPLY_TO
+    msg.attach(MIMEText(html, 'html'))
+    return msg
+
+
+def build_digest(recipient, sections):
+    """One email covering several fired alerts for the same recipient."""
+    subject = f"🎉 {len(sections)} products you're watching are now available!"
+    html = f"""
+    <html>
+    <body>
+        <h2>Product Alert: Items Now Available!</h2>
+        <p>Good news! Several products you were waiting for are now available:</p>
+        {"<hr/>".join(sections)}
+        <p>Thank you for using our service!</p>
+    </body>
+    </html>
+    """
+    return build_message(recipient, subject, html)
+
+
+class EmailOutbox:
+    """
+    Persistent outbox for outgoing mail.
+    Requests only insert a document; a background sender drains the outbox
+    over one reused, authenticated SMTP session, merges alert mails for the
+    same recipient into a digest, and retries failures with exponential backoff.
+    """
+
+    def __init__(self, collection, username=None, password=None,
+                 host=EMAIL_HOST, port=EMAIL_PORT, starttls=EMAIL_STARTTLS):
+        self.collection = collection
+        self.username = username
+        self.password = password
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self._smtp = None
+        self._last_used = 0
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None  # The sender thread doesn't survive fork, so track which process started it
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.digests = 0
+        self.connections = 0
+
+    def _ensure_sender(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="email-outbox", daemon=True).start()
+
+    def start(self):
+        """Start draining at startup, so mail left over from a previous run goes out without waiting for new mail."""
+        self._ensure_sender()
+
+    def enqueue(self, recipient, subject, html, digest_section=None):
+        """
+        Queue a message. `digest_section` is an HTML fragment describing one alert;
+        alerts for the same recipient that are waiting together go out as one digest.
+        """
+        self._ensure_sender()
+        now = time.time()
+        send_at = now + DIGEST_DELAY_SECONDS if digest_section else now
+        self.collection.insert_one({
+            "recipient": recipient,
+            "subject": subject,
+            "html": html,
+            "digest_section": digest_section,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": send_at,
+            "created_at": now,
+        })
+        self._wakeup.set()
+
+    def _claim(self):
+        """Take a batch of due messages (and ones whose sender died) for this sender."""
+        now = time.time()
+        due = {"$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "sending", "claimed_at": {"$lt": now - CLAIM_LEASE_SECONDS}}
+        ]}
+        ids = [doc["_id"] for doc in self.collection.find(due, {"_id": 1}).limit(SEND_BATCH_SIZE)]
+        if not ids:
+            return []
+        claim = uuid.uuid4().hex
+        self.collection.update_many(
+            {"_id": {"$in": ids}, **due},
+            {"$set": {"status": "sending", "claim": claim, "claimed_at": now}}
+        )
+        return list(self.collection.find({"claim": claim, "status": "sending"}))
+
+    def _connection(self):
+        """Authenticated SMTP session, reused while it stays alive."""
+        if self._smtp is not None and time.time() - self._last_used < SMTP_CHECK_AFTER_SECONDS:
+            return self._smtp
+        if self._smtp is not None:
+            try:
+                self._smtp.noop()
+                return self._smtp
+            except smtplib.SMTPException:
+                self._close()
+        smtp = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+        if self.starttls:
+            smtp.starttls()
+        if self.username:
+            smtp.login(self.username, self.password)
+        self._smtp = smtp
+        self.connections += 1
+        return smtp
+
+    def _close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            pass
+        self._smtp = None
+
+    def _fail(self, docs, error, permanent=False):
+        for doc in docs:
+            attempts = doc.get("attempts", 0) + 1
+            if permanent or attempts >= MAX_ATTEMPTS:
+                update = {"status": "failed", "attempts": attempts, "error": str(error)}
+                self.failed += 1
+            else:
+                delay = RETRY_BASE_SECONDS * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+                update = {"status": "pending", "attempts": attempts, "error": str(error),
+                          "next_attempt_at": time.time() + delay}
+                self.retried += 1
+            self.collection.update_one({"_id": doc["_id"]}, {"$set": update, "$unset": {"claim": ""}})
+
+    def _send_batch(self, docs):
+        # Alerts waiting for the same recipient are merged into one digest
+        messages = []
+        digests = {}
+        for doc in docs:
+            if doc.get("digest_section"):
+                digests.setdefault(doc["recipient"], []).append(doc)
+            else:
+                messages.append(([doc], build_message(doc["recipient"], doc["subject"], doc["html"])))
+        for recipient, group in digests.items():
+            if len(group) == 1:
+                messages.append((group, build_message(recipient, group[0]["subject"], group[0]["html"])))
+            else:
+                messages.append((group, build_digest(recipient, [doc["digest_section"] for doc in group])))
+                self.digests += 1
+
+        for index, (group, msg) in enumerate(messages):
+            try:
+                self._connection().send_message(msg)
+            except smtplib.SMTPRecipientsRefused as e:
+                print(f"Email to {msg['To']} refused: {e}")
+                self._fail(group, e, permanent=True)
+                continue
+            except (smtplib.SMTPException, OSError) as e:
+                # Connection-level trouble: retry this and every remaining message later
+                print(f"Failed to send email: {e}")
+                self._close()
+                for remaining, _ in messages[index:]:
+                    self._fail(remaining, e)
+                return
+            self.collection.update_many(
+                {"_id": {"$in": [doc["_id"] for doc in group]}},
+                {"$set": {"status": "sent", "sent_at": time.time(),
+                          "expires_at": datetime.utcnow() + timedelta(days=SENT_RETENTION_DAYS)},
+                 "$unset": {"claim": ""}}
+            )
+            self.sent += len(group)
+            self._last_used = time.time()
+            print(f"Email sent to {msg['To']}")
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                docs = self._claim()
+                if docs:
+                    self._send_batch(docs)
+                    continue
+            except Exception as e:
+                print(f"[OUTBOX] Error draining outbox: {e}")
+            if self._smtp is not None and time.time() - self._last_used > SMTP_IDLE_SECONDS:
+                self._close()
+            self._wakeup.wait(POLL_INTERVAL)
+            self._wakeup.clear()
+        self._close()
+
+    def stats(self):
+        """Outbox depth and sender counters for the /status endpoint."""
+        return {
+            "pending": self.collection.count_documents({"status": {"$in": ["pending", "sending"]}}),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "digests": self.digests,
+            "smtp_connections": self.connections,
+        }
+
+    def shutdown(self):
+        """Stop the sender; unsent mail stays in the outbox for the next start."""
+        self._stopping.set()
+        self._wakeup.set()
@@ -0,0 +1,249 @@
+import argparse
+import os
+import time
+import numpy as np
+
+# Backend selection: "sentence-transformers" (reference), "onnx" or "onnx-int8"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_models")
+HF_MODEL_PREFIX = "sentence-transformers/"
+MAX_SEQ_LENGTH = 256  # Same truncation as the sentence-transformers model config
+
+
+class SentenceTransformerBackend:
+    """Reference backend: the PyTorch sentence-transformers model."""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+
+    def get_sentence_embedding_dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size=32):
+        return np.asarray(self.model.encode(texts, batch_size=batch_size), dtype=np.float32)
+
+
+class OnnxBackend:
+    """
+    ONNX Runtime backend. The transformer is exported to ONNX on first use and
+    cached under ONNX_MODEL_DIR; mean pooling and L2 normalization are done in
+    NumPy, mirroring the sentence-transformers pipeline of all-MiniLM-L6-v2.
+    """
+
+    name = "onnx"
+    model_file = "model.onnx"
+
+    def __init__(self, model_name):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("The onnx backends need onnxruntime: pip install onnxruntime")
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.model_dir = os.path.join(ONNX_MODEL_DIR, model_name.replace("/", "_"))
+        model_path = os.path.join(self.model_dir, self.model_file)
+        if not os.path.exists(model_path):
+            self.build(model_path)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+
+    def build(self, model_path):
+        """Export the Hugging Face transformer (and its tokenizer) to ONNX."""
+        export_onnx(self.model_name, self.model_dir)
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def _encode_batch(self, texts):
+        tokens = self.tokenizer(texts, padding=True, truncation=True, max_length=MAX_SEQ_LENGTH, return_tensors="np")
+        inputs = {name: tokens[name].astype(np.int64) for name in self.input_names if name in tokens}
+        hidden = self.session.run(None, inputs)[0]
+
+        # Mean pooling over real (non-padding) tokens, then unit length
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def encode(self, texts, batch_size=32):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        batches = [self._encode_batch(texts[start:start + batch_size]) for start in range(0, len(texts), batch_size)]
+        embeddings = np.concatenate(batches).astype(np.float32) if batches else np.zeros((0, self.dimension), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+
+class QuantizedOnnxBackend(OnnxBackend):
+    """ONNX Runtime backend with int8 dynamically quantized weights."""
+
+    name = "onnx-int8"
+    model_file = "model-int8.onnx"
+
+    def build(self, model_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        fp32_path = os.path.join(self.model_dir, OnnxBackend.model_file)
+        if not os.path.exists(fp32_path):
+            export_onnx(self.model_name, self.model_dir)
+        quantize_dynamic(fp32_path, model_path, weight_type=QuantType.QInt8)
+        print(f"[EMBEDDINGS] Quantized {fp32_path} -> {model_path}")
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (SentenceTransformerBackend, OnnxBackend, QuantizedOnnxBackend)
+}
+
+
+def export_onnx(model_name, model_dir):
+    """Export the transformer behind a sentence-transformers model to ONNX with dynamic axes."""
+    import torch
+    from transformers import AutoTokenizer, AutoModel
+
+    hf_name = model_name if "/" in model_name else HF_MODEL_PREFIX + model_name
+    os.makedirs(model_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(hf_name)
+    model = AutoModel.from_pretrained(hf_name)
+    model.eval()
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            os.path.join(model_dir, OnnxBackend.model_file),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+    tokenizer.save_pretrained(model_dir)
+    print(f"[EMBEDDINGS] Exported {hf_name} to {model_dir}")
+
+
+def load_backend(model_name, backend_name=EMBEDDING_BACKEND):
+    """Instantiate the configured embedding backend."""
+    if backend_name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend_name}', choose from {sorted(BACKENDS)}")
+    return BACKENDS[backend_name](model_name)
+
+
+# Small built-in evaluation set; --from-db uses real scraped listings instead
+SAMPLE_QUERIES = ["raspberry pi 4", "arduino uno", "ultrasonic sensor", "servo motor", "esp32 board"]
+SAMPLE_PRODUCTS = [
+    "Raspberry Pi 4 Model B 4GB RAM", "Raspberry Pi 4 Case with Fan", "Official Raspberry Pi 4 Power Supply 15W",
+    "Raspberry Pi 5 8GB", "Raspberry Pi Pico W", "Micro HDMI to HDMI Cable for Raspberry Pi 4",
+    "Arduino Uno R3 Compatible Board", "Original Arduino Uno Rev3", "Arduino Uno Starter Kit with Tutorial Book",
+    "USB Cable for Arduino Uno", "Arduino Nano V3 ATmega328P", "Arduino Mega 2560 R3",
+    "HC-SR04 Ultrasonic Distance Sensor Module", "Ultrasonic Sensor Mounting Bracket", "JSN-SR04T Waterproof Ultrasonic Sensor",
+    "IR Obstacle Avoidance Sensor", "SG90 Micro Servo Motor 9g", "MG996R Metal Gear Servo Motor",
+    "Servo Motor Mount Bracket Kit", "PCA9685 16 Channel Servo Driver", "ESP32 Development Board WiFi Bluetooth",
+    "ESP32-CAM Camera Module", "ESP8266 NodeMCU Board", "ESP32 Expansion Board Breakout",
+    "L298N Motor Driver Module", "DHT11 Temperature and Humidity Sensor", "16x2 LCD Display with I2C",
+    "Jumper Wires Male to Male 40pcs", "Breadboard 830 Points", "18650 Battery Holder"
+]
+
+
+def load_eval_set(from_db=False, max_queries=20, max_products=50):
+    """Return [(query, [product names])] to compare backends on."""
+    if not from_db:
+        return [(query, SAMPLE_PRODUCTS) for query in SAMPLE_QUERIES]
+    from database import products_collection
+    queries = products_collection.distinct("normalized_query")[:max_queries]
+    return [
+        (query, [p["name"] for p in products_collection.find({"normalized_query": query}, {"name": 1}).limit(max_products)])
+        for query in queries
+    ]
+
+
+def kendall_tau(order_a, order_b):
+    """Kendall rank correlation between two orderings of the same items."""
+    position = {item: rank for rank, item in enumerate(order_b)}
+    ranks = [position[item] for item in order_a]
+    concordant = discordant = 0
+    for i in range(len(ranks)):
+        for j in range(i + 1, len(ranks)):
+            if ranks[i] < ranks[j]:
+                concordant += 1
+            else:
+                discordant += 1
+    pairs = concordant + discordant
+    return (concordant - discordant) / pairs if pairs else 1.0
+
+
+def semantic_order(backend, query, names):
+    """Product indices sorted by cosine similarity to the query."""
+    query_embedding = backend.encode(query)
+    embeddings = backend.encode(names)
+    embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    scores = embeddings @ (query_embedding / max(float(np.linalg.norm(query_embedding)), 1e-12))
+    return list(np.argsort(-scores, kind="stable"))
+
+
+def check_accuracy(model_name, candidates, eval_set, top_k=10):
+    """Compare each candidate backend's rank order against the reference backend."""
+    reference = load_backend(model_name, SentenceTransformerBackend.name)
+    for backend_name in candidates:
+        backend = load_backend(model_name, backend_name)
+        taus, overlaps = [], []
+        for query, names in eval_set:
+            if len(names) < 2:
+                continue
+            expected = semantic_order(reference, query, names)
+            actual = semantic_order(backend, query, names)
+            taus.append(kendall_tau(actual, expected))
+            k = min(top_k, len(names))
+            overlaps.append(len(set(actual[:k]) & set(expected[:k])) / k)
+        print(f"{backend_name:>22}: kendall tau {np.mean(taus):.4f} (min {np.min(taus):.4f}), "
+              f"top-{top_k} overlap {np.mean(overlaps):.1%} over {len(taus)} queries")
+
+
+def benchmark(model_name, backend_names, eval_set, runs=50, batch_size=64):
+    """Report load time, single-query latency and batch throughput per backend."""
+    texts = [name for _, names in eval_set for name in names]
+    queries = [query for query, _ in eval_set]
+    for backend_name in backend_names:
+        started = time.time()
+        backend = load_backend(model_name, backend_name)
+        load_seconds = time.time() - started
+
+        backend.encode(queries[0])  # First call pays one-off initialization
+        latencies = []
+        for run in range(runs):
+            started = time.perf_counter()
+            backend.encode(queries[run % len(queries)])
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        backend.encode(texts, batch_size=batch_size)
+        throughput = len(texts) / (time.perf_counter() - started)
+
+        print(f"{backend_name:>22}: load {load_seconds:.2f}s, query p50 {np.percentile(latencies, 50):.1f}ms "
+              f"p95 {np.percentile(latencies, 95):.1f}ms, {throughput:.0f} texts/s (batch {batch_size})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare embedding backends for the product ranker.")
+    parser.add_argument("command", choices=["check", "bench"], help="accuracy check against the reference model, or latency/throughput benchmark")
+    parser.add_argument("--backends", nargs="+", default=sorted(BACKENDS), help="backends to evaluate")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--from-db", action="store_true", help="evaluate on scraped listings from MongoDB")
+    args = parser.parse_args()
+
+    eval_set = load_eval_set(from_db=args.from_db)
+    if args.command == "check":
+        check_accuracy(args.model, [name for name in args.backends if name != SentenceTransformerBackend.name], eval_set)
+    else:
+        benchmark(args.model, args.backends, eval_set)
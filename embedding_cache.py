@@ -0,0 +1,153 @@
+import numpy as np
+import hashlib
+import threading
+import time
+import os
+
+try:
+    import fcntl  # Lets several worker processes share one cache directory (POSIX only)
+except ImportError:
+    fcntl = None
+
+# Cache configuration
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+ENCODE_BATCH_SIZE = 64  # Texts per forward pass when encoding cache misses
+INITIAL_CAPACITY = 1024  # Rows allocated in a new matrix file; the file doubles when full
+
+
+class EmbeddingStore:
+    """
+    Persistent cache of text embeddings.
+    Vectors live in a memory-mapped float32 matrix (<dir>/<model>/embeddings.f32)
+    and an append-only index file (<dir>/<model>/index.txt) maps each key to its
+    row: line N holds the key of row N. Keys are hashes of (model name, text).
+    """
+
+    def __init__(self, model_name, dim, directory=EMBEDDING_CACHE_DIR):
+        self.model_name = model_name
+        self.dim = dim
+        directory = os.path.join(directory, model_name.replace("/", "_"))
+        self.matrix_path = os.path.join(directory, "embeddings.f32")
+        self.index_path = os.path.join(directory, "index.txt")
+        self._rows = {}  # key -> row number
+        self._lock = threading.Lock()
+        self._matrix = None
+        self.hits = 0
+        self.misses = 0
+        self.encode_seconds = 0.0
+
+        os.makedirs(directory, exist_ok=True)
+        open(self.index_path, "a").close()
+        if not os.path.exists(self.matrix_path):
+            self._resize(INITIAL_CAPACITY)
+        self._open_matrix()
+        with open(self.index_path, "r") as index_file:
+            self._load_index(index_file)
+
+    def _key(self, text):
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _capacity(self):
+        return os.path.getsize(self.matrix_path) // (self.dim * 4)
+
+    def _resize(self, rows):
+        with open(self.matrix_path, "ab") as matrix_file:
+            matrix_file.truncate(rows * self.dim * 4)
+
+    def _open_matrix(self):
+        self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(self._capacity(), self.dim))
+
+    def _load_index(self, index_file):
+        """Read index lines appended since the last load (possibly by another process)."""
+        index_file.seek(0)
+        lines = index_file.read().splitlines()
+        for row in range(len(self._rows), len(lines)):
+            self._rows[lines[row]] = row
+        if len(self._rows) > self._matrix.shape[0]:
+            self._open_matrix()
+
+    def _append(self, keys, vectors):
+        """Write new rows to the matrix, then record them in the index."""
+        with open(self.index_path, "a+") as index_file:
+            if fcntl is not None:
+                fcntl.flock(index_file, fcntl.LOCK_EX)
+            try:
+                self._load_index(index_file)
+                new = [(key, vector) for key, vector in zip(keys, vectors) if key not in self._rows]
+                if not new:
+                    return
+                start = len(self._rows)
+                needed = start + len(new)
+                if needed > self._matrix.shape[0]:
+                    capacity = max(self._matrix.shape[0], INITIAL_CAPACITY)
+                    while capacity < needed:
+                        capacity *= 2
+                    self._matrix.flush()
+                    self._resize(capacity)
+                    self._open_matrix()
+                for offset, (key, vector) in enumerate(new):
+                    self._matrix[start + offset] = vector
+                self._matrix.flush()
+                # Rows only become visible once their vectors are on disk
+                index_file.seek(0, os.SEEK_END)
+                index_file.write("".join(key + "\n" for key, _ in new))
+                index_file.flush()
+                for offset, (key, _) in enumerate(new):
+                    self._rows[key] = start + offset
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(index_file, fcntl.LOCK_UN)
+
+    def encode(self, texts, encode_fn, batch_size=ENCODE_BATCH_SIZE):
+        """
+        Return a (len(texts), dim) float32 array of embeddings.
+        Only texts missing from the cache are passed to encode_fn, in batches.
+        The model runs outside the lock, so callers whose texts are cached never
+        wait behind another caller's encode (two callers missing the same text
+        may both encode it; only the first copy is stored).
+        Returns (embeddings, stats) where stats describes this call.
+        """
+        keys = [self._key(text) for text in texts]
+        with self._lock:
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in self._rows and key not in missing:
+                    missing[key] = text
+
+        started = time.time()
+        batches = []
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys), batch_size):
+            batch_keys = missing_keys[start:start + batch_size]
+            batches.append((batch_keys, np.asarray(encode_fn([missing[key] for key in batch_keys]), dtype=np.float32)))
+        encode_seconds = time.time() - started
+
+        with self._lock:
+            for batch_keys, vectors in batches:
+                self._append(batch_keys, vectors)
+            embeddings = np.array(self._matrix[[self._rows[key] for key in keys]], dtype=np.float32)
+            hits = len(texts) - len(missing)
+            self.hits += hits
+            self.misses += len(missing)
+            self.encode_seconds += encode_seconds
+
+        stats = {
+            "texts": len(texts),
+            "hits": hits,
+            "encoded": len(missing),
+            "hit_ratio": round(hits / len(texts), 3) if texts else 1.0,
+            "encode_seconds": round(encode_seconds, 3),
+        }
+        return embeddings, stats
+
+    def stats(self):
+        """Lifetime counters for the /status endpoint."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "rows": len(self._rows),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else None,
+                "encode_seconds": round(self.encode_seconds, 3),
+            }
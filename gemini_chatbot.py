@@ -1,12 +1,71 @@
 import requests
+import json
+from requests.adapters import HTTPAdapter
+import threading
+import time
 import os
 from dotenv import load_dotenv
+from chat_cache import ChatResponseCache
+from upstream_guard import UpstreamGuard, UpstreamUnavailable
+from ml_ranker import encode_text, model_loaded, warm_up
 load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
+# GEMINI_API_BASE can point at a local fake endpoint for testing
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash")
+GEMINI_API_URL = f"{GEMINI_API_BASE}:generateContent?key={GEMINI_API_KEY}"
+GEMINI_STREAM_URL = f"{GEMINI_API_BASE}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
+GEMINI_TIMEOUT = (5, 30)  # (connect, read) seconds
 
-def ask_luffybot(user_message, bot_type="luffy"):
+# Keep-alive session so chats reuse the TLS connection to Gemini
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=10))
+session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=10))
+
+_model_loading = threading.Event()
+
+
+def _load_model():
+    try:
+        warm_up()
+    except Exception as e:
+        print(f"[CHATBOT] Could not load the embedding model: {e}")
+        _model_loading.clear()  # Let a later message try again
+
+
+def embed_message(message):
+    """
+    Embed a chat message with the ranker's model. A chat request never loads
+    the model itself: the first one starts a background load and falls back
+    to exact-match caching until it is done.
+    """
+    if not model_loaded():
+        if not _model_loading.is_set():
+            _model_loading.set()
+            threading.Thread(target=_load_model, name="chat-model-load", daemon=True).start()
+        raise RuntimeError("embedding model is still loading")
+    return encode_text(message)
+
+
+# Replies per bot, looked up by exact question then by embedding similarity
+# (sharing the ranker's sentence-transformer)
+response_cache = ChatResponseCache(embed_message)
+
+# Per-bot concurrency gate, outgoing rate limit and circuit breaker for Gemini calls
+upstream_guard = UpstreamGuard()
+
+# Bot personas a client may ask for (see build_system_prompt)
+BOT_TYPES = ("luffy", "pro", "debug")
+
+# Answers given while Gemini is refused (overloaded, rate-limited or failing)
+UNAVAILABLE_REPLIES = {
+    "luffy": "Shishishi... my ship is stuck in a storm right now ⛈️ Try again in a bit, nakama!",
+    "pro": "The assistant is temporarily unavailable. Please try again shortly.",
+    "debug": "DebugBot can't reach its backend right now (too many requests or an upstream outage). Please try again in a minute.",
+}
+
+
+def build_system_prompt(bot_type):
     if bot_type == "pro":
         system_prompt = (
             "You are Dr.vegapunk, A genius scientist from one piece a concise and professional electronics assistant.\n"
@@ -51,21 +110,129 @@ def ask_luffybot(user_message, bot_type="luffy"):
             "Use emojis, pirate slang, and keep it line-by-line!"
         )
 
-    payload = {
+    return system_prompt
+
+
+def build_payload(user_message, bot_type):
+    return {
         "contents": [
-            {"role": "user", "parts": [{"text": system_prompt + "\nUser: " + user_message}]}
+            {"role": "user", "parts": [{"text": build_system_prompt(bot_type) + "\nUser: " + user_message}]}
         ]
     }
 
+
+def unavailable_reply(bot_type, error):
+    print(f"[CHATBOT] Upstream call refused ({bot_type}): {error.reason}")
+    return UNAVAILABLE_REPLIES.get(bot_type, UNAVAILABLE_REPLIES["luffy"])
+
+
+def retry_after(error):
+    """Seconds Gemini asked us to back off for, if it rate-limited us (429)."""
+    response = getattr(error, "response", None)
+    if response is None or response.status_code != 429:
+        return None
+    try:
+        return max(float(response.headers.get("Retry-After", 0)), 1)
+    except ValueError:
+        return None
+
+
+def ask_luffybot(user_message, bot_type="luffy"):
+    reply, kind = response_cache.get(bot_type, user_message)
+    if reply is not None:
+        print(f"[CHATBOT] {kind} cache hit ({bot_type})")
+        return reply
+
+    try:
+        upstream_guard.acquire(bot_type)
+    except UpstreamUnavailable as e:
+        return unavailable_reply(bot_type, e)
+
+    started = time.time()
     try:
-        response = requests.post(GEMINI_API_URL, json=payload)
+        response = session.post(GEMINI_API_URL, json=build_payload(user_message, bot_type), timeout=GEMINI_TIMEOUT)
         response.raise_for_status()
         data = response.json()
-        return data["candidates"][0]["content"]["parts"][0]["text"]
+        reply = data["candidates"][0]["content"]["parts"][0]["text"]
 
     except requests.exceptions.RequestException as e:
+        upstream_guard.release(bot_type, time.time() - started, error=True, retry_after=retry_after(e))
         return f"Oops! API request failed 🤕 Error: {e}"
     except KeyError as e:
+        upstream_guard.release(bot_type, time.time() - started, error=True)
         return f"Oops! Gemini API response was missing expected data 🤕 KeyError: {e}"
     except Exception as e:
+        upstream_guard.release(bot_type, time.time() - started, error=True)
         return f"Oops! Something went wrong 🤕 Error: {e}"
+
+    upstream_seconds = time.time() - started
+    upstream_guard.release(bot_type, upstream_seconds)
+    # Only real answers are cached, never the "Oops!" fallbacks
+    try:
+        response_cache.put(bot_type, user_message, reply, upstream_seconds)
+    except Exception as e:
+        print(f"[CHATBOT] Could not cache reply: {e}")
+    return reply
+
+
+def stream_luffybot(user_message, bot_type="luffy"):
+    """
+    Like ask_luffybot, but yields the reply in chunks as Gemini generates it
+    (streamGenerateContent over SSE). Cached replies are yielded in one piece.
+    """
+    reply, kind = response_cache.get(bot_type, user_message)
+    if reply is not None:
+        print(f"[CHATBOT] {kind} cache hit ({bot_type})")
+        yield reply
+        return
+
+    try:
+        upstream_guard.acquire(bot_type)
+    except UpstreamUnavailable as e:
+        yield unavailable_reply(bot_type, e)
+        return
+
+    started = time.time()
+    chunks = []
+    # A browser disconnecting mid-reply (GeneratorExit) says nothing about
+    # Gemini's health, so only the exceptions below count as failures
+    error, backoff, fallback = False, None, None
+    try:
+        with session.post(GEMINI_STREAM_URL, json=build_payload(user_message, bot_type),
+                          timeout=GEMINI_TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+            response.encoding = "utf-8"
+            for line in response.iter_lines(decode_unicode=True):
+                # Each SSE event carries one partial GenerateContentResponse
+                if not line or not line.startswith("data:"):
+                    continue
+                data = json.loads(line[len("data:"):])
+                parts = data.get("candidates", [{}])[0].get("content", {}).get("parts", [])
+                text = "".join(part.get("text", "") for part in parts)
+                if text:
+                    chunks.append(text)
+                    yield text
+
+    except requests.exceptions.RequestException as e:
+        error, backoff = True, retry_after(e)
+        fallback = f"Oops! API request failed 🤕 Error: {e}"
+    except Exception as e:
+        error = True
+        fallback = f"Oops! Something went wrong 🤕 Error: {e}"
+    finally:
+        upstream_seconds = time.time() - started
+        upstream_guard.release(bot_type, upstream_seconds, error=error, retry_after=backoff)
+
+    if fallback:
+        yield fallback
+        return
+    if chunks:
+        try:
+            response_cache.put(bot_type, user_message, "".join(chunks), upstream_seconds)
+        except Exception as e:
+            print(f"[CHATBOT] Could not cache reply: {e}")
+
+
+def chatbot_stats():
+    """Response cache, upstream latency and admission counters for the /status endpoint."""
+    return {"cache": response_cache.stats(), "upstream": upstream_guard.stats()}
@@ -0,0 +1,51 @@
+import fcntl
+import gc
+import os
+
+# Serve with: gunicorn -c gunicorn.conf.py app:app
+bind = os.getenv("BIND", "0.0.0.0:80")
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+threads = int(os.getenv("GUNICORN_THREADS", 8))  # /search blocks on scrapes, threads keep workers responsive
+timeout = 120
+
+# Import the app once in the master and fork workers from it
+preload_app = True
+
+# Whichever worker holds this lock runs the alert scheduler
+SCHEDULER_LOCK = os.getenv("SCHEDULER_LOCK", "/tmp/product-finder-scheduler.lock")
+
+
+def on_starting(server):
+    """Create indexes once, and load the ranking model in the master so forked workers share it copy-on-write."""
+    from database import ensure_indexes
+    from ml_ranker import warm_up
+    ensure_indexes()
+    warm_up()
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the collector's reach, so garbage
+    # collection in the workers doesn't touch (and un-share) those pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """
+    Start each worker's outbox sender and scrape job workers, and run the alert scheduler in exactly
+    one worker. The lock is released when that worker exits, so its
+    replacement takes the scheduler over.
+    """
+    from app import email_outbox, scrape_jobs
+    email_outbox.start()
+    scrape_jobs.start()
+
+    lock_file = open(SCHEDULER_LOCK, "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return
+    worker.scheduler_lock = lock_file  # Held for the life of the worker
+    from app import start_availability_checker
+    start_availability_checker()
+    server.log.info(f"Alert scheduler running in worker {worker.pid}")
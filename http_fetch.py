@@ -0,0 +1,58 @@
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+from driver_pool import USER_AGENT
+
+# HTTP configuration
+REQUEST_TIMEOUT = (5, 15)  # (connect, read) seconds
+POOL_SIZE = 10  # Keep-alive connections kept per host
+
+
+def create_session():
+    """Build a requests.Session with connection pooling and browser-like headers."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "User-Agent": USER_AGENT,
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": "en-IN,en;q=0.9",
+    })
+    return session
+
+
+# Shared session so repeated searches reuse TCP/TLS connections
+session = create_session()
+
+
+def fetch_html(url, timeout=REQUEST_TIMEOUT):
+    """Download a page without a browser. Returns the HTML text."""
+    response = session.get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.text
+
+
+def parse_html(html):
+    """Parse HTML with the lxml backend so CSS selectors can be used via select()."""
+    return BeautifulSoup(html, "lxml")
+
+
+def select_text(element, selector):
+    """Return the stripped text of the first match, or None if nothing matches."""
+    match = element.select_one(selector)
+    if match is None:
+        return None
+    return match.get_text(" ", strip=True)
+
+
+def select_attr(element, selector, *attributes):
+    """Return the first non-empty attribute among `attributes` on the first match."""
+    match = element.select_one(selector)
+    if match is None:
+        return None
+    for attribute in attributes:
+        value = match.get(attribute)
+        if value:
+            return value
+    return None
@@ -0,0 +1,82 @@
+import argparse
+from pymongo import UpdateOne
+from database import client, products_collection, normalize_query, canonical_link, ensure_indexes, BulkWriter
+
+# Old per-query layout: one "<query>_products" collection per search in each site database
+LEGACY_DATABASES = {
+    "robu_db": "Robu.in",
+    "robocraze_db": "RoboCraze",
+    "amazon_db": "Amazon.in"
+}
+
+
+def legacy_collections():
+    """Yield (source, collection) for every per-query collection of the old layout."""
+    for db_name, source in LEGACY_DATABASES.items():
+        db = client[db_name]
+        for collection_name in db.list_collection_names():
+            if collection_name.endswith("_products"):
+                yield source, db[collection_name]
+
+
+def migrate(drop=False):
+    """
+    Fold every legacy per-query collection into the unified products collection.
+    When a listing appears in several collections the newest copy wins and all
+    of its queries are kept; listings already in the unified collection are
+    only overwritten by a newer legacy copy.
+    """
+    ensure_indexes()
+
+    merged = {}  # product_link -> newest document
+    queries = {}  # product_link -> set of normalized queries
+    migrated = []
+    skipped = 0
+
+    for source, collection in legacy_collections():
+        # Older documents may predate the search_query field, fall back to the collection name
+        fallback_query = collection.name[:-len("_products")].replace("_", " ")
+        count = 0
+        for product in collection.find({}, {"_id": 0}):
+            link = product.get("product_link", "")
+            if not link.startswith("http"):
+                skipped += 1
+                continue
+            # Same key as the scrapers write, so old Amazon copies fold onto their /dp/<ASIN> row
+            link = product["product_link"] = canonical_link(link)
+            product["source"] = source
+            queries.setdefault(link, set()).add(normalize_query(product.get("search_query") or fallback_query))
+            current = merged.get(link)
+            if current is None or product.get("timestamp", 0) >= current.get("timestamp", 0):
+                merged[link] = product
+            count += 1
+        migrated.append(collection)
+        print(f"Read {count} products from {collection.database.name}.{collection.name}")
+
+    # Rows the app already scraped may be newer than the legacy copy: insert
+    # missing listings, but only overwrite a stored row with a newer legacy one
+    with BulkWriter(products_collection) as writer:
+        for link, product in merged.items():
+            writer.add(UpdateOne(
+                {"product_link": link},
+                {"$setOnInsert": product, "$addToSet": {"normalized_query": {"$each": sorted(queries[link])}}},
+                upsert=True
+            ))
+            writer.add(UpdateOne(
+                {"product_link": link, "timestamp": {"$lt": product.get("timestamp", 0)}},
+                {"$set": product}
+            ))
+
+    print(f"Migrated {len(merged)} unique products from {len(migrated)} collections ({skipped} without a link skipped)")
+
+    if drop:
+        for collection in migrated:
+            collection.drop()
+        print(f"Dropped {len(migrated)} legacy collections")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fold per-query product collections into the unified products collection.")
+    parser.add_argument("--drop", action="store_true", help="drop the legacy collections after migrating")
+    args = parser.parse_args()
+    migrate(drop=args.drop)
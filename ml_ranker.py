@@ -1,8 +1,21 @@
 import re
-from sentence_transformers import SentenceTransformer, util
-
-# Load the embedding model
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
+import heapq
+import threading
+import time
+import numpy as np
+from functools import lru_cache
+from embedding_cache import EmbeddingStore, ENCODE_BATCH_SIZE
+from embedding_backends import load_backend, EMBEDDING_BACKEND, SentenceTransformerBackend
+from product_matching import group_listings, canonical_product
+
+# The embedding model is loaded on first use (or by warm_up), not at import,
+# so workers, tests and CLI scrapes that never rank don't pay for it
+MODEL_NAME = "all-MiniLM-L6-v2"
+QUERY_CACHE_SIZE = 1024  # Query embeddings kept in memory
+
+_embedder = None
+_embedding_store = None  # Product-name embeddings persist across requests and restarts
+_model_lock = threading.Lock()
 
 # Keywords and weights
 ACCESSORY_KEYWORDS = ["case", "cover", "cable", "wire", "screw", "holder", "mount", "bracket", "connector", "clip"]
@@ -15,16 +28,28 @@ SIMPLE_PRODUCT_KEYWORDS = ["board", "module", "sensor"]
 KIT_PENALTY_KEYWORDS = ["kit", "starter", "guide", "book", "tutorial", "project", "bundle"]
 
 
+def keyword_pattern(keywords):
+    """One precompiled alternation that matches if any keyword occurs as a substring."""
+    return re.compile("|".join(re.escape(word) for word in keywords))
+
+
+# Combined patterns, searched against lowercased names
+ACCESSORY_PATTERN = keyword_pattern(ACCESSORY_PENALTY_KEYWORDS)
+SIMPLE_PRODUCT_PATTERN = keyword_pattern(SIMPLE_PRODUCT_KEYWORDS)
+KIT_PENALTY_PATTERN = keyword_pattern(KIT_PENALTY_KEYWORDS)
+
+# Words dropped from names before grouping listings of the same product
+IGNORED_NAME_KEYWORDS = ["official", "model", "computer", "motherboard", "ram", "single", "plus", "sbc", "desktop"]
+IGNORED_NAME_PATTERN = keyword_pattern(IGNORED_NAME_KEYWORDS)
+
+
 def clean_text(text):
     return re.sub(r'[^a-zA-Z0-9 ]', '', text.lower().strip())
 
 
 def extract_core_name(name):
     """Simplify product names for better grouping."""
-    name = clean_text(name)
-    keywords_to_ignore = ["official", "model", "computer", "motherboard", "ram", "single", "plus", "sbc", "desktop"]
-    for kw in keywords_to_ignore:
-        name = name.replace(kw, '')
+    name = IGNORED_NAME_PATTERN.sub('', clean_text(name))
     return ' '.join(name.split())
 
 
@@ -42,11 +67,9 @@ def availability_score(status):
 
 def accessory_penalty(product_name, query):
     """Apply heavier penalty for accessory-like items unless query itself requests accessories."""
-    query_lower = query.lower()
-    if any(word in query_lower for word in ACCESSORY_PENALTY_KEYWORDS):
+    if ACCESSORY_PATTERN.search(query.lower()):
         return 0.0
-    name_lower = product_name.lower()
-    if any(word in name_lower for word in ACCESSORY_PENALTY_KEYWORDS):
+    if ACCESSORY_PATTERN.search(product_name.lower()):
         return ACCESSORY_PENALTY_WEIGHT
     return 0.0
 
@@ -58,9 +81,9 @@ def board_bonus(product_name):
 
 def simplicity_bonus(product_name):
     name_lower = product_name.lower()
-    if any(word in name_lower for word in KIT_PENALTY_KEYWORDS):
+    if KIT_PENALTY_PATTERN.search(name_lower):
         return -0.2
-    if any(word in name_lower for word in SIMPLE_PRODUCT_KEYWORDS):
+    if SIMPLE_PRODUCT_PATTERN.search(name_lower):
         return 0.1
     return 0.0
 
@@ -92,52 +115,152 @@ def dynamic_weights(query):
         return {"relevance": 0.5, "price": 0.3, "availability": 0.2}
 
 
-def rank_scraped_products(products, query):
-    """Rank products using a combination of semantic, price, availability, and custom heuristics."""
+def get_embedder():
+    """Return the shared embedding backend (see EMBEDDING_BACKEND), loading it on first call."""
+    global _embedder, _embedding_store
+    if _embedder is None:
+        with _model_lock:
+            if _embedder is None:
+                started = time.time()
+                try:
+                    backend = load_backend(MODEL_NAME, EMBEDDING_BACKEND)
+                except Exception as e:
+                    if EMBEDDING_BACKEND == SentenceTransformerBackend.name:
+                        raise
+                    print(f"[RANKER] Backend '{EMBEDDING_BACKEND}' unavailable ({e}), using {SentenceTransformerBackend.name}")
+                    backend = load_backend(MODEL_NAME, SentenceTransformerBackend.name)
+
+                # Vectors from different backends differ slightly, so each gets its own cache
+                store_name = MODEL_NAME if backend.name == SentenceTransformerBackend.name else f"{MODEL_NAME}-{backend.name}"
+                _embedding_store = EmbeddingStore(store_name, backend.get_sentence_embedding_dimension())
+                _embedder = backend
+                print(f"[RANKER] Loaded {MODEL_NAME} ({backend.name}) in {time.time() - started:.1f}s")
+    return _embedder
+
+
+def get_embedding_store():
+    """Return the persistent embedding cache for the loaded model."""
+    get_embedder()
+    return _embedding_store
+
+
+def warm_up():
+    """
+    Load the model ahead of the first request.
+    Call this before forking workers (e.g. gunicorn preload) so every worker
+    shares one copy-on-write copy of the weights. It only loads weights and
+    runs no inference, which keeps torch's thread pools uninitialized across fork.
+    """
+    get_embedder()
+
+
+def model_loaded():
+    """True once the embedding model is in memory, so encoding won't block on a load."""
+    return _embedder is not None
+
+
+def embedding_cache_stats():
+    """Embedding cache counters, or None while the model has not been loaded."""
+    return _embedding_store.stats() if _embedding_store is not None else None
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def encode_query(query):
+    """Embed a search query, reusing the result for repeated queries."""
+    return get_embedder().encode(query)
+
+
+def encode_text(text):
+    """Embed arbitrary text (e.g. chat messages) without filling the search-query cache."""
+    return get_embedder().encode(text)
+
+
+def encode_products(texts):
+    """Embed product texts through the persistent cache, encoding only new ones."""
+    embedder = get_embedder()
+    return get_embedding_store().encode(
+        texts, lambda batch: embedder.encode(batch, batch_size=ENCODE_BATCH_SIZE)
+    )
+
+
+def score_products(products, query, query_embedding, embeddings, weights):
+    """
+    Score all products at once. Returns a float64 array of final scores.
+    Produces the same values as applying the per-item heuristics above one by one.
+    """
+    names_lower = [p['name'].lower() for p in products]
+
+    # Cosine similarity as one matrix-vector product over unit-length embeddings
+    embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    query_embedding = query_embedding / max(float(np.linalg.norm(query_embedding)), 1e-12)
+    semantic = (embeddings @ query_embedding.astype(np.float32)).astype(np.float64)
+
+    price = np.array([normalize_price(p.get('price', '')) for p in products], dtype=np.float64)
+    availability = np.array([availability_score(p.get('availability', 'unknown')) for p in products], dtype=np.float64)
+
+    # Accessory penalty is waived when the query itself asks for accessories
+    if ACCESSORY_PATTERN.search(query.lower()):
+        penalty = np.zeros(len(products))
+    else:
+        penalty = np.array([ACCESSORY_PENALTY_WEIGHT if ACCESSORY_PATTERN.search(name) else 0.0 for name in names_lower])
+
+    simplicity = np.array([
+        -0.2 if KIT_PENALTY_PATTERN.search(name) else (0.1 if SIMPLE_PRODUCT_PATTERN.search(name) else 0.0)
+        for name in names_lower
+    ])
+    official = np.array([0.05 if "official" in name else 0.0 for name in names_lower])
+    board = np.array([0.5 if BOARD_BONUS_PATTERN.search(p['name']) else 0.0 for p in products])
+
+    # Accumulate token bonuses in query-token order, like token_match_bonus
+    token_bonus = np.zeros(len(products))
+    for token in query.lower().split():
+        matches = np.array([token in name for name in names_lower])
+        token_bonus += np.where(matches, 0.1, -0.05)
+
+    bonus = simplicity + official + token_bonus + board
+    return (
+        weights['relevance'] * semantic +
+        weights['price'] * price +
+        weights['availability'] * availability +
+        bonus - penalty
+    )
+
+
+def rank_scraped_products(products, query, weights=None, k=None):
+    """
+    Rank products using a combination of semantic, price, availability, and custom heuristics.
+    `weights` overrides dynamic_weights(query). Returns the `k` best products
+    (all of them when k is None), best first. Listings of the same product are
+    merged into one entry whose `offers` hold every source's price and link.
+    """
     if not products:
         return []
 
     # Compute weights and embeddings
-    weights = dynamic_weights(query)
-    query_embedding = embedder.encode(query, convert_to_tensor=True)
+    weights = weights or dynamic_weights(query)
+    query_embedding = encode_query(query)
     names_prices = [f"{p['name']} {p.get('price', '')}" for p in products]
-    embeddings = embedder.encode(names_prices, convert_to_tensor=True)
-
-    # Score each product
-    for i, p in enumerate(products):
-        p['semantic_score'] = float(util.cos_sim(query_embedding, embeddings[i])[0])
-        p['price_score'] = normalize_price(p.get('price', ''))
-        p['availability_score'] = availability_score(p.get('availability', 'unknown'))
-
-        penalty = accessory_penalty(p['name'], query)
-        bonus = (simplicity_bonus(p['name']) + official_bias(p['name']) + token_match_bonus(p['name'], query) + board_bonus(p['name']))
-
-        p['final_score'] = (
-            weights['relevance'] * p['semantic_score'] +
-            weights['price'] * p['price_score'] +
-            weights['availability'] * p['availability_score'] +
-            bonus - penalty
-        )
-
-    # Group by core name and collapse to top-per-group
-    grouped = {}
-    for p in products:
-        core = extract_core_name(p['name'])
-        grouped.setdefault(core, []).append(p)
-
-    deduped = []
-    for group in grouped.values():
-        # Optionally penalize outliers
-        sorted_group = sorted(group, key=lambda x: x['final_score'], reverse=True)
-        top = sorted_group[0]
-        deduped.append(top)
-
-    # Final sort across top products
-    final_sorted = sorted(deduped, key=lambda x: x['final_score'], reverse=True)
-
-    # Cleanup weights before returning
-    for p in final_sorted:
-        for key in ['semantic_score', 'price_score', 'availability_score', 'final_score']:
-            p.pop(key, None)
-
-    return final_sorted
+    embeddings, embedding_stats = encode_products(names_prices)
+    print(f"[RANKER] {embedding_stats['hits']}/{embedding_stats['texts']} embeddings cached "
+          f"(hit ratio {embedding_stats['hit_ratio']:.0%}), encoded {embedding_stats['encoded']} "
+          f"in {embedding_stats['encode_seconds']:.3f}s")
+
+    # Score every product in one batch
+    scores = score_products(products, query, query_embedding, embeddings, weights)
+
+    # Group listings of the same product across sources; each group is
+    # represented by its top-scoring listing (the first one wins ties,
+    # as a stable sort would pick)
+    groups = group_listings([extract_core_name(p['name']) for p in products],
+                            [p.get('source') for p in products])
+    best = [max(group, key=lambda i: scores[i]) for group in groups]
+
+    # Only order the top k: a heap selection is O(n log k) and returns
+    # exactly what the full stable sort would have put first
+    order = range(len(groups))
+    if k is None or k >= len(groups):
+        top_groups = sorted(order, key=lambda g: scores[best[g]], reverse=True)
+    else:
+        top_groups = heapq.nsmallest(k, order, key=lambda g: -scores[best[g]])
+
+    return [canonical_product(products, groups[g], scores) for g in top_groups]
@@ -0,0 +1,187 @@
+from functools import lru_cache
+import re
+import numpy as np
+
+# MinHash / LSH configuration
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16  # 4 rows per band: pairs above ~0.5 Jaccard almost always share a bucket
+SHINGLE_SIZE = 3  # Character n-grams, robust to "HC-SR04" vs "HC SR04" style differences
+GROUPING_CACHE_SIZE = 64  # Listing sets whose groups are kept (one per query refresh, reused by every page)
+# Model numbers and capacities: digit runs with the letter directly before
+# and after them, so "hcsr04" and "hc sr04" both give "r04" while "s3"/"c3"
+# and "1k"/"1m" stay distinct
+MODEL_PATTERN = re.compile(r"[a-z]?\d+[a-z]?")
+
+# Words that make a listing a different item than the product it names
+# ("pi 4 case", "hc-sr04 mounting bracket", "esp32 board with camera").
+# Matched at word starts, so "mounting" counts as "mount".
+VARIANT_KEYWORDS = ["case", "cover", "cable", "wire", "screw", "holder", "mount", "bracket", "connector", "clip",
+                    "stand", "adapter", "charger", "heatsink", "fan", "shield", "hat", "kit", "starter", "bundle",
+                    "combo", "with", "camera", "display", "battery", "book", "guide"]
+VARIANT_PATTERN = re.compile(r"\b(" + "|".join(re.escape(word) for word in VARIANT_KEYWORDS) + ")")
+
+# Brand and filler words that don't tell two listings apart
+IGNORED_MATCH_WORDS = {"raspberry", "arduino", "espressif", "adafruit", "sparkfun", "waveshare", "generic",
+                       "original", "genuine", "new", "latest", "compatible", "board", "module",
+                       "for", "and", "the", "of", "pcs", "pack", "piece"}
+
+# Multiply-shift hashing of 24-bit shingle codes; fixed seed so the same
+# names always land in the same buckets
+_random = np.random.RandomState(42)
+_PERM_A = _random.randint(1, 1 << 62, NUM_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_PERM_B = _random.randint(0, 1 << 62, NUM_PERMUTATIONS, dtype=np.uint64)
+_HASH_SHIFT = np.uint64(32)
+_BUCKET_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def match_tokens(text):
+    """Name tokens that identify the product, in order, without brand and filler words."""
+    return [token for token in text.split() if token not in IGNORED_MATCH_WORDS]
+
+
+def minhash_signatures(texts):
+    """
+    NUM_PERMUTATIONS min-hashes of the character shingles of every text,
+    as one (len(texts), NUM_PERMUTATIONS) array computed in bulk.
+    """
+    encoded = [text.encode("utf-8").ljust(SHINGLE_SIZE) for text in texts]
+    lengths = np.array([len(data) for data in encoded])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+
+    # Shingle code at every byte offset: three bytes packed into 24 bits
+    codes = (data[:-2] << np.uint64(16)) | (data[1:-1] << np.uint64(8)) | data[2:]
+    # Keep the shingles that lie inside one text
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    owner = np.repeat(np.arange(len(texts)), lengths)[:len(codes)]
+    inside = np.arange(len(codes)) - starts[owner] <= lengths[owner] - SHINGLE_SIZE
+    codes = codes[inside]
+    offsets = np.concatenate(([0], np.cumsum(lengths - SHINGLE_SIZE + 1)[:-1]))
+
+    signatures = np.empty((len(texts), NUM_PERMUTATIONS), dtype=np.uint64)
+    for p in range(NUM_PERMUTATIONS):
+        hashes = (_PERM_A[p] * codes + _PERM_B[p]) >> _HASH_SHIFT
+        signatures[:, p] = np.minimum.reduceat(hashes, offsets)
+    return signatures
+
+
+def intern(keys):
+    """Small integer id per distinct key, so keys can be compared as numpy arrays."""
+    ids = {}
+    return np.array([ids.setdefault(key, len(ids)) for key in keys])
+
+
+def group_listings(core_names, sources=None):
+    """
+    Group listings that name the same product, across sources.
+    Takes one simplified name per listing (see ml_ranker.extract_core_name)
+    and optionally each listing's source, and returns lists of listing
+    indices, each sorted, ordered by first appearance.
+
+    Names whose MinHash signatures collide in an LSH band are candidates,
+    which keeps the work roughly linear in the number of listings. Candidates
+    are merged only if they agree on model numbers (MODEL_PATTERN), on
+    accessory and kit words (VARIANT_KEYWORDS) and on their tokens apart from
+    brand and filler words, either as a set or with spacing ignored. So
+    "pi 4 4gb" never swallows "pi 4 8gb" and a board never swallows its case.
+    A group holds at most one listing per source.
+
+    Results are cached per listing set, so every page of one search reuses them.
+    """
+    groups = _group_listings(tuple(core_names), tuple(sources) if sources is not None else None)
+    return [list(group) for group in groups]
+
+
+@lru_cache(maxsize=GROUPING_CACHE_SIZE)
+def _group_listings(core_names, sources):
+    exact = {}
+    for i, core in enumerate(core_names):
+        exact.setdefault(core, []).append(i)
+    cores = list(exact)
+    if not cores:
+        return ()
+
+    # Names can only match if their tokens agree, either as a set or with
+    # spacing ignored. Model numbers and variant words are part of the token
+    # set; with spacing ignored ("pi 4 4gb" vs "pi 44 gb") they are compared explicitly.
+    by_set, by_joined = [], []
+    for core in cores:
+        tokens = match_tokens(core)
+        by_set.append(frozenset(tokens))
+        by_joined.append(f"{''.join(tokens)}|{','.join(MODEL_PATTERN.findall(core))}|{','.join(VARIANT_PATTERN.findall(core))}")
+    match_keys = (intern(by_set), intern(by_joined))
+    signatures = minhash_signatures(cores)
+
+    # Within each LSH bucket, sort by a match key so every run of matching
+    # names is adjacent, then keep the adjacent pairs that match. A bucket is
+    # identified by a hash of its band's rows; a rare hash collision only adds
+    # a candidate, never a match.
+    pairs = []
+    rows = NUM_PERMUTATIONS // LSH_BANDS
+    for band in range(LSH_BANDS):
+        bucket = np.zeros(len(cores), dtype=np.uint64)
+        for column in range(band * rows, (band + 1) * rows):
+            bucket = bucket * _BUCKET_MULTIPLIER + signatures[:, column]
+        for key in match_keys:
+            order = np.lexsort((key, bucket))
+            a, b = order[:-1], order[1:]
+            match = (bucket[a] == bucket[b]) & (key[a] == key[b])
+            pairs.append(np.stack((a[match], b[match]), axis=1))
+    pairs = np.unique(np.concatenate(pairs), axis=0)
+
+    parent = list(range(len(cores)))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs.tolist():
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    clusters = {}
+    for c, core in enumerate(cores):
+        clusters.setdefault(find(c), []).extend(exact[core])
+
+    # Split each cluster so no group holds two listings from one source
+    groups = []
+    for listings in clusters.values():
+        if len(listings) == 1:
+            groups.append(listings)
+            continue
+        split = []
+        for i in sorted(listings):
+            source = sources[i] if sources is not None else None
+            for group, seen in split:
+                if sources is None or source not in seen:
+                    group.append(i)
+                    seen.add(source)
+                    break
+            else:
+                split.append(([i], {source}))
+        groups.extend(group for group, _ in split)
+    return tuple(tuple(group) for group in sorted(groups, key=lambda group: group[0]))
+
+
+def make_offer(product):
+    """The per-source part of a listing."""
+    return {
+        "source": product.get("source"),
+        "name": product.get("name"),
+        "price": product.get("price"),
+        "availability": product.get("availability"),
+        "product_link": product.get("product_link"),
+    }
+
+
+def canonical_product(products, group, scores):
+    """
+    One entry per matched product: the best-scoring listing, plus every
+    listing of the group (best first) as `offers`. The input rows are not modified.
+    """
+    ordered = sorted(group, key=lambda i: scores[i], reverse=True)
+    product = dict(products[ordered[0]])
+    product["offers"] = [make_offer(products[i]) for i in ordered]
+    return product
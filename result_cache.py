@@ -0,0 +1,83 @@
+from collections import OrderedDict
+import threading
+import time
+
+# Cache configuration
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Total size of cached response bodies
+RESULT_CACHE_TTL = 600  # Seconds a cached response stays valid
+
+
+class ResultCache:
+    """
+    Bounded in-process LRU cache of serialized responses.
+    Entries expire after `ttl` seconds, the least recently used entries are
+    evicted once the total size exceeds `max_bytes`, and every entry belongs to
+    a group (the normalized query) so all variants can be invalidated together.
+    """
+
+    def __init__(self, max_bytes=RESULT_CACHE_MAX_BYTES, ttl=RESULT_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, size, expires_at, group)
+        self._groups = {}  # group -> set of keys
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remove(self, key):
+        value, size, expires_at, group = self._entries.pop(key)
+        self._size -= size
+        keys = self._groups.get(group)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._groups[group]
+
+    def get(self, key):
+        """Return the cached value, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[2] <= time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, group, key, value, size=None):
+        """Cache `value` (bytes or str by default) under `key` within `group`."""
+        size = len(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.time() + self.ttl, group)
+            self._groups.setdefault(group, set()).add(key)
+            self._size += size
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, group):
+        """Drop every cached entry in `group`."""
+        with self._lock:
+            for key in list(self._groups.get(group, ())):
+                self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -1,46 +1,129 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import time
 import urllib.parse
+from urllib.parse import urljoin
 import random
-from pymongo import MongoClient
+from database import ProductWriter
+from driver_pool import driver_pool, CHECKOUT_TIMEOUT
+from scrape_orchestrator import deadline_passed, time_left
+from http_fetch import fetch_html, parse_html, select_text, select_attr
 
-def get_collection_for_query(search_query):
+# Label stored in the "source" field of every product from this site
+SOURCE = "RoboCraze"
+
+# "http" tries a plain HTTP fetch + static parse first, "browser" always uses Selenium
+FETCH_MODE = "http"
+
+def parse_robocraze_html(html):
     """
-    Returns a MongoDB collection for the given search query.
+    Extract products from a server-rendered RoboCraze (Shopify) search page.
+    Uses the same CSS selectors as the Selenium path.
     """
-    client = MongoClient("mongodb://localhost:27017/")  # Connect to MongoDB
-    db = client["robocraze_db"]  # Database name
-    collection_name = f"{search_query.lower().replace(' ', '_')}_products"  # Create a valid collection name
-    return db[collection_name]
+    soup = parse_html(html)
+    products = soup.select("ul.grid.product-grid li.grid__item")
+
+    results = []
+    for product in products:
+        name = select_text(product, "h3.card__heading a")
+        if not name:
+            continue
+
+        price = select_text(product, ".price-item--sale") or "Price not found"
+
+        # Shopify serves protocol-relative image URLs
+        image = select_attr(product, "img.motion-reduce", "src")
+        image = urljoin("https://robocraze.com", image) if image else "Image URL not found"
+
+        link = select_attr(product, "h3.card__heading a", "href")
+        if not link:
+            link = "Link not found"
+        elif not link.startswith("https://"):
+            link = "https://robocraze.com" + link
 
-def scrape_robocraze(search_query):
+        availability_text = select_text(product, ".quick-add__submit")
+        if availability_text is None:
+            availability = "Unknown"
+        else:
+            availability = "Yes" if "Add" in availability_text else "No"
+
+        results.append({
+            "name": name,
+            "price": price,
+            "availability": availability,
+            "image_url": image,
+            "product_link": link
+        })
+    return results
+
+def is_robocraze_no_results_page(html):
+    """True if the page is RoboCraze's empty search page (Shopify marks it template-search--empty)."""
+    return parse_html(html).select_one(".template-search--empty") is not None
+
+def scrape_robocraze_static(search_query, url):
+    """
+    Fetch the search page over HTTP and save the statically parsed products.
+    Returns the number of products saved (0 for a genuine no-results page),
+    or None if the page has neither, so the caller should fall back to Selenium.
+    """
+    html = fetch_html(url)
+    products = parse_robocraze_html(html)
+    if not products:
+        if is_robocraze_no_results_page(html):
+            print("No products found (static fetch).")
+            return 0
+        return None
+
+    print(f"Found {len(products)} products for '{search_query}' (static fetch)")
+    print("-" * 50)
+    with ProductWriter(SOURCE, search_query) as writer:
+        for product_data in products:
+            product_data["search_query"] = search_query
+            product_data["timestamp"] = time.time()
+            writer.add(product_data)
+        writer.finish()
+    return len(products)
+
+def scrape_robocraze(search_query, deadline=None):
     """
     Scrape product details from RoboCraze based on a search query.
     
     Args:
         search_query (str): The search term to look for.
+        deadline (float): Optional epoch time after which scraping stops early.
+
+    Returns:
+        str: "completed", "partial" if the deadline cut the pass short, or
+        "timeout" if it passed before anything was scraped. Failures are raised.
     """
-    # Setup Chrome options
-    chrome_options = webdriver.ChromeOptions()
-    chrome_options.add_argument("--disable-blink-features=AutomationControlled")  # Bypass detection
-    chrome_options.add_argument("--start-maximized")  # Open browser in maximized mode
-    chrome_options.add_argument("--headless")  # Run in headless mode (comment this line to see the browser)
-    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")  # Set User-Agent
-
-    # Initialize WebDriver
-    driver = webdriver.Chrome(options=chrome_options)
+    # Encode the search query for URL
+    encoded_query = urllib.parse.quote(search_query)
+
+    # Target URL with dynamic search query
+    url = f"https://robocraze.com/search?q={encoded_query}&options%5Bprefix%5D=last"
+
+    if FETCH_MODE == "http":
+        try:
+            products_saved = scrape_robocraze_static(search_query, url)
+            if products_saved is not None:
+                print(f"Scraping complete from RoboCraze. Total products scraped: {products_saved}")
+                return "completed"
+            print("Static parse found no product grid. Falling back to Selenium...")
+        except Exception as e:
+            print(f"HTTP fetch failed: {e}. Falling back to Selenium...")
+
+        if deadline_passed(deadline):
+            print("Deadline reached before Selenium fallback could start.")
+            return "timeout"
+
+    # Borrow a warm WebDriver from the shared pool
+    driver = driver_pool.checkout(timeout=time_left(deadline, CHECKOUT_TIMEOUT))
     products_scraped = 0  # Initialize the variable here
+    writer = None
+    cut_short = False
 
     try:
-        # Encode the search query for URL
-        encoded_query = urllib.parse.quote(search_query)
-        
-        # Target URL with dynamic search query
-        url = f"https://robocraze.com/search?q={encoded_query}&options%5Bprefix%5D=last"
-        
         print(f"Searching for: {search_query}")
         print(f"URL: {url}")
         print("-" * 50)
@@ -54,8 +137,12 @@ def scrape_robocraze(search_query):
         # Scroll down to load more products (if needed)
         last_height = driver.execute_script("return document.body.scrollHeight")
         while True:
+            if deadline_passed(deadline):
+                print("Deadline reached, stopping scroll.")
+                cut_short = True
+                break
             driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(random.uniform(2, 5))  # Random delay between 2 and 5 seconds
+            time.sleep(min(random.uniform(2, 5), time_left(deadline, 5)))  # Random delay between 2 and 5 seconds
             new_height = driver.execute_script("return document.body.scrollHeight")
             if new_height == last_height:
                 break
@@ -68,9 +155,13 @@ def scrape_robocraze(search_query):
         print(f"Found {len(products)} products for '{search_query}'")
         print("-" * 50)
 
-        collection = get_collection_for_query(search_query)
+        writer = ProductWriter(SOURCE, search_query)  # Products are flushed in batches
         
         for product in products:
+            if deadline_passed(deadline):
+                print(f"Deadline reached, keeping {products_scraped} products scraped so far.")
+                cut_short = True
+                break
             try:
                 # Extract product name
                 name = product.find_element(By.CSS_SELECTOR, "h3.card__heading a").text.strip()
@@ -121,7 +212,7 @@ def scrape_robocraze(search_query):
                     "search_query": search_query,
                     "timestamp": time.time()
                 }
-                collection.insert_one(product_data)  # Insert into MongoDB
+                writer.add(product_data)
                 products_scraped += 1  # Increment the counter
 
             except Exception as e:
@@ -129,12 +220,22 @@ def scrape_robocraze(search_query):
                 print(f"Error processing product: {e}")
                 continue
 
+        if cut_short:
+            return "partial"
+        # Only a complete pass may mark listings it did not see as stale
+        writer.finish()
+        return "completed"
+
     except Exception as e:
         print("Error:", e)
+        raise
 
     finally:
         # Close the browser after scraping
-        driver.quit()
+        driver_pool.checkin(driver)
+        # Save the last partial batch even if scraping stopped early
+        if writer is not None:
+            writer.flush()
         print(f"Scraping complete from RoboCraze. Total products scraped: {products_scraped}")
 
 # Example usage
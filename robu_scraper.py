@@ -1,4 +1,3 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -6,32 +5,112 @@ from selenium.common.exceptions import NoSuchElementException, TimeoutException
 import time
 import urllib.parse
 import random
-from pymongo import MongoClient
-
-def get_collection_for_query(search_query):
-    """Returns a MongoDB collection for the given search query."""
-    client = MongoClient("mongodb://localhost:27017/")
-    db = client["robu_db"]
-    collection_name = f"{search_query.lower().replace(' ', '_')}_products"
-    return db[collection_name]
-
-def scrape_robu(search_query):
-    """Scrape product details from Robu.in based on a search query."""
-    
-    # Setup Chrome options
-    chrome_options = webdriver.ChromeOptions()
-    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-    chrome_options.add_argument("--start-maximized")
-    chrome_options.add_argument("--headless")  # Run in headless mode
-    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
-
-    # Initialize WebDriver
-    driver = webdriver.Chrome(options=chrome_options)
+from database import ProductWriter
+from driver_pool import driver_pool, CHECKOUT_TIMEOUT
+from scrape_orchestrator import deadline_passed, time_left
+from http_fetch import fetch_html, parse_html, select_text, select_attr
+
+# Label stored in the "source" field of every product from this site
+SOURCE = "Robu.in"
+
+# "http" tries a plain HTTP fetch + static parse first, "browser" always uses Selenium
+FETCH_MODE = "http"
+
+def parse_robu_html(html):
+    """
+    Extract products from a server-rendered Robu.in search page.
+    Uses the same CSS selectors as the Selenium path.
+    """
+    soup = parse_html(html)
+    products = soup.select("ul.products li.product.type-product")
+    if not products:
+        products = soup.select("ul.products li")
+
+    results = []
+    for product in products:
+        name = select_text(product, "a.woocommerce-LoopProduct-link h2.woocommerce-loop-product__title")
+        if not name:
+            continue
+
+        price = select_text(product, "span.price") or select_text(product, ".price") or "Price not found"
+        # Lazy-loaded images keep the real URL in a data attribute
+        image = select_attr(product, "img", "data-src", "data-lazy-src", "src") or "Image URL not found"
+        link = select_attr(product, "a.woocommerce-LoopProduct-link", "href") or "Link not found"
+
+        button_text = (select_text(product, "div.add-to-cart-wrap a") or "").lower()
+        if "add to cart" in button_text:
+            availability = "Yes"
+        elif "read more" in button_text:
+            availability = "No"
+        else:
+            availability = "Unknown"
+
+        results.append({
+            "name": name,
+            "price": price,
+            "availability": availability,
+            "image_url": image,
+            "product_link": link
+        })
+    return results
+
+def is_robu_no_results_page(html):
+    """True if the page is Robu.in's "No products were found" search page."""
+    return "No products were found" in (select_text(parse_html(html), ".woocommerce-info") or "")
+
+def scrape_robu_static(search_query, url):
+    """
+    Fetch the search page over HTTP and save the statically parsed products.
+    Returns the number of products saved (0 for a genuine no-results page),
+    or None if the page has neither, so the caller should fall back to Selenium.
+    """
+    html = fetch_html(url)
+    products = parse_robu_html(html)
+    if not products:
+        if is_robu_no_results_page(html):
+            print("No products found (static fetch).")
+            return 0
+        return None
+
+    print(f"Found {len(products)} products for '{search_query}' (static fetch)\n{'-' * 50}")
+    with ProductWriter(SOURCE, search_query) as writer:
+        for product_data in products:
+            product_data["search_query"] = search_query
+            product_data["timestamp"] = time.time()
+            writer.add(product_data)
+        writer.finish()
+    return len(products)
+
+def scrape_robu(search_query, deadline=None):
+    """
+    Scrape product details from Robu.in based on a search query.
+    Returns "completed", "partial" if the deadline cut the pass short, or
+    "timeout" if it passed before anything was scraped. Failures are raised.
+    """
+    encoded_query = urllib.parse.quote(search_query)
+    url = f"https://robu.in/?s={encoded_query}&post_type=product"
+
+    if FETCH_MODE == "http":
+        try:
+            products_saved = scrape_robu_static(search_query, url)
+            if products_saved is not None:
+                print(f"Scraping complete. Total products scraped: {products_saved}")
+                return "completed"
+            print("Static parse found no product grid. Falling back to Selenium...")
+        except Exception as e:
+            print(f"HTTP fetch failed: {e}. Falling back to Selenium...")
+
+        if deadline_passed(deadline):
+            print("Deadline reached before Selenium fallback could start.")
+            return "timeout"
+
+    # Borrow a warm WebDriver from the shared pool
+    driver = driver_pool.checkout(timeout=time_left(deadline, CHECKOUT_TIMEOUT))
     products_scraped = 0
+    writer = None
+    cut_short = False
 
     try:
-        encoded_query = urllib.parse.quote(search_query)
-        url = f"https://robu.in/?s={encoded_query}&post_type=product"
         print(f"Searching for: {search_query}")
         print(f"URL: {url}\n{'-' * 50}")
 
@@ -47,17 +126,22 @@ def scrape_robu(search_query):
                 no_results = driver.find_element(By.CSS_SELECTOR, ".woocommerce-info")
                 if "No products were found" in no_results.text:
                     print("No products found.")
-                    return
+                    return "completed"
             except NoSuchElementException:
-                print("Unknown issue. Taking a screenshot for debugging...")
-                driver.save_screenshot(f"robu_search_{search_query}.png")
-                return
+                pass
+            print("Unknown issue. Taking a screenshot for debugging...")
+            driver.save_screenshot(f"robu_search_{search_query}.png")
+            raise RuntimeError("Robu.in search page did not load")
 
         # Scroll to load more products (if needed)
         last_height = driver.execute_script("return document.body.scrollHeight")
         for _ in range(5):
+            if deadline_passed(deadline):
+                print("Deadline reached, stopping scroll.")
+                cut_short = True
+                break
             driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(random.uniform(1, 2))
+            time.sleep(min(random.uniform(1, 2), time_left(deadline, 2)))
             new_height = driver.execute_script("return document.body.scrollHeight")
             if new_height == last_height:
                 break
@@ -73,9 +157,13 @@ def scrape_robu(search_query):
         
         print(f"Found {len(products)} products for '{search_query}'\n{'-' * 50}")
         
-        collection = get_collection_for_query(search_query)
+        writer = ProductWriter(SOURCE, search_query)  # Products are flushed in batches
 
         for product in products:
+            if deadline_passed(deadline):
+                print(f"Deadline reached, keeping {products_scraped} products scraped so far.")
+                cut_short = True
+                break
             try:
                 try:
                     name_element = product.find_element(By.CSS_SELECTOR, "a.woocommerce-LoopProduct-link h2.woocommerce-loop-product__title")
@@ -142,23 +230,34 @@ def scrape_robu(search_query):
                     "search_query": search_query,
                     "timestamp": time.time()
                 }
-                collection.insert_one(product_data)
+                writer.add(product_data)
                 products_scraped += 1
 
             except Exception as e:
                 print(f"Error processing product: {e}")
                 print(f"Successfully scraped {products_scraped} products before error.")
+                cut_short = True
                 break
 
+        if cut_short:
+            return "partial"
+        # Only a complete pass may mark listings it did not see as stale
+        writer.finish()
+        return "completed"
+
     except Exception as e:
         print(f"Error during scraping: {e}")
         try:
             driver.save_screenshot(f"robu_error_{search_query}.png")
         except:
             pass
+        raise
 
     finally:
-        driver.quit()
+        driver_pool.checkin(driver)
+        # Save the last partial batch even if scraping stopped early
+        if writer is not None:
+            writer.flush()
         print(f"Scraping complete. Total products scraped: {products_scraped}")
 
 # Example usage
@@ -0,0 +1,173 @@
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta
+from database import normalize_query
+import threading
+import uuid
+import time
+import os
+
+# Job queue configuration
+MAX_JOB_WORKERS = int(os.getenv("MAX_JOB_WORKERS", 2))  # Scrapes running at once per process
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", 20))  # Submissions beyond this are refused
+JOB_LEASE_SECONDS = 300  # A running job not finished by then is assumed lost and re-queued
+JOB_RETENTION_HOURS = 24  # Finished jobs stay queryable this long
+POLL_INTERVAL = 1.0  # Seconds between checks for work submitted by other processes
+
+
+class QueueFull(Exception):
+    """Raised when MAX_QUEUED_JOBS jobs are already waiting."""
+
+
+class ScrapeJobQueue:
+    """
+    Scrape jobs stored in MongoDB and run by a bounded pool of worker threads.
+    Jobs for the same normalized query are coalesced while one is queued or
+    running. Because the queue lives in the database, every app process
+    (e.g. gunicorn workers) shares it, and jobs survive restarts.
+    """
+
+    def __init__(self, collection, run_job, source_names, workers=MAX_JOB_WORKERS, max_queued=MAX_QUEUED_JOBS):
+        self.collection = collection
+        self.run_job = run_job  # run_job(search_query, on_source_done) -> {name: {"status", "elapsed"}}
+        self.source_names = list(source_names)
+        self.workers = workers
+        self.max_queued = max_queued
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None  # Worker threads don't survive fork, so track which process started them
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            for i in range(self.workers):
+                threading.Thread(target=self._work, name=f"scrape-job-{i}", daemon=True).start()
+
+    def start(self):
+        """Start the workers at startup, so jobs queued (or leased) before a restart run without a new submission."""
+        self._ensure_workers()
+
+    def submit(self, search_query):
+        """Queue a scrape for `search_query` and return its job id (an existing one if already queued)."""
+        self._ensure_workers()
+        query_key = normalize_query(search_query)
+
+        existing = self.collection.find_one({"normalized_query": query_key, "active": True}, {"_id": 1})
+        if existing:
+            return existing["_id"]
+        if self.collection.count_documents({"status": "queued"}) >= self.max_queued:
+            raise QueueFull(f"{self.max_queued} scrape jobs already queued")
+
+        job_id = uuid.uuid4().hex
+        try:
+            self.collection.insert_one({
+                "_id": job_id,
+                "query": search_query,
+                "normalized_query": query_key,
+                "status": "queued",
+                "active": True,
+                "sources": {name: {"status": "pending", "elapsed": None} for name in self.source_names},
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "error": None
+            })
+        except DuplicateKeyError:
+            # Another request queued the same query between our check and insert
+            existing = self.collection.find_one({"normalized_query": query_key, "active": True}, {"_id": 1})
+            if existing:
+                return existing["_id"]
+            raise
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        """The job document with its queue position, or None if unknown (or expired)."""
+        # A client polling a job must never wait on workers nobody started
+        self._ensure_workers()
+        job = self.collection.find_one({"_id": job_id}, {"active": 0, "expires_at": 0})
+        if job is None:
+            return None
+        job["job_id"] = job.pop("_id")
+        if job["status"] == "queued":
+            job["queue_position"] = self.collection.count_documents(
+                {"status": "queued", "created_at": {"$lt": job["created_at"]}}
+            )
+        return job
+
+    def watch(self, job_id, poll_interval=0.5):
+        """Yield the job whenever its status or per-site progress changes, until it finishes."""
+        last = None
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                return
+            state = (job["status"], job["sources"])
+            if state != last:
+                last = state
+                yield job
+            if job["status"] in ("done", "failed"):
+                return
+            time.sleep(poll_interval)
+
+    def _claim(self):
+        """Atomically take the oldest queued job, or one whose worker went away."""
+        now = time.time()
+        return self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued"},
+                {"status": "running", "started_at": {"$lt": now - JOB_LEASE_SECONDS}}
+            ]},
+            {"$set": {"status": "running", "started_at": now}},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _run(self, job):
+        job_id = job["_id"]
+        print(f"[JOBS] Running scrape job {job_id} for: {job['query']}")
+
+        def on_source_done(name, info):
+            # Once the job has finished its sources are final
+            self.collection.update_one({"_id": job_id, "status": "running"}, {"$set": {f"sources.{name}": info}})
+
+        update = {"finished_at": time.time()}
+        try:
+            sources = self.run_job(job["query"], on_source_done)
+            update.update({"status": "done", "sources": sources})
+        except Exception as e:
+            print(f"[JOBS] Scrape job {job_id} failed: {e}")
+            update.update({"status": "failed", "error": str(e)})
+        update["finished_at"] = time.time()
+        update["expires_at"] = datetime.utcnow() + timedelta(hours=JOB_RETENTION_HOURS)
+        self.collection.update_one({"_id": job_id}, {"$set": update, "$unset": {"active": ""}})
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._claim()
+            except Exception as e:
+                print(f"[JOBS] Could not claim a job: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def stats(self):
+        """Queue depth for the /status endpoint."""
+        return {
+            "workers": self.workers,
+            "queued": self.collection.count_documents({"status": "queued"}),
+            "running": self.collection.count_documents({"status": "running"}),
+            "max_queued": self.max_queued,
+        }
+
+    def shutdown(self):
+        """Stop taking new jobs; running ones finish (or are re-queued after their lease)."""
+        self._stopping.set()
+        self._wakeup.set()
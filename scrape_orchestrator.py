@@ -0,0 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+import threading
+import importlib
+import time
+
+# Deadlines (in seconds)
+SITE_TIMEOUT = 45  # Each scraper gets at most this long
+GLOBAL_TIMEOUT = 60  # The whole search never waits longer than this
+MAX_SCRAPER_THREADS = 12
+
+# Shared worker threads for all searches
+executor = ThreadPoolExecutor(max_workers=MAX_SCRAPER_THREADS, thread_name_prefix="scraper")
+
+
+def time_left(deadline, default=None):
+    """Seconds remaining until `deadline`, or `default` if there is no deadline."""
+    if deadline is None:
+        return default
+    return max(deadline - time.time(), 0)
+
+
+def deadline_passed(deadline):
+    """True once a scraper should stop and keep what it has collected so far."""
+    return deadline is not None and time.time() >= deadline
+
+
+def lazy_scraper(module_name, function_name):
+    """Return a scraper that imports its module (and Selenium) on first use."""
+    def run(search_query, deadline=None):
+        scraper = getattr(importlib.import_module(module_name), function_name)
+        return scraper(search_query, deadline=deadline)
+    return run
+
+
+def run_scrapers(search_query, scrapers, site_timeout=SITE_TIMEOUT, global_timeout=GLOBAL_TIMEOUT, on_source_done=None):
+    """
+    Run every scraper concurrently with a per-site and a global deadline.
+    Scrapers receive their deadline and stop early once it passes; any scraper
+    still running when the global deadline is hit is abandoned.
+    `on_source_done(name, info)` is called as each scraper finishes, fails or
+    times out (from the scraper's thread), so callers can stream progress.
+    Scrapers return "completed" (or None), "partial" when their deadline cut
+    the pass short, or "timeout" when it passed before they got anywhere;
+    exceptions are reported as "error".
+    Returns {name: {"status": ..., "elapsed": ...}} for every scraper.
+    """
+    started = time.time()
+    global_deadline = started + global_timeout
+    site_deadline = min(started + site_timeout, global_deadline)
+
+    sources = {}
+    futures = {}
+    reported = set()  # Each source is reported once; an abandoned straggler must not overwrite its "timeout"
+    reported_lock = threading.Lock()
+
+    def notify(name, status, elapsed=None):
+        if on_source_done is None:
+            return
+        with reported_lock:
+            if name in reported:
+                return
+            reported.add(name)
+        try:
+            on_source_done(name, {"status": status, "elapsed": elapsed})
+        except Exception as e:
+            print(f"Progress callback failed for {name}: {e}")
+
+    def run(name, scraper):
+        print(f"Starting {name} scraper...")
+        try:
+            status = scraper(search_query, deadline=site_deadline) or "completed"
+        except Exception:
+            notify(name, "error")
+            raise
+        print(f"Finished {name} scraping ({status})")
+        elapsed = round(time.time() - started, 2)
+        notify(name, status, elapsed)
+        return status, elapsed
+
+    for name, scraper in scrapers.items():
+        sources[name] = {"status": "pending", "elapsed": None}
+        futures[executor.submit(run, name, scraper)] = name
+
+    wait(futures, timeout=time_left(global_deadline))
+
+    for future, name in futures.items():
+        if not future.done():
+            future.cancel()
+            sources[name]["status"] = "timeout"
+            print(f"{name} scraper missed the deadline, returning partial results")
+            notify(name, "timeout")
+            continue
+
+        error = future.exception()
+        if error is not None:
+            sources[name]["status"] = "error"
+            print(f"Error in {name} scraper: {error}")
+        else:
+            sources[name]["status"], sources[name]["elapsed"] = future.result()
+
+    return sources
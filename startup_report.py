@@ -0,0 +1,71 @@
+import subprocess
+import sys
+import time
+import os
+
+REPORT_TOP_N = 15  # Slowest top-level imports shown, and slowest direct imports under each
+
+
+def measure_imports(module_name):
+    """
+    Import `module_name` in a fresh interpreter with `python -X importtime`.
+    Returns (wall_seconds, rows) where rows are (cumulative_us, self_us, depth, name).
+    """
+    started = time.time()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    wall_seconds = time.time() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module_name} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        # Format: "import time: <self us> | <cumulative us> | <indented name>"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(cumulative_us), int(self_us), depth, name.strip()))
+    return wall_seconds, rows
+
+
+def top_level_imports(rows):
+    """
+    Group importtime rows into (cumulative_us, self_us, name, children) per
+    top-level import, children being its direct imports as (cumulative_us, self_us, name).
+    -X importtime prints a module after everything it imported, so the
+    depth-1 rows seen since the previous top-level row belong to the next one.
+    """
+    top_level = []
+    children = []
+    for cumulative, self_us, depth, name in rows:
+        if depth == 1:
+            children.append((cumulative, self_us, name))
+        elif depth == 0:
+            top_level.append((cumulative, self_us, name, children))
+            children = []
+    return top_level
+
+
+def print_startup_report(module_name, top_n=REPORT_TOP_N):
+    """Print where startup time goes when importing `module_name`, one level below each top-level import."""
+    wall_seconds, rows = measure_imports(module_name)
+    top_level = top_level_imports(rows)
+    total_us = sum(cumulative for cumulative, _, _, _ in top_level)
+
+    print(f"Startup report for '{module_name}'")
+    print(f"  Interpreter wall time: {wall_seconds:.2f}s")
+    print(f"  Total import time:     {total_us / 1e6:.2f}s across {len(rows)} modules")
+    print("-" * 60)
+    print(f"{'cumulative':>12} {'self':>10}  module (top-level imports and their direct imports)")
+    for cumulative, self_us, name, children in sorted(top_level, reverse=True)[:top_n]:
+        print(f"{cumulative / 1000:>10.1f}ms {self_us / 1000:>8.1f}ms  {name}")
+        for child_cumulative, child_self_us, child_name in sorted(children, reverse=True)[:top_n]:
+            print(f"{child_cumulative / 1000:>10.1f}ms {child_self_us / 1000:>8.1f}ms    {child_name}")
+
+
+if __name__ == "__main__":
+    print_startup_report(sys.argv[1] if len(sys.argv) > 1 else "app")
@@ -0,0 +1,143 @@
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+# The app modules live at the repository root, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeGemini:
+    """
+    Local stand-in for the Gemini REST API, answering generateContent and
+    streamGenerateContent (SSE). Tests set `chunks`, `status`, `delay`,
+    `chunk_delay` and `retry_after`, and read `requests` to count upstream calls.
+    """
+
+    def __init__(self):
+        self.chunks = ["Ahoy ", "nakama!"]
+        self.status = 200
+        self.delay = 0.0
+        self.chunk_delay = 0.0  # Pause between streamed chunks
+        self.retry_after = None
+        self.requests = []
+        self.base_url = None
+
+    @property
+    def reply(self):
+        return "".join(self.chunks)
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, and chunked streams like the real API
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                fake.requests.append((self.path, body))
+                time.sleep(fake.delay)
+                if fake.status != 200:
+                    self.send_response(fake.status)
+                    if fake.retry_after is not None:
+                        self.send_header("Retry-After", str(fake.retry_after))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if ":streamGenerateContent" in self.path:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for i, chunk in enumerate(fake.chunks):
+                        if i:
+                            time.sleep(fake.chunk_delay)
+                        event = {"candidates": [{"content": {"parts": [{"text": chunk}]}}]}
+                        data = f"data: {json.dumps(event)}\r\n\r\n".encode()
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                    return
+                payload = json.dumps({"candidates": [{"content": {"parts": [{"text": fake.reply}]}}]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+
+@pytest.fixture
+def fake_gemini():
+    fake = FakeGemini()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), fake.handler())
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    fake.base_url = f"http://127.0.0.1:{server.server_port}/v1beta/models/gemini-2.0-flash"
+    yield fake
+    server.shutdown()
+    server.server_close()
+
+
+STOP_WORDS = {"a", "an", "the", "please", "can", "you", "me"}
+
+
+def fake_embed(text):
+    """Deterministic bag-of-words embedding, standing in for the sentence-transformer."""
+    vector = np.zeros(64, dtype=np.float32)
+    for word in text.lower().split():
+        word = word.strip("?!.,")
+        if word and word not in STOP_WORDS:
+            vector[zlib.crc32(word.encode()) % 64] += 1.0
+    return vector
+
+
+@pytest.fixture
+def chatbot(fake_gemini, monkeypatch):
+    """gemini_chatbot pointed at fake_gemini, with a fresh cache (fake embeddings) and guard."""
+    import gemini_chatbot
+    from chat_cache import ChatResponseCache
+    from upstream_guard import UpstreamGuard
+
+    monkeypatch.setattr(gemini_chatbot, "GEMINI_API_URL", f"{fake_gemini.base_url}:generateContent?key=test")
+    monkeypatch.setattr(gemini_chatbot, "GEMINI_STREAM_URL", f"{fake_gemini.base_url}:streamGenerateContent?alt=sse&key=test")
+    monkeypatch.setattr(gemini_chatbot, "response_cache", ChatResponseCache(fake_embed))
+    monkeypatch.setattr(gemini_chatbot, "upstream_guard", UpstreamGuard())
+    return gemini_chatbot
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """ml_ranker encoding with fake_embed instead of the sentence-transformer."""
+    import ml_ranker
+
+    def encode_products(texts):
+        stats = {"hits": 0, "texts": len(texts), "hit_ratio": 0.0, "encoded": len(texts), "encode_seconds": 0.0}
+        return np.stack([fake_embed(text) for text in texts]), stats
+
+    monkeypatch.setattr(ml_ranker, "encode_query", fake_embed)
+    monkeypatch.setattr(ml_ranker, "encode_products", encode_products)
+
+
+@pytest.fixture
+def mongo_db():
+    """In-memory mongomock database; skipped where mongomock can't run bulk updates with this pymongo."""
+    mongomock = pytest.importorskip("mongomock")
+    db = mongomock.MongoClient().db
+    try:
+        from pymongo import UpdateOne
+        db.probe.bulk_write([UpdateOne({"_id": 1}, {"$set": {"x": 1}}, upsert=True)])
+    except TypeError as e:
+        pytest.skip(f"mongomock bulk_write is incompatible with this pymongo (see requirements-dev.txt): {e}")
+    db.drop_collection("probe")
+    return db
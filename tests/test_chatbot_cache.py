@@ -0,0 +1,101 @@
+"""
+ask_luffybot and its reply cache against a local fake Gemini endpoint
+(see conftest.FakeGemini): hit-rate, saved upstream latency and fallbacks.
+"""
+import threading
+import time
+
+import pytest
+
+from chat_cache import ChatResponseCache
+from conftest import fake_embed
+
+
+def test_repeated_and_paraphrased_questions_skip_the_upstream(chatbot, fake_gemini):
+    fake_gemini.delay = 0.2
+
+    assert chatbot.ask_luffybot("How do I enable stock alerts?", "debug") == fake_gemini.reply
+    assert chatbot.ask_luffybot("how do i enable   stock alerts", "debug") == fake_gemini.reply  # exact after normalizing
+    assert chatbot.ask_luffybot("Please, how do I enable the stock alerts?", "debug") == fake_gemini.reply  # semantic
+    assert len(fake_gemini.requests) == 1
+
+    chatbot.ask_luffybot("Which sites do you compare?", "debug")
+    assert len(fake_gemini.requests) == 2
+
+    stats = chatbot.chatbot_stats()["cache"]
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 2)
+    assert stats["hit_rate"] == 0.5
+    # Each hit saved the upstream latency of the call that filled it
+    assert stats["saved_upstream_seconds"] >= 2 * fake_gemini.delay
+
+
+def test_replies_are_cached_per_bot(chatbot, fake_gemini):
+    chatbot.ask_luffybot("Suggest a robot project", "luffy")
+    chatbot.ask_luffybot("Suggest a robot project", "pro")
+    assert len(fake_gemini.requests) == 2
+
+
+def test_failed_calls_are_not_cached(chatbot, fake_gemini):
+    fake_gemini.status = 500
+    assert chatbot.ask_luffybot("Suggest a robot project").startswith("Oops!")
+
+    fake_gemini.status = 200
+    assert chatbot.ask_luffybot("Suggest a robot project") == fake_gemini.reply
+    assert len(fake_gemini.requests) == 2
+
+
+def test_rate_limit_opens_the_circuit(chatbot, fake_gemini):
+    fake_gemini.status, fake_gemini.retry_after = 429, 30
+    chatbot.ask_luffybot("Suggest a robot project")
+
+    # Refused locally until Gemini's Retry-After has passed
+    assert chatbot.ask_luffybot("Another question") == chatbot.UNAVAILABLE_REPLIES["luffy"]
+    assert len(fake_gemini.requests) == 1
+    assert chatbot.chatbot_stats()["upstream"]["circuit"] == "open"
+
+
+def test_embedding_failure_falls_back_to_exact_matches(chatbot, fake_gemini, monkeypatch):
+    def broken_embed(message):
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(chatbot, "response_cache", ChatResponseCache(broken_embed))
+
+    chatbot.ask_luffybot("Suggest a robot project")
+    assert chatbot.ask_luffybot("suggest a robot project!") == fake_gemini.reply
+    assert chatbot.ask_luffybot("Can you suggest a robot project") == fake_gemini.reply  # Would be semantic, now a miss
+    assert len(fake_gemini.requests) == 2
+    assert chatbot.chatbot_stats()["cache"]["embed_errors"] > 0
+
+
+def test_first_message_does_not_wait_for_the_model(chatbot, monkeypatch):
+    release = threading.Event()
+    loads = []
+
+    def slow_warm_up():
+        loads.append(time.time())
+        release.wait(5)
+
+    monkeypatch.setattr(chatbot, "model_loaded", lambda: False)
+    monkeypatch.setattr(chatbot, "warm_up", slow_warm_up)
+    monkeypatch.setattr(chatbot, "_model_loading", threading.Event())
+
+    started = time.time()
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            chatbot.embed_message("Suggest a robot project")
+    assert time.time() - started < 1
+
+    release.set()
+    time.sleep(0.1)
+    assert len(loads) == 1  # One background load, however many messages arrived
+
+
+def test_made_up_bot_names_share_one_bounded_cache():
+    cache = ChatResponseCache(fake_embed, max_entries=10)
+    for i in range(50):
+        cache.put(f"bot-{i}", "Suggest a robot project", "reply", 0.1)
+
+    entries = cache.stats()["entries"]
+    assert sum(entries.values()) == 10
+    assert cache.get("bot-49", "Suggest a robot project") == ("reply", "exact")
+    assert cache.get("bot-0", "Suggest a robot project") == (None, None)
@@ -0,0 +1,30 @@
+import pytest
+
+app_module = pytest.importorskip("app")
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize("path", ["/chatbot", "/chatbot/stream"])
+def test_unknown_bot_is_rejected_before_the_guard(client, path, monkeypatch):
+    monkeypatch.setattr(app_module, "ask_luffybot", lambda *args: pytest.fail("reached the chatbot"))
+    monkeypatch.setattr(app_module, "stream_luffybot", lambda *args: pytest.fail("reached the chatbot"))
+
+    response = client.post(path, json={"message": "hi", "bot": "luffy-7f3a"})
+
+    assert response.status_code == 400
+    assert "luffy, pro, debug" in response.get_json()["error"]
+    assert "luffy-7f3a" not in app_module.chatbot_stats()["upstream"]["in_flight"]
+
+
+def test_known_bot_reaches_the_chatbot(client, monkeypatch):
+    monkeypatch.setattr(app_module, "ask_luffybot", lambda message, bot_type: f"{bot_type}: {message}")
+    monkeypatch.setattr(app_module.chatlog_writer, "add", lambda doc: None)
+
+    response = client.post("/chatbot", json={"message": "hi", "bot": "debug"})
+
+    assert response.status_code == 200
+    assert response.get_json() == {"reply": "debug: hi"}
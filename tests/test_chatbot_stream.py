@@ -0,0 +1,65 @@
+"""
+stream_luffybot against a local fake Gemini SSE endpoint (see conftest.FakeGemini).
+"""
+import time
+
+
+def test_chunks_arrive_as_gemini_generates_them(chatbot, fake_gemini):
+    fake_gemini.chunks = ["Ahoy! ", "Let's build ", "a line-following ", "robot!"]
+    fake_gemini.chunk_delay = 0.2
+
+    started = time.time()
+    stream = chatbot.stream_luffybot("Suggest a robot project")
+    first = next(stream)
+    first_chunk_seconds = time.time() - started
+    rest = list(stream)
+    total_seconds = time.time() - started
+
+    assert [first] + rest == fake_gemini.chunks
+    # The first chunk does not wait for the whole reply
+    assert first_chunk_seconds < total_seconds - 2 * fake_gemini.chunk_delay
+    assert fake_gemini.requests[0][0].startswith("/v1beta/models/gemini-2.0-flash:streamGenerateContent?alt=sse")
+
+
+def test_streamed_reply_is_cached_for_both_paths(chatbot, fake_gemini):
+    assert list(chatbot.stream_luffybot("Suggest a robot project")) == fake_gemini.chunks
+
+    # Cached replies come back in one piece, from the stream and the plain call alike
+    assert list(chatbot.stream_luffybot("suggest a robot project")) == [fake_gemini.reply]
+    assert chatbot.ask_luffybot("Suggest a robot project") == fake_gemini.reply
+    assert len(fake_gemini.requests) == 1
+
+
+def test_upstream_error_yields_the_fallback_and_is_not_cached(chatbot, fake_gemini):
+    fake_gemini.status = 500
+    replies = list(chatbot.stream_luffybot("Suggest a robot project"))
+    assert len(replies) == 1 and replies[0].startswith("Oops!")
+
+    fake_gemini.status = 200
+    assert list(chatbot.stream_luffybot("Suggest a robot project")) == fake_gemini.chunks
+    assert len(fake_gemini.requests) == 2
+
+    upstream = chatbot.chatbot_stats()["upstream"]
+    assert upstream["errors"] == 1 and upstream["in_flight"]["luffy"] == 0
+
+
+def test_client_disconnect_releases_the_slot_without_counting_a_failure(chatbot, fake_gemini):
+    fake_gemini.chunks = ["Ahoy! ", "nakama, ", "let's go!"]
+    stream = chatbot.stream_luffybot("Suggest a robot project")
+    next(stream)
+    stream.close()  # What Flask does when the browser goes away
+
+    upstream = chatbot.chatbot_stats()["upstream"]
+    assert upstream["calls"] == 1
+    assert upstream["errors"] == 0
+    assert upstream["in_flight"]["luffy"] == 0
+    # A half-received reply is not cached
+    assert chatbot.chatbot_stats()["cache"]["entries"].get("luffy", 0) == 0
+
+
+def test_rate_limited_stream_opens_the_circuit(chatbot, fake_gemini):
+    fake_gemini.status, fake_gemini.retry_after = 429, 30
+    list(chatbot.stream_luffybot("Suggest a robot project"))
+
+    assert list(chatbot.stream_luffybot("Another question")) == [chatbot.UNAVAILABLE_REPLIES["luffy"]]
+    assert len(fake_gemini.requests) == 1
@@ -0,0 +1,146 @@
+"""
+EmailOutbox against a local aiosmtpd server (no real mail leaves the machine)
+and an in-memory mongomock collection.
+"""
+import email
+import os
+import socket
+import time
+from email.header import decode_header, make_header
+
+import pytest
+
+import email_outbox
+from email_outbox import EmailOutbox
+
+mongomock = pytest.importorskip("mongomock")
+controller = pytest.importorskip("aiosmtpd.controller")
+
+
+class Mailbox:
+    """aiosmtpd handler keeping every delivered message."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    mailbox = Mailbox()
+    server = controller.Controller(mailbox, hostname="127.0.0.1", port=free_port())
+    server.start()
+    yield server, mailbox
+    server.stop()
+
+
+@pytest.fixture
+def outbox_collection(monkeypatch):
+    monkeypatch.setattr(email_outbox, "DIGEST_DELAY_SECONDS", 0)
+    return mongomock.MongoClient().db.email_outbox
+
+
+def make_outbox(collection, port):
+    outbox = EmailOutbox(collection, host="127.0.0.1", port=port, starttls=False)
+    outbox._pid = os.getpid()  # Drained by hand below, not by the background sender
+    return outbox
+
+
+def drain(outbox):
+    docs = outbox._claim()
+    if docs:
+        outbox._send_batch(docs)
+    return docs
+
+
+def test_alerts_for_one_recipient_go_out_as_a_digest_over_one_connection(smtp_server, outbox_collection):
+    server, mailbox = smtp_server
+    outbox = make_outbox(outbox_collection, server.port)
+
+    outbox.enqueue("ada@example.com", "Pi 4 is back", "<p>Pi 4</p>", digest_section="<p>Pi 4</p>")
+    outbox.enqueue("ada@example.com", "ESP32 is back", "<p>ESP32</p>", digest_section="<p>ESP32</p>")
+    outbox.enqueue("bob@example.com", "Welcome", "<p>Hi</p>")
+    drain(outbox)
+    outbox._close()
+
+    recipients = sorted(envelope.rcpt_tos[0] for envelope in mailbox.messages)
+    assert recipients == ["ada@example.com", "bob@example.com"]
+    digest = email.message_from_bytes(next(e for e in mailbox.messages if e.rcpt_tos == ["ada@example.com"]).content)
+    assert "2 products you're watching" in str(make_header(decode_header(digest["Subject"])))
+    body = digest.get_payload()[0].get_payload(decode=True).decode()
+    assert "Pi 4" in body and "ESP32" in body
+
+    assert outbox.connections == 1
+    assert outbox.digests == 1
+    assert outbox.sent == 3
+    assert outbox_collection.count_documents({"status": "sent"}) == 3
+
+
+def test_server_down_retries_with_backoff_then_delivers(smtp_server, outbox_collection):
+    server, mailbox = smtp_server
+    outbox = make_outbox(outbox_collection, free_port())  # Nothing listens here
+
+    outbox.enqueue("ada@example.com", "Welcome", "<p>Hi</p>")
+    before = time.time()
+    drain(outbox)
+
+    doc = outbox_collection.find_one()
+    assert doc["status"] == "pending"
+    assert doc["attempts"] == 1
+    # First retry waits RETRY_BASE_SECONDS, with up to 20% jitter
+    assert doc["next_attempt_at"] >= before + email_outbox.RETRY_BASE_SECONDS * 0.8
+    assert outbox.retried == 1 and mailbox.messages == []
+
+    # Not due yet, so nothing is claimed
+    assert drain(outbox) == []
+
+    # Server comes back and the retry is due
+    outbox.port = server.port
+    outbox_collection.update_one({"_id": doc["_id"]}, {"$set": {"next_attempt_at": time.time()}})
+    drain(outbox)
+    outbox._close()
+
+    assert len(mailbox.messages) == 1
+    assert outbox_collection.find_one()["status"] == "sent"
+
+
+def test_gives_up_after_max_attempts(outbox_collection):
+    outbox = make_outbox(outbox_collection, free_port())
+    outbox.enqueue("ada@example.com", "Welcome", "<p>Hi</p>")
+
+    for _ in range(email_outbox.MAX_ATTEMPTS):
+        outbox_collection.update_many({"status": "pending"}, {"$set": {"next_attempt_at": 0}})
+        drain(outbox)
+
+    doc = outbox_collection.find_one()
+    assert doc["status"] == "failed"
+    assert doc["attempts"] == email_outbox.MAX_ATTEMPTS
+    assert outbox.failed == 1
+
+
+def test_start_sends_mail_left_from_a_previous_run(smtp_server, outbox_collection):
+    server, mailbox = smtp_server
+    outbox_collection.insert_one({
+        "recipient": "ada@example.com", "subject": "Queued before restart", "html": "<p>Hi</p>",
+        "digest_section": None, "status": "pending", "attempts": 0,
+        "next_attempt_at": time.time(), "created_at": time.time(),
+    })
+    outbox = EmailOutbox(outbox_collection, host="127.0.0.1", port=server.port, starttls=False)
+    outbox.start()
+    try:
+        deadline = time.time() + 5
+        while not mailbox.messages and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        outbox.shutdown()
+
+    assert len(mailbox.messages) == 1
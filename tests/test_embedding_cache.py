@@ -0,0 +1,54 @@
+import threading
+import time
+
+import numpy as np
+
+from embedding_cache import EmbeddingStore
+
+DIM = 8
+
+
+def fake_encode(texts):
+    return np.array([[len(text)] * DIM for text in texts], dtype=np.float32)
+
+
+def test_encodes_only_misses_and_persists(tmp_path):
+    store = EmbeddingStore("fake-model", DIM, directory=str(tmp_path))
+    first, stats = store.encode(["pi 4", "uno", "pi 4"], fake_encode)
+    assert stats["encoded"] == 2
+    assert first[:, 0].tolist() == [4, 3, 4]
+
+    reopened = EmbeddingStore("fake-model", DIM, directory=str(tmp_path))
+    again, stats = reopened.encode(["uno", "pi 4"], fake_encode)
+    assert stats["hits"] == 2 and stats["encoded"] == 0
+    assert again[:, 0].tolist() == [3, 4]
+
+
+def test_cached_lookups_do_not_wait_for_another_callers_encode(tmp_path):
+    store = EmbeddingStore("fake-model", DIM, directory=str(tmp_path))
+    store.encode(["cached product"], fake_encode)
+
+    encoding = threading.Event()
+    release = threading.Event()
+
+    def slow_encode(texts):
+        encoding.set()
+        release.wait(5)
+        return fake_encode(texts)
+
+    cold = threading.Thread(target=store.encode, args=(["new product"], slow_encode))
+    cold.start()
+    try:
+        assert encoding.wait(5)
+        started = time.time()
+        embeddings, stats = store.encode(["cached product"], fake_encode)
+        assert time.time() - started < 1
+        assert stats["hits"] == 1
+        assert embeddings[0, 0] == len("cached product")
+    finally:
+        release.set()
+        cold.join()
+
+    # The cold encode landed once the model returned
+    _, stats = store.encode(["new product"], fake_encode)
+    assert stats["hits"] == 1
@@ -0,0 +1,84 @@
+"""
+Cross-source grouping (product_matching.group_listings) and the merged offers in the ranking.
+"""
+import pytest
+
+import ml_ranker
+from product_matching import group_listings
+
+
+def grouped(*listings):
+    """Group (name, source) pairs and return the groups as lists of names."""
+    groups = group_listings([ml_ranker.extract_core_name(name) for name, _ in listings],
+                            [source for _, source in listings])
+    return [[listings[i][0] for i in group] for group in groups]
+
+
+@pytest.mark.parametrize("product, accessory", [
+    ("Raspberry Pi 4 Model B 4GB", "Raspberry Pi 4 Model B 4GB Case"),
+    ("Arduino Uno R3", "Arduino Uno R3 Case"),
+    ("HC-SR04 Ultrasonic Sensor", "HC-SR04 Ultrasonic Sensor Mounting Bracket"),
+    ("SG90 Micro Servo Motor", "SG90 Micro Servo Motor Mount"),
+    ("ESP32 Board", "ESP32 Board with Camera"),
+])
+def test_accessories_stay_apart_from_their_product(product, accessory):
+    assert grouped((product, "Robu.in"), (accessory, "Amazon.in")) == [[product], [accessory]]
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Raspberry Pi 4 Model B 4GB", "Raspberry Pi 4 Model B 4GB"),
+    ("HC-SR04 Ultrasonic Sensor", "HC SR04 Ultrasonic Sensor"),
+    ("Arduino Uno R3", "Arduino Uno R3 Board"),
+    ("Official Raspberry Pi 4 Case", "Raspberry Pi 4 Case"),
+    ("Ultrasonic Sensor HC-SR04", "HC-SR04 Ultrasonic Sensor"),
+])
+def test_same_product_merges_across_sources(first, second):
+    assert grouped((first, "Robu.in"), (second, "Amazon.in")) == [[first, second]]
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Raspberry Pi 4 Model B 4GB", "Raspberry Pi 4 Model B 8GB"),
+    ("ESP32-S3 DevKit", "ESP32-C3 DevKit"),
+    ("1K Ohm Resistor", "1M Ohm Resistor"),
+])
+def test_different_models_stay_apart(first, second):
+    assert grouped((first, "Robu.in"), (second, "Amazon.in")) == [[first], [second]]
+
+
+def test_never_two_listings_from_one_source():
+    groups = grouped(
+        ("Raspberry Pi 4 Model B 4GB", "Amazon.in"),
+        ("Raspberry Pi 4 Model B 4GB", "Amazon.in"),
+        ("Raspberry Pi 4 Model B 4GB", "Robu.in"),
+    )
+    assert [len(group) for group in groups] == [2, 1]
+
+
+def test_groups_are_cached_per_listing_set():
+    cores = ["raspberry pi 4 b 4gb", "raspberry pi 4 b 4gb", "arduino uno r3"]
+    first = group_listings(cores, ["Robu.in", "Amazon.in", "Robu.in"])
+    first[0].append(99)  # Callers get their own lists
+    assert group_listings(cores, ["Robu.in", "Amazon.in", "Robu.in"]) == [[0, 1], [2]]
+
+
+PI_LISTINGS = [
+    {"name": "Raspberry Pi 4 Model B 8GB", "price": "₹7,899.00", "availability": "No", "source": "Robu.in", "product_link": "https://robu.in/p/rpi4-8gb"},
+    {"name": "Raspberry Pi 4 Model B 8GB", "price": "₹8,150", "availability": "Yes", "source": "Amazon.in", "product_link": "https://amazon.in/p/rpi4-8gb"},
+    {"name": "Raspberry Pi 4 Model B 8GB Case", "price": "₹299", "availability": "Yes", "source": "Amazon.in", "product_link": "https://amazon.in/p/rpi4-case"},
+    {"name": "Raspberry Pi 4 Model B 4GB", "price": "₹5,399.00", "availability": "Yes", "source": "Robu.in", "product_link": "https://robu.in/p/rpi4-4gb"},
+]
+
+
+def test_same_product_across_sources_is_one_entry_with_offers(fake_model):
+    ranked = ml_ranker.rank_scraped_products(PI_LISTINGS, "raspberry pi 4")
+    entry = next(p for p in ranked if p["name"] == "Raspberry Pi 4 Model B 8GB")
+    assert sorted(offer["source"] for offer in entry["offers"]) == ["Amazon.in", "Robu.in"]
+    assert entry["offers"][0]["product_link"] == entry["product_link"]
+
+
+@pytest.mark.parametrize("query", ["raspberry pi 4", "raspberry pi 4 case"])
+def test_a_case_is_its_own_result_not_an_offer(fake_model, query):
+    ranked = ml_ranker.rank_scraped_products(PI_LISTINGS, query)
+    assert len(ranked) == 3
+    case = next(p for p in ranked if p["product_link"] == "https://amazon.in/p/rpi4-case")
+    assert [offer["product_link"] for offer in case["offers"]] == ["https://amazon.in/p/rpi4-case"]
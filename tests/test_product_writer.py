@@ -0,0 +1,72 @@
+"""
+ProductWriter keys listings on canonical links and lets rows no query returns expire.
+"""
+import pytest
+
+import database
+from database import ProductWriter, canonical_link
+
+
+@pytest.mark.parametrize("link, expected", [
+    ("https://www.amazon.in/Raspberry-Pi-Model-4GB-RAM/dp/B07TC2BK1X/ref=sr_1_3?crid=2X&keywords=raspberry+pi+4&qid=1760790000&sr=8-3",
+     "https://www.amazon.in/dp/B07TC2BK1X"),
+    ("https://www.amazon.in/gp/product/B07TC2BK1X?psc=1", "https://www.amazon.in/dp/B07TC2BK1X"),
+    ("https://www.amazon.in/sspa/click?ie=UTF8&spc=MTo0&url=%2FGeeekPi-Raspberry-Aluminum%2Fdp%2FB07ZVJDRF3%2Fref%3Dsr_1_1_sspa%3Fqid%3D1760790000&sp_csd=d2lk",
+     "https://www.amazon.in/dp/B07ZVJDRF3"),
+    ("https://robocraze.com/products/hc-sr04-ultrasonic-sensor?_pos=1&_sid=8f3a1&_ss=r",
+     "https://robocraze.com/products/hc-sr04-ultrasonic-sensor"),
+    ("https://robu.in/product/raspberry-pi-4-model-b-with-4-gb-ram/", "https://robu.in/product/raspberry-pi-4-model-b-with-4-gb-ram/"),
+])
+def test_canonical_link(link, expected):
+    assert canonical_link(link) == expected
+
+
+def amazon_listing(asin, qid, price="₹5,650"):
+    return {
+        "name": f"Listing {asin}",
+        "price": price,
+        "availability": "Yes",
+        "product_link": f"https://www.amazon.in/Some-Title/dp/{asin}/ref=sr_1_1?qid={qid}&sr=8-1",
+        "search_query": "raspberry pi 4",
+    }
+
+
+@pytest.fixture
+def writer_db(mongo_db, monkeypatch):
+    monkeypatch.setattr(database, "refreshes_collection", mongo_db.refreshes)
+    return mongo_db
+
+
+def refresh(db, listings, query="raspberry pi 4"):
+    writer = ProductWriter("Amazon.in", query)
+    writer.collection = db.products
+    with writer:
+        for listing in listings:
+            writer.add(listing)
+    writer.finish()
+    return writer
+
+
+def test_rescrape_with_new_tracking_parameters_touches_nothing(writer_db):
+    refresh(writer_db, [amazon_listing("B07TC2BK1X", 1), amazon_listing("B07ZVJDRF3", 1)])
+    writer = refresh(writer_db, [amazon_listing("B07TC2BK1X", 2), amazon_listing("B07ZVJDRF3", 2)])
+
+    assert writer_db.products.count_documents({}) == 2
+    assert writer.unchanged == 2 and writer.written == 0
+    assert writer_db.products.count_documents({"stale_for": {"$exists": True, "$ne": []}}) == 0
+
+
+def test_listing_stale_for_every_query_expires(writer_db):
+    refresh(writer_db, [amazon_listing("B07TC2BK1X", 1), amazon_listing("B07ZVJDRF3", 1)])
+    refresh(writer_db, [amazon_listing("B07ZVJDRF3", 1)], query="pi 4 case")
+    # The board drops out of "raspberry pi 4"; the case is still listed for "pi 4 case"
+    refresh(writer_db, [amazon_listing("B0CK2FCG1K", 2)])
+
+    board = writer_db.products.find_one({"product_link": "https://www.amazon.in/dp/B07TC2BK1X"})
+    case = writer_db.products.find_one({"product_link": "https://www.amazon.in/dp/B07ZVJDRF3"})
+    assert "expires_at" in board
+    assert "expires_at" not in case
+
+    # Seen again before it expired: it stays
+    refresh(writer_db, [amazon_listing("B07TC2BK1X", 3)])
+    assert "expires_at" not in writer_db.products.find_one({"product_link": "https://www.amazon.in/dp/B07TC2BK1X"})
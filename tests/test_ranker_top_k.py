@@ -0,0 +1,40 @@
+"""
+rank_scraped_products with a top-k cut and caller weights (fake embeddings, see conftest.fake_model).
+"""
+import ml_ranker
+
+QUERY = "arduino uno"
+
+PRODUCTS = [
+    {"name": "Arduino Uno R3 Board", "price": "₹549", "availability": "Yes", "source": "Robu.in", "product_link": "https://robu.in/p/uno"},
+    {"name": "Arduino Nano V3 Board", "price": "₹299", "availability": "Yes", "source": "Robu.in", "product_link": "https://robu.in/p/nano"},
+    {"name": "Arduino Mega 2560 Board", "price": "₹1,199", "availability": "No", "source": "RoboCraze", "product_link": "https://robocraze.com/p/mega"},
+    {"name": "Arduino Uno Starter Kit", "price": "₹1,899", "availability": "Yes", "source": "Amazon.in", "product_link": "https://amazon.in/p/uno-kit"},
+    {"name": "USB Cable for Arduino Uno", "price": "₹99", "availability": "Yes", "source": "Amazon.in", "product_link": "https://amazon.in/p/usb-cable"},
+    {"name": "Arduino Leonardo Sensor Module", "price": "Price not found", "availability": "Unknown", "source": "RoboCraze", "product_link": "https://robocraze.com/p/leonardo"},
+    {"name": "Arduino Due Board", "price": "₹2,499", "availability": "Yes", "source": "Robu.in", "product_link": "https://robu.in/p/due"},
+]
+
+
+def links(products):
+    return [p["product_link"] for p in products]
+
+
+def test_top_k_is_a_prefix_of_the_full_order(fake_model):
+    full = links(ml_ranker.rank_scraped_products(PRODUCTS, QUERY))
+    assert len(full) == len(PRODUCTS)
+    for k in (1, 3, 5):
+        assert links(ml_ranker.rank_scraped_products(PRODUCTS, QUERY, k=k)) == full[:k]
+
+
+def test_k_beyond_the_result_count_returns_everything(fake_model):
+    full = links(ml_ranker.rank_scraped_products(PRODUCTS, QUERY))
+    assert links(ml_ranker.rank_scraped_products(PRODUCTS, QUERY, k=50)) == full
+
+
+def test_caller_weights_replace_the_query_weights(fake_model):
+    price_only = {"relevance": 0.0, "price": 1000.0, "availability": 0.0}
+    ranked = ml_ranker.rank_scraped_products(PRODUCTS, QUERY, weights=price_only, k=2)
+    # With price dominating, the two cheapest listings lead
+    assert links(ranked) == ["https://amazon.in/p/usb-cable", "https://robu.in/p/nano"]
+    assert links(ranked) != links(ml_ranker.rank_scraped_products(PRODUCTS, QUERY, k=2))
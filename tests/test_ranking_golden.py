@@ -0,0 +1,106 @@
+"""
+Golden test for the batched ranker: scores and final order must match the
+per-item loop it replaced (reproduced below as the reference).
+"""
+import numpy as np
+import pytest
+
+import ml_ranker
+from conftest import fake_embed
+
+QUERY = "raspberry pi 4"
+
+# Listings as they come back from the three sources for QUERY
+PRODUCTS = [
+    {"name": "Raspberry Pi 4 Model B 4GB", "price": "₹5,399.00", "availability": "Yes", "source": "Robu.in", "product_link": "https://robu.in/p/rpi4-4gb"},
+    {"name": "Raspberry Pi 4 Model B 4GB", "price": "₹5,650", "availability": "Yes", "source": "Amazon.in", "product_link": "https://amazon.in/p/rpi4-4gb"},
+    {"name": "Raspberry Pi 4 Model B 8GB", "price": "₹7,899.00", "availability": "No", "source": "Robu.in", "product_link": "https://robu.in/p/rpi4-8gb"},
+    {"name": "Raspberry Pi 4 Model B 2GB", "price": "4,199", "availability": "Yes", "source": "RoboCraze", "product_link": "https://robocraze.com/p/rpi4-2gb"},
+    {"name": "Official Raspberry Pi 4 Case - Red/White", "price": "₹449.00", "availability": "Yes", "source": "Robu.in", "product_link": "https://robu.in/p/rpi4-case"},
+    {"name": "Raspberry Pi 4 Aluminium Heatsink Case with Dual Fan", "price": "₹699", "availability": "Yes", "source": "Amazon.in", "product_link": "https://amazon.in/p/rpi4-fan-case"},
+    {"name": "Official Raspberry Pi USB-C Power Supply 15W", "price": "₹799.00", "availability": "Yes", "source": "RoboCraze", "product_link": "https://robocraze.com/p/rpi-psu"},
+    {"name": "Micro HDMI to HDMI Cable for Raspberry Pi 4", "price": "₹249", "availability": "Yes", "source": "Amazon.in", "product_link": "https://amazon.in/p/micro-hdmi"},
+    {"name": "Raspberry Pi 4 Starter Kit with 4GB Board", "price": "₹7,499", "availability": "Yes", "source": "Amazon.in", "product_link": "https://amazon.in/p/rpi4-kit"},
+    {"name": "Raspberry Pi 400 Personal Computer Kit", "price": "₹8,999.00", "availability": "No", "source": "Robu.in", "product_link": "https://robu.in/p/rpi400"},
+    {"name": "Raspberry Pi Compute Module 4 Wireless 4GB", "price": "₹6,299.00", "availability": "Yes", "source": "Robu.in", "product_link": "https://robu.in/p/cm4"},
+    {"name": "Raspberry Pi 3 Model B+", "price": "₹3,499", "availability": "Yes", "source": "RoboCraze", "product_link": "https://robocraze.com/p/rpi3bplus"},
+    {"name": "Raspberry Pi Camera Module V2", "price": "₹2,199", "availability": "Yes", "source": "RoboCraze", "product_link": "https://robocraze.com/p/cam-v2"},
+    {"name": "GPIO Ribbon Cable 40 Pin with T-Cobbler Board", "price": "₹189", "availability": "Yes", "source": "Amazon.in", "product_link": "https://amazon.in/p/cobbler"},
+    {"name": "Raspberry Pi 4 Model B 8GB", "price": "₹8,150", "availability": "Yes", "source": "Amazon.in", "product_link": "https://amazon.in/p/rpi4-8gb"},
+    {"name": "Raspberry Pi Sense HAT Sensor Board", "price": "Price not found", "availability": "Yes", "source": "Robu.in", "product_link": "https://robu.in/p/sense-hat"},
+    {"name": "Raspberry Pi 4 Getting Started Guide Book", "price": "₹599", "availability": "Unknown", "source": "Amazon.in", "product_link": "https://amazon.in/p/rpi-book"},
+    {"name": "32GB Micro SD Card Preloaded with Raspberry Pi OS", "price": "₹549", "availability": "Yes", "source": "RoboCraze", "product_link": "https://robocraze.com/p/sd-card"},
+]
+
+
+# --- The per-item ranker as it was before batching (reference) ---
+
+def old_accessory_penalty(product_name, query):
+    if any(word in query.lower() for word in ml_ranker.ACCESSORY_PENALTY_KEYWORDS):
+        return 0.0
+    if any(word in product_name.lower() for word in ml_ranker.ACCESSORY_PENALTY_KEYWORDS):
+        return ml_ranker.ACCESSORY_PENALTY_WEIGHT
+    return 0.0
+
+
+def old_simplicity_bonus(product_name):
+    name_lower = product_name.lower()
+    if any(word in name_lower for word in ml_ranker.KIT_PENALTY_KEYWORDS):
+        return -0.2
+    if any(word in name_lower for word in ml_ranker.SIMPLE_PRODUCT_KEYWORDS):
+        return 0.1
+    return 0.0
+
+
+def old_scores(products, query, query_embedding, embeddings, weights):
+    scores = []
+    for i, p in enumerate(products):
+        semantic = float(np.dot(query_embedding, embeddings[i]) /
+                         (np.linalg.norm(query_embedding) * np.linalg.norm(embeddings[i])))
+        bonus = (old_simplicity_bonus(p['name']) + ml_ranker.official_bias(p['name']) +
+                 ml_ranker.token_match_bonus(p['name'], query) + ml_ranker.board_bonus(p['name']))
+        scores.append(
+            weights['relevance'] * semantic +
+            weights['price'] * ml_ranker.normalize_price(p.get('price', '')) +
+            weights['availability'] * ml_ranker.availability_score(p.get('availability', 'unknown')) +
+            bonus - old_accessory_penalty(p['name'], query)
+        )
+    return scores
+
+
+def old_ranking(products, query):
+    """Top listing per core name, best first, exactly as the old loop ordered them."""
+    weights = ml_ranker.dynamic_weights(query)
+    embeddings = np.stack([fake_embed(f"{p['name']} {p.get('price', '')}") for p in products])
+    scores = old_scores(products, query, fake_embed(query), embeddings, weights)
+    grouped = {}
+    for p, score in zip(products, scores):
+        grouped.setdefault(ml_ranker.extract_core_name(p['name']), []).append((score, p))
+    deduped = [sorted(group, key=lambda x: x[0], reverse=True)[0] for group in grouped.values()]
+    return [p for _, p in sorted(deduped, key=lambda x: x[0], reverse=True)]
+
+
+def test_batched_scores_match_per_item_loop():
+    weights = ml_ranker.dynamic_weights(QUERY)
+    embeddings = np.stack([fake_embed(f"{p['name']} {p.get('price', '')}") for p in PRODUCTS])
+    query_embedding = fake_embed(QUERY)
+
+    expected = old_scores(PRODUCTS, QUERY, query_embedding, embeddings, weights)
+    batched = ml_ranker.score_products(PRODUCTS, QUERY, query_embedding, embeddings, weights)
+
+    np.testing.assert_allclose(batched, expected, rtol=0, atol=1e-6)
+
+
+@pytest.mark.parametrize("query", [QUERY, "raspberry pi case", "pi 4 8gb board"])
+def test_scores_match_for_accessory_and_multi_token_queries(query):
+    weights = ml_ranker.dynamic_weights(query)
+    embeddings = np.stack([fake_embed(p['name']) for p in PRODUCTS])
+    expected = old_scores(PRODUCTS, query, fake_embed(query), embeddings, weights)
+    batched = ml_ranker.score_products(PRODUCTS, query, fake_embed(query), embeddings, weights)
+    np.testing.assert_allclose(batched, expected, rtol=0, atol=1e-6)
+
+
+def test_final_order_matches_per_item_loop(fake_model):
+    expected = [p["product_link"] for p in old_ranking(PRODUCTS, QUERY)]
+    ranked = [p["product_link"] for p in ml_ranker.rank_scraped_products(PRODUCTS, QUERY)]
+    assert ranked == expected
@@ -0,0 +1,34 @@
+import pytest
+
+app_module = pytest.importorskip("app")
+mongomock = pytest.importorskip("mongomock")
+import database
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(database, "refreshes_collection", mongomock.MongoClient().db.refreshes)
+    monkeypatch.setattr(app_module, "result_cache", app_module.ResultCache())
+    return app_module.app.test_client()
+
+
+def test_rescrape_in_another_worker_invalidates_cached_pages(client, monkeypatch):
+    stored = ([{"name": "Arduino Nano", "price": 350.0}], {"Robu.in": {"status": "fresh"}}, 10)
+    monkeypatch.setattr(app_module, "lookup_stored_results", lambda search_query: stored)
+    ranked = []
+
+    def rank_page(products, search_query, weights, limit, cursor=0):
+        ranked.append(search_query)
+        return products, None
+    monkeypatch.setattr(app_module, "rank_page", rank_page)
+
+    client.post("/search", data={"query": "Arduino  Nano"})
+    client.post("/search", data={"query": "arduino nano"})
+    assert len(ranked) == 1
+
+    # Another process rescraped the query; this process's cache was never told
+    database.bump_results_version("arduino nano")
+    client.post("/search", data={"query": "arduino nano"})
+    assert len(ranked) == 2
+    assert database.results_version("arduino nano") == 1
+    assert database.results_version("arduino uno") == 0
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import Counter
+
+from single_flight import SingleFlight
+
+CALLERS_PER_KEY = 25
+KEYS = ["raspberry pi 4", "arduino uno", "hc sr04", "esp32", "servo"]
+
+
+class FakeScraper:
+    """Stands in for scrape_all_sites: slow, and counts how often each key really runs."""
+
+    def __init__(self, seconds=0.2):
+        self.seconds = seconds
+        self.runs = Counter()
+        self.running = Counter()
+        self.max_concurrent = Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, key):
+        with self._lock:
+            self.runs[key] += 1
+            self.running[key] += 1
+            self.max_concurrent[key] = max(self.max_concurrent[key], self.running[key])
+        time.sleep(self.seconds)
+        with self._lock:
+            self.running[key] -= 1
+        return f"results for {key}"
+
+
+def stampede(flight, fn, keys, callers_per_key):
+    """Start every caller at the same moment and collect (key, result, shared)."""
+    barrier = threading.Barrier(len(keys) * callers_per_key)
+    results = []
+    results_lock = threading.Lock()
+
+    def caller(key):
+        barrier.wait()
+        result, shared = flight.do(key, fn, key)
+        with results_lock:
+            results.append((key, result, shared))
+
+    threads = [threading.Thread(target=caller, args=(key,)) for key in keys for _ in range(callers_per_key)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results
+
+
+def test_exactly_one_scrape_per_key():
+    flight = SingleFlight()
+    scraper = FakeScraper()
+
+    results = stampede(flight, scraper, KEYS, CALLERS_PER_KEY)
+
+    assert len(results) == len(KEYS) * CALLERS_PER_KEY
+    assert scraper.runs == Counter({key: 1 for key in KEYS})
+    assert all(count == 1 for count in scraper.max_concurrent.values())
+    for key in KEYS:
+        answers = [(result, shared) for k, result, shared in results if k == key]
+        assert {result for result, _ in answers} == {f"results for {key}"}
+        # One leader ran the scrape, everyone else shared its result
+        assert sum(not shared for _, shared in answers) == 1
+    assert flight.in_flight() == {}
+
+
+def test_waiters_share_the_leaders_error():
+    flight = SingleFlight()
+    runs = Counter()
+    barrier = threading.Barrier(10)
+    errors = []
+
+    def failing_scrape(key):
+        runs[key] += 1
+        time.sleep(0.2)
+        raise RuntimeError("all scrapers failed")
+
+    def caller():
+        barrier.wait()
+        try:
+            flight.do("q", failing_scrape, "q")
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=caller) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert runs["q"] == 1
+    assert len(errors) == 10
+
+
+def test_key_runs_again_after_the_flight_lands():
+    flight = SingleFlight()
+    scraper = FakeScraper(seconds=0)
+
+    assert flight.do("q", scraper, "q") == ("results for q", False)
+    assert flight.do("q", scraper, "q") == ("results for q", False)
+    assert scraper.runs["q"] == 2
+
+
+def test_in_flight_reports_waiters():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking(key):
+        started.set()
+        release.wait(5)
+        return key
+
+    leader = threading.Thread(target=flight.do, args=("q", blocking, "q"))
+    leader.start()
+    assert started.wait(5)
+    waiters = [threading.Thread(target=flight.do, args=("q", blocking, "q")) for _ in range(3)]
+    for waiter in waiters:
+        waiter.start()
+    deadline = time.time() + 5
+    while flight.in_flight().get("q") != 3 and time.time() < deadline:
+        time.sleep(0.01)
+    assert flight.in_flight() == {"q": 3}
+
+    release.set()
+    for thread in [leader, *waiters]:
+        thread.join(timeout=5)
+    assert flight.in_flight() == {}
@@ -0,0 +1,22 @@
+from startup_report import measure_imports, top_level_imports
+
+
+def test_direct_imports_are_grouped_under_their_top_level_import():
+    # -X importtime order: children first, then the module that imported them
+    rows = [
+        (10, 10, 2, "werkzeug"),
+        (150, 5, 1, "flask"),
+        (100, 3, 1, "database"),
+        (300, 7, 0, "app"),
+        (40, 2, 0, "site"),
+    ]
+    assert top_level_imports(rows) == [
+        (300, 7, "app", [(150, 5, "flask"), (100, 3, "database")]),
+        (40, 2, "site", []),
+    ]
+
+
+def test_measure_imports_reads_importtime_output():
+    _, rows = measure_imports("json")
+    top_level = {name: children for _, _, name, children in top_level_imports(rows)}
+    assert "json.decoder" in [name for _, _, name in top_level["json"]]
@@ -0,0 +1,74 @@
+import os
+
+import robocraze_scraper
+import robu_scraper
+from robocraze_scraper import parse_robocraze_html
+from robu_scraper import parse_robu_html
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_robu_search_page():
+    products = parse_robu_html(fixture("robu_search.html"))
+
+    assert [p["name"] for p in products] == [
+        "Raspberry Pi 4 Model B with 4 GB RAM",
+        "Raspberry Pi 4 Model B with 8 GB RAM",
+        "Official Raspberry Pi 4 Case – Red/White",
+    ]
+    assert [p["price"] for p in products] == ["₹ 5,399.00", "₹ 7,899.00", "₹ 449.00"]
+    assert [p["availability"] for p in products] == ["Yes", "No", "Unknown"]
+    assert products[0]["product_link"] == "https://robu.in/product/raspberry-pi-4-model-b-with-4-gb-ram/"
+    # Lazy-loaded images: the real URL is in data-src / data-lazy-src, not the placeholder src
+    assert [p["image_url"] for p in products] == [
+        "https://robu.in/wp-content/uploads/2019/06/rpi4-4gb-300x300.jpg",
+        "https://robu.in/wp-content/uploads/2020/05/rpi4-8gb-300x300.jpg",
+        "https://robu.in/wp-content/uploads/2019/07/rpi4-case-300x300.jpg",
+    ]
+
+
+def test_robu_no_results_page():
+    assert parse_robu_html(fixture("robu_no_results.html")) == []
+
+
+def test_robocraze_search_page():
+    products = parse_robocraze_html(fixture("robocraze_search.html"))
+
+    assert [p["name"] for p in products] == [
+        "HC-SR04 Ultrasonic Distance Sensor Module",
+        "HC-SR04 Mounting Bracket",
+        "Ultrasonic Sensor Starter Kit",
+    ]
+    assert [p["price"] for p in products] == ["Rs. 69.00", "Rs. 29.00", "Price not found"]
+    assert [p["availability"] for p in products] == ["Yes", "No", "Unknown"]
+    # Relative links and protocol-relative images are made absolute
+    assert [p["product_link"] for p in products] == [
+        "https://robocraze.com/products/hc-sr04-ultrasonic-sensor",
+        "https://robocraze.com/products/hc-sr04-mounting-bracket",
+        "https://robocraze.com/products/ultrasonic-sensor-kit",
+    ]
+    assert products[0]["image_url"] == "https://robocraze.com/cdn/shop/products/hc-sr04.jpg?v=1681210000&width=533"
+    assert products[2]["image_url"] == "Image URL not found"
+
+
+def test_no_results_page_completes_without_selenium(monkeypatch):
+    # 0 saved products: the site answered, there is just nothing to store
+    monkeypatch.setattr(robu_scraper, "fetch_html", lambda url: fixture("robu_no_results.html"))
+    assert robu_scraper.scrape_robu_static("xyzzy", "https://robu.in/?s=xyzzy") == 0
+
+    monkeypatch.setattr(robocraze_scraper, "fetch_html", lambda url: fixture("robocraze_no_results.html"))
+    assert robocraze_scraper.scrape_robocraze_static("xyzzy", "https://robocraze.com/search?q=xyzzy") == 0
+
+
+def test_unrecognised_page_falls_back_to_selenium(monkeypatch):
+    # None tells the scraper the static page can't be trusted, so it falls back to the browser path
+    monkeypatch.setattr(robu_scraper, "fetch_html", lambda url: "<html><body></body></html>")
+    assert robu_scraper.scrape_robu_static("xyzzy", "https://robu.in/?s=xyzzy") is None
+
+    monkeypatch.setattr(robocraze_scraper, "fetch_html", lambda url: "<html><body></body></html>")
+    assert robocraze_scraper.scrape_robocraze_static("xyzzy", "https://robocraze.com/search?q=xyzzy") is None
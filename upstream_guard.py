@@ -0,0 +1,191 @@
+from collections import deque
+import threading
+import time
+import os
+
+# Guard configuration
+MAX_CONCURRENT_PER_BOT = int(os.getenv("CHATBOT_MAX_CONCURRENT", 4))  # Upstream calls in flight per bot type
+GATE_WAIT_SECONDS = 2.0  # How long a request may wait for a free slot before being rejected
+RATE_PER_SECOND = float(os.getenv("CHATBOT_RATE_PER_SECOND", 1.0))  # Outgoing calls refilled per second
+RATE_BURST = int(os.getenv("CHATBOT_RATE_BURST", 10))  # Calls allowed back to back
+RATE_WAIT_SECONDS = 1.0  # How long a request may wait for a token before being rejected
+FAILURE_THRESHOLD = 5  # Consecutive failures that open the circuit
+OPEN_SECONDS = 30  # How long an open circuit fails fast before letting a trial call through
+LATENCY_WINDOW = 200  # Recent upstream latencies kept for the p95
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when a call is refused before reaching the upstream."""
+
+    def __init__(self, reason, retry_after=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Allows `rate` calls per second on average, with bursts of up to `burst`."""
+
+    def __init__(self, rate=RATE_PER_SECOND, burst=RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, wait=RATE_WAIT_SECONDS):
+        """Take a token, waiting up to `wait` seconds for one. Returns False if none came."""
+        deadline = time.monotonic() + wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                needed = (1 - self._tokens) / self.rate
+            if now + needed > deadline:
+                return False
+            time.sleep(needed)
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through. After `threshold` consecutive failures it opens
+    and refuses calls for `open_seconds`; then one trial call is let through
+    (half-open), which closes the circuit on success or reopens it on failure.
+    """
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, open_seconds=OPEN_SECONDS):
+        self.threshold = threshold
+        self.open_seconds = open_seconds
+        self._failures = 0
+        self._opened_until = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    @property
+    def state(self):
+        if self._opened_until == 0:
+            return "closed"
+        return "open" if time.monotonic() < self._opened_until else "half_open"
+
+    def allow(self):
+        """True if a call may go upstream now."""
+        with self._lock:
+            if self._opened_until == 0:
+                return True
+            if time.monotonic() < self._opened_until or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def retry_after(self):
+        """Seconds until the circuit lets a call through again."""
+        return max(round(self._opened_until - time.monotonic()), 1)
+
+    def cancel(self):
+        """An allowed call never reached the upstream (e.g. refused by the rate limiter)."""
+        with self._lock:
+            self._trial_running = False
+
+    def record(self, error, open_for=None):
+        """Outcome of an allowed call; `open_for` opens the circuit right away (e.g. on a 429)."""
+        with self._lock:
+            self._trial_running = False
+            if not error:
+                self._failures = 0
+                self._opened_until = 0
+                return
+            self._failures += 1
+            if open_for or self._failures >= self.threshold or self._opened_until:
+                if self.state != "open":
+                    self.opened += 1
+                    print(f"[CHATBOT] Circuit opened after {self._failures} failed upstream calls")
+                self._opened_until = time.monotonic() + (open_for or self.open_seconds)
+
+
+class UpstreamGuard:
+    """
+    Admission control for chatbot calls to Gemini: a circuit breaker that fails
+    fast while the upstream is unhealthy, a shared token bucket for outgoing
+    calls, and a bounded number of in-flight calls per bot type.
+    Callers pair acquire() with release() once the call finished.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_PER_BOT, gate_wait=GATE_WAIT_SECONDS,
+                 bucket=None, breaker=None):
+        self.max_concurrent = max_concurrent
+        self.gate_wait = gate_wait
+        self.bucket = bucket or TokenBucket()
+        self.breaker = breaker or CircuitBreaker()
+        self._gates = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.calls = 0
+        self.errors = 0
+        self.upstream_seconds = 0.0
+        self.rejected = {"concurrency": 0, "rate": 0}
+        self.short_circuited = 0
+
+    def _gate(self, bot_type):
+        with self._lock:
+            if bot_type not in self._gates:
+                self._gates[bot_type] = threading.BoundedSemaphore(self.max_concurrent)
+                self._in_flight[bot_type] = 0
+            return self._gates[bot_type]
+
+    def acquire(self, bot_type):
+        """Reserve an upstream call for `bot_type`, or raise UpstreamUnavailable."""
+        if not self.breaker.allow():
+            with self._lock:
+                self.short_circuited += 1
+            raise UpstreamUnavailable("circuit open", self.breaker.retry_after())
+
+        gate = self._gate(bot_type)
+        if not gate.acquire(timeout=self.gate_wait):
+            self.breaker.cancel()
+            with self._lock:
+                self.rejected["concurrency"] += 1
+            raise UpstreamUnavailable(f"{self.max_concurrent} {bot_type} calls already in flight", 5)
+
+        if not self.bucket.take():
+            gate.release()
+            self.breaker.cancel()
+            with self._lock:
+                self.rejected["rate"] += 1
+            raise UpstreamUnavailable("outgoing rate limit reached", 5)
+
+        with self._lock:
+            self._in_flight[bot_type] += 1
+
+    def release(self, bot_type, seconds, error=False, retry_after=None):
+        """Finish a call reserved with acquire(), recording its latency and outcome."""
+        self.breaker.record(error, open_for=retry_after)
+        with self._lock:
+            self._in_flight[bot_type] -= 1
+            self.calls += 1
+            self.upstream_seconds += seconds
+            self._latencies.append(seconds)
+            if error:
+                self.errors += 1
+        self._gates[bot_type].release()
+
+    def stats(self):
+        """Upstream latency, refusals and breaker state for the /status endpoint."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "avg_seconds": round(self.upstream_seconds / self.calls, 3) if self.calls else None,
+                "p95_seconds": round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)], 3) if latencies else None,
+                "in_flight": dict(self._in_flight),
+                "rejected": dict(self.rejected),
+                "short_circuited": self.short_circuited,
+                "circuit": self.breaker.state,
+                "circuit_opened": self.breaker.opened,
+            }
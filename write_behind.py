@@ -0,0 +1,171 @@
+from pymongo.errors import PyMongoError, BulkWriteError
+from collections import deque
+import threading
+import json
+import time
+import os
+
+# Buffer configuration
+FLUSH_BATCH_SIZE = 100  # Records per insert_many
+FLUSH_INTERVAL = 2.0  # Seconds a record may wait before being flushed
+MAX_BUFFERED = 10000  # Beyond this, records go straight to the spill file
+REPLAY_BATCH_SIZE = 500  # Spilled records re-inserted per insert_many
+
+
+class WriteBehindBuffer:
+    """
+    Buffers documents in memory and writes them with batched insert_many
+    calls from a background thread, by size or after FLUSH_INTERVAL.
+    If MongoDB is unreachable, batches are appended to a local JSONL spill
+    file and replayed once MongoDB answers again. Callers never wait on
+    the database.
+    """
+
+    def __init__(self, collection, spill_path, batch_size=FLUSH_BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, max_buffered=MAX_BUFFERED):
+        self.collection = collection
+        self.spill_path = spill_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # One flush (or replay) at a time
+        self._spill_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._pid = None  # The flusher thread doesn't survive fork, so track which process started it
+        self.flushed = 0
+        self.flushes = 0
+        self.flush_seconds = 0.0
+        self.last_flush_ms = None
+        self.spilled = 0
+        self.replayed = 0
+
+    def _ensure_flusher(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name=f"write-behind-{self.collection.name}", daemon=True).start()
+
+    def add(self, document):
+        """Queue one document for insertion."""
+        self._ensure_flusher()
+        with self._lock:
+            overflow = len(self._buffer) >= self.max_buffered
+            if not overflow:
+                self._buffer.append(document)
+                full = len(self._buffer) >= self.batch_size
+        if overflow:
+            self._spill([document])
+        elif full:
+            self._wakeup.set()
+
+    def _spill(self, documents):
+        """Append documents to the spill file so they survive until MongoDB is back."""
+        with self._spill_lock:
+            with open(self.spill_path, "a", encoding="utf-8") as spill_file:
+                for document in documents:
+                    record = {key: value for key, value in document.items() if key != "_id"}
+                    spill_file.write(json.dumps(record, default=str) + "\n")
+        self.spilled += len(documents)
+
+    def _insert(self, documents):
+        try:
+            self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # Unordered inserts keep going past bad documents; those can't be retried usefully
+            print(f"[WRITE-BEHIND] {len(e.details.get('writeErrors', []))} {self.collection.name} records rejected")
+
+    def flush(self):
+        """Write everything buffered so far. Returns the number of documents handled."""
+        with self._flush_lock:
+            handled = 0
+            while True:
+                with self._lock:
+                    batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not batch:
+                    break
+                started = time.time()
+                try:
+                    self._insert(batch)
+                except PyMongoError as e:
+                    print(f"[WRITE-BEHIND] MongoDB unavailable ({e}), spilling {len(batch)} records to {self.spill_path}")
+                    self._spill(batch)
+                    handled += len(batch)
+                    continue
+                elapsed = time.time() - started
+                self.flushes += 1
+                self.flushed += len(batch)
+                self.flush_seconds += elapsed
+                self.last_flush_ms = round(elapsed * 1000, 1)
+                handled += len(batch)
+            return handled
+
+    def replay(self):
+        """Re-insert spilled records once MongoDB accepts writes again."""
+        replaying_path = self.spill_path + ".replaying"
+        with self._flush_lock:
+            # New spills go to a fresh file while the old one is replayed
+            with self._spill_lock:
+                if not os.path.exists(replaying_path):
+                    if not os.path.exists(self.spill_path):
+                        return 0
+                    os.replace(self.spill_path, replaying_path)
+
+            with open(replaying_path, "r", encoding="utf-8") as spill_file:
+                records = [json.loads(line) for line in spill_file if line.strip()]
+            try:
+                for start in range(0, len(records), REPLAY_BATCH_SIZE):
+                    self._insert(records[start:start + REPLAY_BATCH_SIZE])
+            except PyMongoError as e:
+                # Keep the file; the next replay starts over (duplicates of the
+                # batches already written are preferable to losing records)
+                print(f"[WRITE-BEHIND] Replay of {replaying_path} failed: {e}")
+                return 0
+            os.remove(replaying_path)
+            self.replayed += len(records)
+            print(f"[WRITE-BEHIND] Replayed {len(records)} spilled {self.collection.name} records")
+            return len(records)
+
+    def _spill_pending(self):
+        return os.path.exists(self.spill_path) or os.path.exists(self.spill_path + ".replaying")
+
+    def _mongo_available(self):
+        try:
+            self.collection.database.client.admin.command("ping")
+            return True
+        except PyMongoError:
+            return False
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                if self._spill_pending() and self._mongo_available():
+                    self.replay()
+            except Exception as e:
+                print(f"[WRITE-BEHIND] Flush failed: {e}")
+
+    def stats(self):
+        """Queue length and flush latency for the /status endpoint."""
+        with self._lock:
+            queued = len(self._buffer)
+        return {
+            "queued": queued,
+            "flushed": self.flushed,
+            "avg_flush_ms": round(self.flush_seconds * 1000 / self.flushes, 1) if self.flushes else None,
+            "last_flush_ms": self.last_flush_ms,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "spill_pending": self._spill_pending(),
+        }
+
+    def shutdown(self):
+        """Stop the flusher and write out (or spill) whatever is still buffered."""
+        self._stopping.set()
+        self._wakeup.set()
+        self.flush()